@@ -0,0 +1,303 @@
+"""
+DB routing voor de HR portal: reads naar een replica-pool, writes naar de primary.
+
+- Elke node (primary + replica's) heeft een eigen ThreadedConnectionPool.
+- Replica's worden alleen gebruikt als hun replication lag onder
+  DB_REPLICA_MAX_LAG_SECONDS ligt; de lag wordt per replica hooguit elke
+  DB_REPLICA_CHECK_INTERVAL seconden gemeten (één thread tegelijk).
+- Read-after-write: write() geeft na de commit de WAL-positie (LSN) van de
+  primary terug. Een read met min_lsn gebruikt alleen een replica die die
+  positie al heeft afgespeeld, anders de primary.
+
+Zonder DB_REPLICA_HOSTS gaan alle reads naar de primary (zelfde gedrag als
+voorheen).
+"""
+
+import contextlib
+import itertools
+import re
+import sys
+import threading
+import time
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+_LSN_RE = re.compile(r"^[0-9A-F]{1,8}/[0-9A-F]{1,8}$", re.IGNORECASE)
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+             WHEN NOT pg_is_in_recovery() THEN 0
+             WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+           END;
+"""
+
+REPLICA_CAUGHT_UP_SQL = """
+    SELECT CASE
+             WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() >= %s::pg_lsn
+             ELSE TRUE
+           END;
+"""
+
+
+def valid_lsn(value):
+    """Geef value terug als het een geldige pg_lsn tekst is (bv. '0/16B3748'), anders None."""
+    if value and _LSN_RE.match(value):
+        return value
+    return None
+
+
+def parse_hosts(value: str, default_port: str):
+    """'host1:5432,host2' -> [("host1", "5432"), ("host2", default_port)]"""
+    hosts = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(":")
+        hosts.append((host, port or default_port))
+    return hosts
+
+
+class _Node:
+    """Eén Postgres-server met een eigen pool en (voor replica's) lag-status."""
+
+    def __init__(self, name, host, port, pool_kwargs, minconn, maxconn):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.maxconn = maxconn
+        self.pool = pg_pool.ThreadedConnectionPool(
+            minconn, maxconn, host=host, port=port, **pool_kwargs
+        )
+        # ThreadedConnectionPool gooit PoolError als hij vol zit; met deze
+        # semaphore wachten requests (begrensd) op een vrije connectie.
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.in_use = 0
+        self._in_use_lock = threading.Lock()
+        self.lag_seconds = None  # None = nog niet gemeten
+        self.healthy = True
+        self.checked_at = 0.0
+        self.check_lock = threading.Lock()
+
+    def track(self, delta: int) -> None:
+        with self._in_use_lock:
+            self.in_use += delta
+
+
+class WriteResult:
+    """Wordt gevuld na een geslaagde commit in DatabaseRouter.write()."""
+
+    def __init__(self):
+        self.lsn = None
+
+
+class DatabaseRouter:
+    def __init__(
+        self,
+        primary_host,
+        primary_port,
+        replica_hosts,
+        dbname,
+        user,
+        password,
+        minconn=1,
+        maxconn=10,
+        max_lag_seconds=5.0,
+        check_interval=2.0,
+        connection_factory=None,
+        pool_timeout=5.0,
+        wait_observer=None,
+    ):
+        pool_kwargs = {"dbname": dbname, "user": user, "password": password}
+        if connection_factory is not None:
+            pool_kwargs["connection_factory"] = connection_factory
+
+        self._pool_kwargs = pool_kwargs
+        self._minconn = minconn
+        self._maxconn = maxconn
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.pool_timeout = pool_timeout
+        # callable(node_name, seconds) die de wachttijd op een pool-connectie krijgt
+        self.wait_observer = wait_observer
+
+        self.primary = _Node("primary", primary_host, primary_port, pool_kwargs, minconn, maxconn)
+        self.replicas = [
+            _Node(f"replica-{i}", host, port, pool_kwargs, 0, maxconn)
+            for i, (host, port) in enumerate(replica_hosts)
+        ]
+        self._rr = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._rr_lock = threading.Lock()
+
+    # ---------- pool helpers ----------
+
+    @contextlib.contextmanager
+    def _checkout(self, node):
+        started = time.monotonic()
+        if not node.slots.acquire(timeout=self.pool_timeout):
+            raise pg_pool.PoolError(
+                f"no free connection to {node.name} within {self.pool_timeout}s"
+            )
+        if self.wait_observer is not None:
+            self.wait_observer(node.name, time.monotonic() - started)
+
+        try:
+            conn = node.pool.getconn()
+        except Exception:
+            node.slots.release()
+            raise
+
+        node.track(+1)
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            node.pool.putconn(conn, close=broken or bool(conn.closed))
+            node.track(-1)
+            node.slots.release()
+
+    # ---------- replica selectie ----------
+
+    def _refresh_lag(self, node) -> None:
+        """Meet de replication lag als de laatste meting ouder is dan check_interval."""
+        if time.monotonic() - node.checked_at < self.check_interval:
+            return
+        # maar één thread meet; de rest gebruikt de vorige waarde
+        if not node.check_lock.acquire(blocking=False):
+            return
+        try:
+            with self._checkout(node) as conn, conn.cursor() as cur:
+                cur.execute(REPLICA_LAG_SQL)
+                node.lag_seconds = float(cur.fetchone()[0])
+                node.healthy = True
+        except psycopg2.Error as e:
+            print(f"[DB] Replica {node.host}:{node.port} unavailable: {e}")
+            node.healthy = False
+        finally:
+            node.checked_at = time.monotonic()
+            node.check_lock.release()
+
+    def _usable(self, node) -> bool:
+        self._refresh_lag(node)
+        return (
+            node.healthy
+            and node.lag_seconds is not None
+            and node.lag_seconds <= self.max_lag_seconds
+        )
+
+    def _pick_replica(self):
+        if not self.replicas:
+            return None
+        with self._rr_lock:
+            start = next(self._rr)
+        for offset in range(len(self.replicas)):
+            node = self.replicas[(start + offset) % len(self.replicas)]
+            if self._usable(node):
+                return node
+        return None
+
+    # ---------- publieke API ----------
+
+    def _replica_connection(self, stack, min_lsn):
+        """
+        Check een replica-connectie uit en registreer de teruggave op stack.
+        None als er geen bruikbare replica is (of die min_lsn nog niet heeft).
+        """
+        replica = self._pick_replica()
+        if replica is None:
+            return None
+
+        checkout = contextlib.ExitStack()
+        try:
+            conn = checkout.enter_context(self._checkout(replica))
+            if min_lsn:
+                with conn.cursor() as cur:
+                    cur.execute(REPLICA_CAUGHT_UP_SQL, (min_lsn,))
+                    caught_up = cur.fetchone()[0]
+                if not caught_up:
+                    checkout.close()
+                    return None
+        except psycopg2.Error as e:
+            # connectie teruggeven (als broken) en terugvallen op de primary
+            checkout.__exit__(*sys.exc_info())
+            replica.healthy = False
+            print(f"[DB] Read on {replica.host}:{replica.port} failed, using primary: {e}")
+            return None
+
+        stack.push(checkout)
+        return conn
+
+    @contextlib.contextmanager
+    def read(self, min_lsn=None):
+        """
+        Connectie voor een read-only query. min_lsn (uit een eerdere write van
+        dezelfde gebruiker) dwingt een replica af die minstens zo ver is, of de primary.
+        """
+        with contextlib.ExitStack() as stack:
+            conn = self._replica_connection(stack, min_lsn)
+            if conn is None:
+                conn = stack.enter_context(self._checkout(self.primary))
+            yield conn
+
+    @contextlib.contextmanager
+    def write(self):
+        """
+        Connectie op de primary. Commit bij succes, rollback bij een exception.
+        Yield (conn, WriteResult); result.lsn is na de commit de WAL-positie.
+        """
+        result = WriteResult()
+        with self._checkout(self.primary) as conn:
+            yield conn, result
+            conn.commit()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_current_wal_lsn()::text;")
+                result.lsn = cur.fetchone()[0]
+            conn.commit()
+
+    @contextlib.contextmanager
+    def primary_autocommit(self):
+        """Primary-connectie in autocommit (bv. REFRESH MATERIALIZED VIEW CONCURRENTLY)."""
+        with self._checkout(self.primary) as conn:
+            conn.autocommit = True
+            try:
+                yield conn
+            finally:
+                conn.autocommit = False
+
+    def ping(self) -> None:
+        """SELECT 1 via de primary-pool; gooit een exception als de DB niet bereikbaar is."""
+        with self._checkout(self.primary) as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+
+    def status(self):
+        """Snapshot van primary/replica status (voor logging en health checks)."""
+        return {
+            "primary": {
+                "host": self.primary.host,
+                "port": self.primary.port,
+                "in_use": self.primary.in_use,
+                "max": self.primary.maxconn,
+            },
+            "replicas": [
+                {
+                    "host": node.host,
+                    "port": node.port,
+                    "healthy": node.healthy,
+                    "lag_seconds": node.lag_seconds,
+                    "in_use": node.in_use,
+                    "max": node.maxconn,
+                }
+                for node in self.replicas
+            ],
+        }
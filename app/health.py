@@ -0,0 +1,107 @@
+"""
+Gecachte health checks voor /readyz.
+
+Een achtergrondthread (of, in de async portal, een asyncio task) draait elke
+HEALTH_CHECK_INTERVAL seconden de checks: een pooled ping naar de primary,
+de queue depth van de automation workers, de replica-status. /readyz leest
+alleen de laatste uitkomst. Probes kosten zo geen Postgres-connectie of query,
+en het antwoord komt direct uit het geheugen.
+"""
+
+import contextlib
+import threading
+import time
+
+
+class CheckResult:
+    """Uitkomst van één check; detail mag de check zelf vullen."""
+
+    def __init__(self):
+        self.ok = True
+        self.detail = None
+        self.error = None
+
+
+class HealthMonitor:
+    def __init__(self, interval=10.0, critical=()):
+        self.interval = interval
+        # checks die moeten slagen voor ready; de rest is informatief
+        self.critical = set(critical)
+        self._results = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        """
+        `with monitor.measure("db"):` meet de latency en legt ok/error vast.
+        Exceptions worden vastgelegd en niet doorgegooid.
+        """
+        result = CheckResult()
+        started = time.monotonic()
+        try:
+            yield result
+        except Exception as e:
+            result.ok = False
+            result.error = f"{type(e).__name__}: {e}"[:300]
+        latency_ms = round((time.monotonic() - started) * 1000, 2)
+
+        entry = {"ok": result.ok, "latency_ms": latency_ms}
+        if result.detail is not None:
+            entry["detail"] = result.detail
+        if result.error is not None:
+            entry["error"] = result.error
+        with self._lock:
+            self._results[name] = entry
+            self._checked_at = time.time()
+
+    def run_checks(self, checks) -> None:
+        """checks: {naam: callable() -> detail (of None)}"""
+        for name, check in checks.items():
+            with self.measure(name) as result:
+                result.detail = check()
+
+    def start(self, checks) -> None:
+        """Start de achtergrondthread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(checks,), name="health-checks", daemon=True
+            )
+        self._thread.start()
+
+    def _run(self, checks):
+        while True:
+            self.run_checks(checks)
+            time.sleep(self.interval)
+
+    def snapshot(self):
+        """(ready, payload) op basis van de laatste checks; geen I/O."""
+        with self._lock:
+            results = dict(self._results)
+            checked_at = self._checked_at
+
+        if checked_at is None:
+            return False, {"status": "starting", "checks": {}}
+
+        age = time.time() - checked_at
+        # thread hangt of is gestopt: niet meer op de oude uitkomst vertrouwen
+        stale = age > 3 * self.interval
+        failed = sorted(
+            name for name in self.critical if not results.get(name, {}).get("ok", False)
+        )
+        ready = not stale and not failed
+
+        payload = {
+            "status": "ok" if ready else "unavailable",
+            "checked_at": checked_at,
+            "age_seconds": round(age, 3),
+            "checks": results,
+        }
+        if stale:
+            payload["stale"] = True
+        if failed:
+            payload["failed"] = failed
+        return ready, payload
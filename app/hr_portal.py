@@ -2,44 +2,375 @@
 
 
 import os
-import psycopg2
+import sys
+import csv
+import io
+import threading
+import contextlib
+import queue
+import time
 from psycopg2.extras import RealDictCursor
-from flask import Flask, request, render_template_string, redirect, url_for
-import string
-import secrets
-import datetime
+from flask import (
+    Flask, Response, request, render_template_string, redirect, url_for, jsonify, g,
+    make_response, stream_template_string, stream_with_context,
+)
 import subprocess
 
-app = Flask(__name__)
+import http_cache
+import progress
+from db_routing import DatabaseRouter, parse_hosts, valid_lsn
+from health import HealthMonitor
+from single_flight import SingleFlight
+
+# Gedeelde modules (hrcore/) staan in de project-root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from hrcore import claims, db, events, power, records, schedule, sizing, tracing  # noqa: E402
 
-# Database connection settings from environment variables
-DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME", "hr_employees")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
-
-def get_db_connection():
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
+tracing.set_service_name("hr-portal")
+
+# Optional Prometheus metrics (safe fallback if library is missing)
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+except ImportError:  # pragma: no cover - optional dependency
+    Counter = Gauge = Histogram = generate_latest = None
+    CONTENT_TYPE_LATEST = "text/plain"
+
+if Gauge is not None:
+    INFLIGHT_REQUESTS = Gauge(
+        "hr_portal_inflight_requests",
+        "Requests currently being handled by this portal replica",
+    )
+    DB_POOL_WAIT = Histogram(
+        "hr_portal_db_pool_wait_seconds",
+        "Time spent waiting for a free pooled DB connection",
+        ["node"],
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
     )
-    return conn
+    DB_POOL_IN_USE = Gauge(
+        "hr_portal_db_pool_in_use",
+        "Pooled DB connections currently checked out",
+        ["node"],
+    )
+    READ_QUERIES = Counter(
+        "hr_portal_read_queries_total",
+        "Portal reads: executed, or coalesced onto an identical read already in flight",
+        ["query", "result"],
+    )
+else:
+    INFLIGHT_REQUESTS = None
+    DB_POOL_WAIT = None
+    DB_POOL_IN_USE = None
+    READ_QUERIES = None
+
+app = Flask(__name__)
+app.jinja_env.globals["describe_event"] = events.describe_event
+app.jinja_env.globals["local_time"] = schedule.format_local
+
+# Database connection settings: dezelfde DB_* env vars en defaults als de automation (hrcore/db.py)
+DB_HOST = db.CONFIG.host
+DB_PORT = db.CONFIG.port
+DB_NAME = db.CONFIG.dbname
+DB_USER = db.CONFIG.user
+DB_PASSWORD = db.CONFIG.password
+
+# Read replica's (komma-gescheiden host[:port]); leeg = alles naar de primary
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "2"))
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Max. wachttijd (seconden) op een vrije pool-connectie voordat een request faalt
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+
+# "subprocess": portal start onboarding.py/offboarding.py zelf (één pod, zoals voorheen)
+# "worker": alleen NOTIFY; automation/worker.py (aparte Deployment) doet het werk
+AUTOMATION_MODE = os.getenv("AUTOMATION_MODE", "subprocess").strip().lower()
+# subprocess-modus: hooguit zo lang (seconden) tot de portal nieuwe onboard_after/leave_at ziet
+SCHEDULE_TICK_SECONDS = float(os.getenv("SCHEDULE_TICK_SECONDS", "60"))
+
+# Na een write leest dezelfde browser zo lang (seconden) minstens die WAL-positie
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "30"))
+MIN_LSN_COOKIE = "hr_min_lsn"
+
+# Interval (seconden) van de gecachte health checks achter /readyz
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+# 0: geen health checks bij import (hr_portal_async.py importeert deze module alleen voor queries/templates)
+PORTAL_BACKGROUND = os.getenv("PORTAL_BACKGROUND", "1") != "0"
+
+# Dashboard: "summary" (trigger-maintained tabel) of "matview" (materialized view)
+DASHBOARD_SOURCE = os.getenv("DASHBOARD_SOURCE", "summary").strip().lower()
+
+# Aantal recente onboardings voor het p50/p95 stage-latency rapport
+STAGE_REPORT_DEFAULT_N = int(os.getenv("STAGE_REPORT_DEFAULT_N", "50"))
+
+
+_db_router = None
+_db_router_lock = threading.Lock()
+
+
+def get_db_router() -> DatabaseRouter:
+    """Eén router (met pools) per proces; pas bij de eerste request aangemaakt."""
+    global _db_router
+    if _db_router is None:
+        with _db_router_lock:
+            if _db_router is None:
+                _db_router = DatabaseRouter(
+                    primary_host=DB_HOST,
+                    primary_port=DB_PORT,
+                    replica_hosts=parse_hosts(DB_REPLICA_HOSTS, DB_PORT),
+                    dbname=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    max_lag_seconds=DB_REPLICA_MAX_LAG_SECONDS,
+                    check_interval=DB_REPLICA_CHECK_INTERVAL,
+                    connection_factory=tracing.traced_connection_factory(),
+                    pool_timeout=DB_POOL_TIMEOUT,
+                    wait_observer=_observe_pool_wait,
+                )
+    return _db_router
 
 
-def generate_workspace_username(email: str) -> str:
-    # voorbeeld: giovanni.hr@innovatech.com -> giovanni_hr
-    local_part = email.split("@")[0]
-    return local_part.replace(".", "_")
+def _observe_pool_wait(node_name, seconds) -> None:
+    if DB_POOL_WAIT is not None:
+        DB_POOL_WAIT.labels(node=node_name).observe(seconds)
+
+
+def read_connection():
+    """Replica-connectie, of de primary als deze browser net zelf iets schreef."""
+    return get_db_router().read(min_lsn=valid_lsn(request.cookies.get(MIN_LSN_COOKIE)))
+
+
+def observe_read(name, coalesced) -> None:
+    if READ_QUERIES is not None:
+        READ_QUERIES.labels(query=name, result="coalesced" if coalesced else "executed").inc()
+
+
+_reads = SingleFlight(observer=observe_read)
+
+
+def coalesced_read(name, fetch, *args):
+    """
+    fetch(conn, *args) op een read-connectie; gelijktijdige requests met
+    dezelfde name/args delen één query (zie single_flight.py). De min-LSN van
+    read-your-writes hoort bij de key: wie net zelf schreef, wacht niet op
+    een read die van vóór die write kan zijn.
+    """
+    min_lsn = valid_lsn(request.cookies.get(MIN_LSN_COOKIE))
+
+    def run():
+        with get_db_router().read(min_lsn=min_lsn) as conn:
+            return fetch(conn, *args)
 
+    return _reads.do((name, min_lsn) + args, run, name=name)
 
-def generate_temp_password(length: int = 12) -> str:
-    alphabet = string.ascii_letters + string.digits
-    return "".join(secrets.choice(alphabet) for _ in range(length))
+
+def fresh_read(name, fetch, *args):
+    """
+    coalesced_read() zonder single flight: een eigen query, voor reads die
+    van ná een bepaald moment moeten zijn (een lopende gedeelde read kan
+    daarvóór gestart zijn).
+    """
+    min_lsn = valid_lsn(request.cookies.get(MIN_LSN_COOKIE))
+    observe_read(name, False)
+    with get_db_router().read(min_lsn=min_lsn) as conn:
+        return fetch(conn, *args)
+
+
+@contextlib.contextmanager
+def write_connection():
+    """Primary-connectie; commit bij succes en onthoudt de LSN voor read-after-write."""
+    with get_db_router().write() as (conn, result):
+        yield conn
+    g.written_lsn = result.lsn
+
+
+def start_automation(queue: str) -> None:
+    """Start onboarding.py / offboarding.py, tenzij een automation worker het oppakt."""
+    if AUTOMATION_MODE == "worker":
+        return  # de NOTIFY uit de write-transactie maakt de worker wakker
+    script = os.path.join(PROJECT_ROOT, "automation", f"{queue}.py")
+    subprocess.Popen(["python", script], env=tracing.child_env())
+
+
+def workstation_profile_summary(employee) -> str:
+    """Sizing profile van de VM; voor nog niet ge-onboarde employees het geplande profiel."""
+    if employee.get("workstation_profile"):
+        profiles, _, _ = sizing.load_profiles()
+        profile = profiles.get(employee["workstation_profile"])
+        return profile.summary() if profile else employee["workstation_profile"]
+    return sizing.profile_for(employee.get("department"), employee.get("role")).summary() + " (gepland)"
+
+
+app.jinja_env.globals["workstation_profile"] = workstation_profile_summary
+
+
+def summarize_groups(groups):
+    """
+    Zet de (department, status, deprovisioned, device_enrolled) groepen om
+    naar totalen per afdeling. Loopt alleen over de groepen, niet over employees.
+    """
+    def empty_counts(department=None):
+        return {
+            "department": department,
+            "new": 0,
+            "active": 0,
+            "inactive": 0,
+            "pending_deprovisioning": 0,
+            "device_enrolled": 0,
+            "total": 0,
+        }
+
+    totals = empty_counts()
+    per_department = {}
+
+    for group in groups:
+        dept = per_department.setdefault(group["department"], empty_counts(group["department"]))
+        count = group["headcount"]
+        status_key = (group["status"] or "").lower()
+
+        for bucket in (dept, totals):
+            bucket["total"] += count
+            if status_key in ("new", "active", "inactive"):
+                bucket[status_key] += count
+            if status_key == "inactive" and not group["deprovisioned"]:
+                bucket["pending_deprovisioning"] += count
+            if group["device_enrolled"]:
+                bucket["device_enrolled"] += count
+
+    departments = [per_department[name] for name in sorted(per_department)]
+    return totals, departments
+
+
+# ---------- QUERIES ----------
+# Gedeeld met hr_portal_async.py (psycopg 3 gebruikt dezelfde %s placeholders).
+
+EMPLOYEE_BY_EMAIL_SQL = """
+    SELECT e.id, e.name, e.email, e.department, e.role, e.status,
+           e.cloud_account_created, e.deprovisioned,
+           e.device_enrolled, e.workspace_username,
+           e.workspace_temp_password,
+           e.workstation_instance, e.workstation_zone, e.workstation_profile,
+           e.workstation_power_state, e.workstation_power_reason,
+           e.workstation_power_changed_at,
+           e.workstation_bundle, e.transfer_pending,
+           e.start_date, e.onboard_after, e.leave_at,
+           le.event_type AS last_event,
+           le.occurred_at AS last_event_at,
+           le.detail AS last_event_detail
+    FROM employees e
+""" + events.LATEST_EVENT_JOIN + """
+    WHERE e.email = %s;
+"""
+
+# kolomvolgorde = records.EmployeeListRow
+LIST_EMPLOYEES_SQL = """
+    SELECT """ + records.EmployeeListRow.projection() + """,
+           le.event_type AS last_event,
+           le.occurred_at AS last_event_at,
+           le.detail AS last_event_detail
+    FROM employees e
+""" + events.LATEST_EVENT_JOIN + """
+    ORDER BY e.id;
+"""
+
+INSERT_EMPLOYEE_SQL = """
+    INSERT INTO employees
+        (name, email, department, role, status, start_date, onboard_after, queue_priority, queued_at)
+    VALUES (%s, %s, %s, %s, 'NEW', %s, %s, %s, COALESCE(%s, NOW()))
+    RETURNING id;
+"""
+
+EMPLOYEE_EMAIL_BY_ID_SQL = "SELECT email FROM employees WHERE id = %s;"
+
+MARK_INACTIVE_SQL = """
+    UPDATE employees
+    SET status = 'INACTIVE',
+        leave_at = NOW(),
+        transfer_pending = FALSE,  -- een open transfer vervalt bij vertrek
+        queue_priority = %s,
+        queued_at = NOW(),
+        updated_at = NOW()
+    WHERE id = %s;
+"""
+
+# Vertrekdatum in de toekomst: status blijft, offboarding.py zet hem op leave_at INACTIVE
+SCHEDULE_LEAVE_SQL = """
+    UPDATE employees
+    SET leave_at = %s,
+        queue_priority = %s,
+        updated_at = NOW()
+    WHERE id = %s
+      AND status <> 'INACTIVE';
+"""
+
+# Transfer / rolwijziging. NEW zonder lopende onboarding neemt de nieuwe waarden
+# gewoon mee; ACTIVE (of een onboarding die nog met de oude waarden bezig is)
+# gaat in de transfer-queue (automation/transfer.py).
+TRANSFER_SQL = """
+    UPDATE employees e
+    SET department = %(department)s,
+        role = %(role)s,
+        transfer_pending = (e.status = 'ACTIVE' OR e.claim_expires_at > NOW()),
+        queue_priority = CASE WHEN e.status = 'ACTIVE' THEN %(priority)s ELSE e.queue_priority END,
+        queued_at = CASE WHEN e.status = 'ACTIVE' THEN NOW() ELSE e.queued_at END,
+        updated_at = NOW()
+    FROM (SELECT id, department, role FROM employees WHERE id = %(id)s FOR UPDATE) old
+    WHERE e.id = old.id
+      AND e.status <> 'INACTIVE'
+      AND (e.department IS DISTINCT FROM %(department)s OR e.role IS DISTINCT FROM %(role)s)
+    RETURNING e.email, e.transfer_pending, old.department, old.role;
+"""
+
+# Live voortgang (SSE, zie progress.py)
+PROGRESS_SQL = """
+    SELECT e.id, e.status, e.deprovisioned, e.transfer_pending,
+           COALESCE(e.claim_expires_at > NOW(), FALSE) AS in_progress
+    FROM employees e
+    WHERE e.id = %s;
+"""
+
+PROGRESS_EVENTS_SQL = """
+    SELECT event_type, occurred_at, duration_ms, actor, detail
+    FROM employee_events
+    WHERE employee_id = %s
+    ORDER BY occurred_at DESC, id DESC
+    LIMIT %s;
+"""
+
+# Aantal recente events per voortgangsbericht
+PROGRESS_EVENTS_LIMIT = int(os.getenv("PROGRESS_EVENTS_LIMIT", "20"))
+
+# On-demand start: scheduler laat de VM tot override_until aan (zie hrcore/power.py)
+REQUEST_WORKSTATION_START_SQL = """
+    UPDATE employees
+    SET workstation_power_override_until = NOW() + make_interval(hours => %s),
+        workstation_power_state = CASE
+            WHEN workstation_power_state = 'RUNNING' THEN workstation_power_state
+            ELSE 'STARTING'
+        END
+    WHERE id = %s
+      AND status = 'ACTIVE'
+      AND deprovisioned = FALSE
+      AND workstation_instance IS NOT NULL
+    RETURNING email;
+"""
+
+DASHBOARD_SQL = """
+    SELECT department, status, deprovisioned, device_enrolled, headcount
+    FROM {source_table};
+"""
+
+REFRESH_DASHBOARD_SQL = "REFRESH MATERIALIZED VIEW CONCURRENTLY employee_summary_mv;"
+
+
+def dashboard_sql() -> str:
+    source_table = "employee_summary_mv" if DASHBOARD_SOURCE == "matview" else "employee_summary"
+    return DASHBOARD_SQL.format(source_table=source_table)
 
 
 # ---------- TEMPLATES ----------
@@ -168,6 +499,8 @@ INDEX_TEMPLATE = """
         gap: 1.75rem;
       }
 
+      .card-wide { grid-column: 1 / -1; }
+
       @media (max-width: 840px) {
         .shell { padding: 1.2rem 1.3rem 1.5rem; }
         .layout { grid-template-columns: minmax(0, 1fr); }
@@ -210,6 +543,13 @@ INDEX_TEMPLATE = """
         box-shadow: 0 0 0 1px var(--primary-light);
       }
 
+      input[type="date"] {
+        padding: 0.3rem 0.5rem;
+        border-radius: 0.6rem;
+        border: 1px solid var(--border);
+        font-size: 0.82rem;
+      }
+
       .helper {
         font-size: 0.78rem;
         color: var(--text-muted);
@@ -313,6 +653,7 @@ INDEX_TEMPLATE = """
           <nav>
             <a href="{{ url_for('add_employee') }}" class="btn btn-primary">+ Add employee</a>
             <a href="{{ url_for('list_employees') }}" class="btn btn-secondary">View all employees</a>
+            <a href="{{ url_for('dashboard') }}" class="btn btn-secondary">Dashboard</a>
           </nav>
         </header>
 
@@ -336,7 +677,7 @@ INDEX_TEMPLATE = """
             {% if employee %}
               <div class="actions-inline">
                 <div>
-                  <span class="status-pill status-{{ employee.status|lower }}">
+                  <span id="employee-status" class="status-pill status-{{ employee.status|lower }}">
                     {{ employee.status }}
                   </span>
                 </div>
@@ -346,9 +687,18 @@ INDEX_TEMPLATE = """
                     <form method="post"
                           action="{{ url_for('offboard_employee', employee_id=employee.id) }}"
                           style="display:inline;"
-                          onsubmit="return confirm('Offboard {{ employee.name }}? Dit markeert de gebruiker als INACTIVE en start het offboarding-script.');">
-                      <button type="submit" class="btn btn-danger">Start offboarding</button>
+                          onsubmit="return confirm('Offboard {{ employee.name }}? Zonder vertrekdatum wordt de gebruiker direct INACTIVE en start het offboarding-script.');">
+                      <input type="date" name="leave_date" title="Vertrekdatum (leeg = direct)">
+                      <label class="muted-note" title="Security-offboarding: gaat voor alle andere automation-werk">
+                        <input type="checkbox" name="urgent" value="1"> Urgent
+                      </label>
+                      <button type="submit" class="btn btn-danger">
+                        {{ 'Reschedule offboarding' if employee.leave_at else 'Start offboarding' }}
+                      </button>
                     </form>
+                    {% if employee.leave_at %}
+                      <p class="muted-note">Offboarding gepland op {{ local_time(employee.leave_at) }}.</p>
+                    {% endif %}
                   {% elif employee.deprovisioned %}
                     <span class="muted-note">Employee is al volledig offboarded.</span>
                   {% else %}
@@ -357,11 +707,46 @@ INDEX_TEMPLATE = """
                 </div>
               </div>
 
+              {% if employee.status != 'INACTIVE' %}
+                <form method="post"
+                      action="{{ url_for('transfer_employee', employee_id=employee.id) }}"
+                      class="actions-inline"
+                      onsubmit="return confirm('Department/rol van {{ employee.name }} wijzigen? Groepen, apps en VM-grootte worden aangepast.');">
+                  <input type="text" name="department" value="{{ employee.department }}" required title="Department">
+                  <select name="role" required title="Role">
+                    {% for role in ('Employee', 'Manager', 'HR_Admin') %}
+                      <option value="{{ role }}" {{ 'selected' if role == employee.role }}>{{ role }}</option>
+                    {% endfor %}
+                  </select>
+                  <label class="muted-note">
+                    <input type="checkbox" name="urgent" value="1"> Urgent
+                  </label>
+                  <button type="submit" class="btn">Transfer / change role</button>
+                </form>
+                {% if employee.transfer_pending %}
+                  <p class="muted-note">Transfer loopt: groepen, app bundle en VM worden bijgewerkt.</p>
+                {% endif %}
+              {% endif %}
+
               <table>
                 <tr><th class="field-name">Name</th><td>{{ employee.name }}</td></tr>
                 <tr><th class="field-name">Email</th><td>{{ employee.email }}</td></tr>
                 <tr><th class="field-name">Department</th><td>{{ employee.department }}</td></tr>
                 <tr><th class="field-name">Role</th><td>{{ employee.role }}</td></tr>
+                {% if employee.start_date %}
+                <tr>
+                  <th class="field-name">Start date</th>
+                  <td>
+                    {{ employee.start_date }}
+                    {% if employee.status == 'NEW' and employee.onboard_after %}
+                      <span class="muted-note">(workstation vanaf {{ local_time(employee.onboard_after) }})</span>
+                    {% endif %}
+                  </td>
+                </tr>
+                {% endif %}
+                {% if employee.leave_at %}
+                <tr><th class="field-name">Leave date</th><td>{{ local_time(employee.leave_at) }}</td></tr>
+                {% endif %}
                 <tr>
                   <th class="field-name">Cloud account created</th>
                   <td>
@@ -386,10 +771,60 @@ INDEX_TEMPLATE = """
                     </span>
                   </td>
                 </tr>
+                {% if not employee.deprovisioned %}
+                <tr><th class="field-name">Sizing profile</th><td>{{ workstation_profile(employee) }}</td></tr>
+                {% endif %}
+                {% if employee.workstation_instance %}
+                <tr>
+                  <th class="field-name">Workstation</th>
+                  <td>
+                    {{ employee.workstation_instance }}
+                    <span class="pill pill-{{ 'true' if employee.workstation_power_state == 'RUNNING' else 'false' }}">
+                      {{ employee.workstation_power_state or 'UNKNOWN' }}
+                    </span>
+                    {% if employee.workstation_power_reason %}
+                      <span class="muted-note">({{ employee.workstation_power_reason }})</span>
+                    {% endif %}
+                    {% if employee.status == 'ACTIVE' and employee.workstation_power_state in ('STOPPED', 'STOPPING', 'MISSING', None) %}
+                      <form method="post"
+                            action="{{ url_for('start_workstation', employee_id=employee.id) }}"
+                            style="display:inline;">
+                        <button type="submit" class="btn">Start now</button>
+                      </form>
+                    {% endif %}
+                  </td>
+                </tr>
+                {% endif %}
                 <tr><th class="field-name">Workspace username</th><td>{{ employee.workspace_username or '-' }}</td></tr>
                 <tr><th class="field-name">Workspace temp password</th><td>{{ employee.workspace_temp_password or '-' }}</td></tr>
-                <tr><th class="field-name">Last action</th><td class="last-action">{{ employee.last_action or '-' }}</td></tr>
+                <tr><th class="field-name">Last action</th><td id="last-action" class="last-action">{{ describe_event(employee.last_event, employee.last_event_at, employee.last_event_detail) }}</td></tr>
               </table>
+
+              {% set automation_pending = (employee.status == 'NEW' and (not employee.onboard_after or employee.onboard_after <= now))
+                                          or (employee.status == 'INACTIVE' and not employee.deprovisioned)
+                                          or (employee.status == 'ACTIVE' and employee.transfer_pending) %}
+              {% if automation_pending %}
+                <p id="live-progress" class="muted-note">Wacht op de automation…</p>
+                <script>
+                  // Live voortgang (SSE); bij afronding de pagina opnieuw laden voor de volledige stand
+                  (function () {
+                    var source = new EventSource("{{ url_for('employee_progress', employee_id=employee.id) }}");
+                    source.addEventListener("progress", function (e) {
+                      var data = JSON.parse(e.data);
+                      var pill = document.getElementById("employee-status");
+                      pill.textContent = data.status;
+                      pill.className = "status-pill status-" + data.status.toLowerCase();
+                      document.getElementById("last-action").textContent = data.last_action;
+                      document.getElementById("live-progress").textContent =
+                        data.in_progress ? "Automation bezig: " + data.last_action : "Wacht op de automation…";
+                      if (data.done) {
+                        source.close();
+                        window.location.reload();
+                      }
+                    });
+                  })();
+                </script>
+              {% endif %}
             {% elif email %}
               <p class="message">
                 No employee found for email <strong>{{ email }}</strong>.
@@ -401,6 +836,31 @@ INDEX_TEMPLATE = """
               </p>
             {% endif %}
           </section>
+
+          {% if employee %}
+            <section class="card card-wide">
+              <h2>Timeline</h2>
+              {% if timeline %}
+                <table>
+                  <thead>
+                    <tr><th>When (UTC)</th><th>Event</th><th>Duration</th><th>Actor</th></tr>
+                  </thead>
+                  <tbody>
+                    {% for ev in timeline %}
+                      <tr>
+                        <td>{{ ev.occurred_at.strftime('%Y-%m-%d %H:%M:%S') }}</td>
+                        <td>{{ describe_event(ev.event_type, None, ev.detail) }}</td>
+                        <td>{{ '%.1f s'|format(ev.duration_ms / 1000) if ev.duration_ms is not none else '-' }}</td>
+                        <td class="muted-note">{{ ev.actor }}</td>
+                      </tr>
+                    {% endfor %}
+                  </tbody>
+                </table>
+              {% else %}
+                <p class="message">Nog geen events voor deze medewerker.</p>
+              {% endif %}
+            </section>
+          {% endif %}
         </div>
       </div>
     </div>
@@ -459,7 +919,7 @@ ADD_TEMPLATE = """
         margin-bottom: 0.25rem;
       }
 
-      input[type="text"], select {
+      input[type="text"], input[type="date"], select {
         padding: 0.45rem 0.6rem;
         width: 100%;
         border-radius: 0.6rem;
@@ -467,7 +927,7 @@ ADD_TEMPLATE = """
         font-size: 0.9rem;
       }
 
-      input[type="text"]:focus, select:focus {
+      input[type="text"]:focus, input[type="date"]:focus, select:focus {
         outline: none;
         border-color: #2563eb;
         box-shadow: 0 0 0 1px #bfdbfe;
@@ -538,6 +998,15 @@ ADD_TEMPLATE = """
             <option value="HR_Admin">HR_Admin</option>
           </select>
 
+          <label for="start_date">Start date</label>
+          <input type="date" id="start_date" name="start_date">
+          <p class="subtitle">Optioneel. De werkplek wordt dan 's nachts vóór de eerste werkdag aangemaakt; leeg = direct.</p>
+
+          <label>
+            <input type="checkbox" name="urgent" value="1"> Urgent
+          </label>
+          <p class="subtitle">Gaat in de automation queue voor op lopende imports.</p>
+
           <div class="buttons">
             <button type="submit" class="btn btn-primary">Create &amp; start onboarding</button>
             <a href="{{ url_for('index') }}" class="btn btn-secondary">Cancel</a>
@@ -698,7 +1167,10 @@ LIST_TEMPLATE = """
             <h1>Employees</h1>
             <p class="subtitle">Overzicht van alle medewerkers in de HR-database.</p>
           </div>
-          <a href="{{ url_for('index') }}" class="btn">← Back to portal</a>
+          <div>
+            <a href="{{ url_for('export_employees') }}" class="btn">Export CSV</a>
+            <a href="{{ url_for('index') }}" class="btn">← Back to portal</a>
+          </div>
         </div>
 
         {% if employees %}
@@ -733,7 +1205,201 @@ LIST_TEMPLATE = """
                       {{ 'Yes' if emp.deprovisioned else 'No' }}
                     </span>
                   </td>
-                  <td class="last-action">{{ emp.last_action or '-' }}</td>
+                  <td class="last-action">{{ describe_event(emp.last_event, emp.last_event_at, emp.last_event_detail) }}</td>
+                </tr>
+              {% endfor %}
+            </tbody>
+          </table>
+        {% else %}
+          <p class="empty">Er staan nog geen medewerkers in de database.</p>
+        {% endif %}
+      </div>
+    </div>
+  </body>
+</html>
+"""
+
+DASHBOARD_TEMPLATE = """
+<!doctype html>
+<html>
+  <head>
+    <meta charset="utf-8">
+    <title>Dashboard - Innovatech HR Portal</title>
+    <style>
+      body {
+        font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
+        margin: 0;
+        padding: 0;
+        background: radial-gradient(circle at top, #e0f2fe 0, #f9fafb 45%, #eef2ff 100%);
+      }
+
+      .container {
+        max-width: 980px;
+        margin: 2.2rem auto;
+        padding: 0 1.5rem;
+      }
+
+      .card {
+        background: linear-gradient(135deg, rgba(255,255,255,0.96), rgba(239,246,255,0.98));
+        border-radius: 1rem;
+        padding: 1.5rem 1.7rem 1.7rem;
+        box-shadow:
+          0 10px 25px rgba(15, 23, 42, 0.08),
+          0 0 0 1px rgba(148, 163, 184, 0.25);
+      }
+
+      .header-row {
+        display: flex;
+        justify-content: space-between;
+        align-items: baseline;
+        gap: 1rem;
+        margin-bottom: 0.9rem;
+      }
+
+      h1 {
+        margin: 0;
+        font-size: 1.5rem;
+        letter-spacing: -0.03em;
+      }
+
+      p.subtitle {
+        margin: 0.3rem 0 0;
+        font-size: 0.88rem;
+        color: #6b7280;
+      }
+
+      .btn {
+        display: inline-flex;
+        align-items: center;
+        justify-content: center;
+        padding: 0.4rem 0.9rem;
+        border-radius: 999px;
+        border: 1px solid #d1d5db;
+        font-size: 0.85rem;
+        font-weight: 500;
+        text-decoration: none;
+        cursor: pointer;
+        background: rgba(255,255,255,0.9);
+        color: #111827;
+      }
+
+      .btn:hover { background: #f9fafb; }
+
+      .tiles {
+        display: grid;
+        grid-template-columns: repeat(auto-fit, minmax(140px, 1fr));
+        gap: 0.8rem;
+        margin: 0.6rem 0 1.2rem;
+      }
+
+      .tile {
+        border-radius: 0.8rem;
+        padding: 0.8rem 1rem;
+        background: rgba(255,255,255,0.9);
+        box-shadow: 0 0 0 1px rgba(148, 163, 184, 0.25);
+      }
+
+      .tile .label {
+        font-size: 0.75rem;
+        text-transform: uppercase;
+        letter-spacing: 0.06em;
+        color: #6b7280;
+      }
+
+      .tile .value {
+        font-size: 1.5rem;
+        font-weight: 600;
+        margin-top: 0.2rem;
+      }
+
+      .tile-warning .value { color: #b91c1c; }
+
+      table {
+        width: 100%;
+        border-collapse: collapse;
+        margin-top: 0.6rem;
+        font-size: 0.86rem;
+      }
+
+      th, td {
+        padding: 0.5rem 0.4rem;
+        border-bottom: 1px solid #e5e7eb;
+        text-align: left;
+      }
+
+      th {
+        font-size: 0.78rem;
+        text-transform: uppercase;
+        letter-spacing: 0.06em;
+        color: #6b7280;
+      }
+
+      td.num, th.num { text-align: right; }
+
+      tr:last-child td { border-bottom: none; }
+
+      .empty {
+        margin-top: 0.5rem;
+        font-size: 0.88rem;
+        color: #6b7280;
+      }
+
+      .muted-note {
+        font-size: 0.8rem;
+        color: #6b7280;
+      }
+    </style>
+  </head>
+  <body>
+    <div class="container">
+      <div class="card">
+        <div class="header-row">
+          <div>
+            <h1>Dashboard</h1>
+            <p class="subtitle">Headcount en onboarding/offboarding-pipeline per afdeling.</p>
+          </div>
+          <div>
+            {% if source == 'matview' %}
+              <form method="post" action="{{ url_for('refresh_dashboard') }}" style="display:inline;">
+                <button type="submit" class="btn">Refresh</button>
+              </form>
+            {% endif %}
+            <a href="{{ url_for('index') }}" class="btn">← Back to portal</a>
+          </div>
+        </div>
+
+        <div class="tiles">
+          <div class="tile"><div class="label">Total</div><div class="value">{{ totals.total }}</div></div>
+          <div class="tile"><div class="label">New</div><div class="value">{{ totals.new }}</div></div>
+          <div class="tile"><div class="label">Active</div><div class="value">{{ totals.active }}</div></div>
+          <div class="tile"><div class="label">Inactive</div><div class="value">{{ totals.inactive }}</div></div>
+          <div class="tile tile-warning"><div class="label">Pending deprovisioning</div><div class="value">{{ totals.pending_deprovisioning }}</div></div>
+          <div class="tile"><div class="label">Devices enrolled</div><div class="value">{{ totals.device_enrolled }}</div></div>
+        </div>
+
+        {% if departments %}
+          <table>
+            <thead>
+              <tr>
+                <th>Department</th>
+                <th class="num">New</th>
+                <th class="num">Active</th>
+                <th class="num">Inactive</th>
+                <th class="num">Pending deprovisioning</th>
+                <th class="num">Devices enrolled</th>
+                <th class="num">Total</th>
+              </tr>
+            </thead>
+            <tbody>
+              {% for dept in departments %}
+                <tr>
+                  <td>{{ dept.department }}</td>
+                  <td class="num">{{ dept.new }}</td>
+                  <td class="num">{{ dept.active }}</td>
+                  <td class="num">{{ dept.inactive }}</td>
+                  <td class="num">{{ dept.pending_deprovisioning }}</td>
+                  <td class="num">{{ dept.device_enrolled }}</td>
+                  <td class="num">{{ dept.total }}</td>
                 </tr>
               {% endfor %}
             </tbody>
@@ -741,66 +1407,257 @@ LIST_TEMPLATE = """
         {% else %}
           <p class="empty">Er staan nog geen medewerkers in de database.</p>
         {% endif %}
+
+        {% if stage_report %}
+          <h2 style="font-size:1.05rem; margin:1.4rem 0 0;">Onboarding stage latency</h2>
+          <p class="subtitle">p50/p95 over de laatste {{ stage_report_n }} afgeronde onboardings.</p>
+          <table>
+            <thead>
+              <tr>
+                <th>Stage</th>
+                <th class="num">Samples</th>
+                <th class="num">p50</th>
+                <th class="num">p95</th>
+              </tr>
+            </thead>
+            <tbody>
+              {% for row in stage_report %}
+                <tr>
+                  <td>{{ row.stage }}</td>
+                  <td class="num">{{ row.samples }}</td>
+                  <td class="num">{{ '%.1f s'|format(row.p50_ms / 1000) }}</td>
+                  <td class="num">{{ '%.1f s'|format(row.p95_ms / 1000) }}</td>
+                </tr>
+              {% endfor %}
+            </tbody>
+          </table>
+        {% endif %}
+
+        <p class="muted-note">
+          Bron: {{ 'employee_summary_mv (materialized view)' if source == 'matview' else 'employee_summary (trigger-maintained)' }}.
+        </p>
       </div>
     </div>
   </body>
 </html>
 """
 
+# ---------- TRACING ----------
+
+@app.before_request
+def _start_request_span():
+    if INFLIGHT_REQUESTS is not None:
+        INFLIGHT_REQUESTS.inc()
+        g.counted_inflight = True
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace_span = tracing.start_span(
+        f"HTTP {request.method} {route}",
+        parent=tracing.parse_traceparent(request.headers.get("traceparent")),
+        attributes={"http.method": request.method, "http.route": route},
+    ).activate()
+
+
+@app.after_request
+def _tag_request_span(response):
+    span = g.get("trace_span")
+    if span is not None:
+        span.set_attribute("http.status_code", response.status_code)
+        if span.recording:
+            response.headers["traceparent"] = span.context.to_traceparent()
+    return response
+
+
+@app.after_request
+def _remember_written_lsn(response):
+    # volgende reads (bv. de redirect na add/offboard) zien de eigen write
+    lsn = g.get("written_lsn")
+    if lsn:
+        response.set_cookie(
+            MIN_LSN_COOKIE, lsn, max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite="Lax"
+        )
+    return response
+
+
+@app.after_request
+def _compress_and_cache(response):
+    """Cache-Control/Vary per endpoint en gzip/br-compressie (zie http_cache.py)."""
+    policy = http_cache.cache_policy(request.endpoint)
+    if policy is not None and request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        cache_control, vary = policy
+        response.headers.setdefault("Cache-Control", cache_control)
+        for header in vary:
+            response.vary.add(header)
+
+    if (request.method == "HEAD" or response.direct_passthrough
+            or not http_cache.compressible(response.status_code, response.mimetype, response.headers)):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = http_cache.choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # lengte is vooraf onbekend: altijd comprimeren, chunk voor chunk
+        response.response = http_cache.compress_chunks(response.iter_encoded(), encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < http_cache.HTTP_COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(http_cache.compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+@app.teardown_request
+def _end_request_span(exc):
+    if g.pop("counted_inflight", False):
+        INFLIGHT_REQUESTS.dec()
+    span = g.pop("trace_span", None)
+    if span is not None:
+        if exc is not None:
+            span.record_exception(exc)
+        span.end()
+
+
+def trace_detail(**extra):
+    """Event-detail met de traceparent van de huidige request (voor de workers)."""
+    detail = {key: value for key, value in extra.items() if value is not None}
+    traceparent = tracing.current_traceparent()
+    if traceparent:
+        detail["traceparent"] = traceparent
+    return detail or None
+
+
+def queue_priority(form) -> int:
+    """Vinkje 'urgent' in het formulier -> urgente lane in de automation queue."""
+    return claims.PRIORITY_URGENT if form.get("urgent") else claims.PRIORITY_NORMAL
+
+
+def onboarding_schedule(form):
+    """(start_date, onboard_after, detail) voor een nieuwe medewerker; onboard_after None = direct."""
+    start_date = schedule.parse_date(form.get("start_date"))
+    onboard_after = schedule.provision_at(start_date, events.utcnow())
+    detail = trace_detail(
+        start_date=start_date.isoformat() if start_date else None,
+        onboard_after=onboard_after.isoformat() if onboard_after else None,
+    )
+    return start_date, onboard_after, detail
+
+
+# ---------- READS (via coalesced_read) ----------
+
+def fetch_employee(conn, email):
+    """(employee, timeline) voor de detailpagina; (None, []) als het email onbekend is."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(EMPLOYEE_BY_EMAIL_SQL, (email,))
+        employee = cur.fetchone()
+    return employee, events.fetch_timeline(conn, employee["id"]) if employee else []
+
+
+def fetch_employee_list(conn):
+    with conn.cursor() as cur:
+        cur.execute(LIST_EMPLOYEES_SQL)
+        return records.EmployeeListRow.from_rows(cur.fetchall())
+
+
+def fetch_progress(conn, employee_id):
+    """progress_payload() voor één employee, of None als hij niet bestaat."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(PROGRESS_SQL, (employee_id,))
+        employee = cur.fetchone()
+        if employee is None:
+            return None
+        cur.execute(PROGRESS_EVENTS_SQL, (employee_id, PROGRESS_EVENTS_LIMIT))
+        return progress_payload(employee, cur.fetchall())
+
+
+def fetch_dashboard(conn):
+    """(headcount-groepen, stage report) voor /dashboard."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(dashboard_sql())
+        groups = cur.fetchall()
+    return groups, events.fetch_stage_report(conn, STAGE_REPORT_DEFAULT_N)
+
+
 # ---------- ROUTES ----------
 
 @app.route("/", methods=["GET"])
 def index():
     email = request.args.get("email", "").strip()
     employee = None
+    timeline = []
 
     if email:
-        conn = get_db_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    """
-                    SELECT id, name, email, department, role, status,
-                           cloud_account_created, deprovisioned,
-                           device_enrolled, workspace_username,
-                           workspace_temp_password, last_action
-                    FROM employees
-                    WHERE email = %s;
-                    """,
-                    (email,),
-                )
-                employee = cur.fetchone()
-        finally:
-            conn.close()
+        employee, timeline = coalesced_read("employee", fetch_employee, email)
 
-    return render_template_string(INDEX_TEMPLATE, email=email, employee=employee)
+    return render_template_string(
+        INDEX_TEMPLATE, email=email, employee=employee, timeline=timeline, now=events.utcnow()
+    )
 
 
 @app.route("/employees", methods=["GET"])
 def list_employees():
     """Overzicht met alle medewerkers."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT id, name, email, department, role, status,
-                       deprovisioned, last_action
-                FROM employees
-                ORDER BY id;
-                """
-            )
-            employees = cur.fetchall()
-    finally:
-        conn.close()
+    employees = coalesced_read("employee_list", fetch_employee_list)
+
+    # gestreamd renderen: de eerste rijen (gecomprimeerd) onderweg terwijl de rest nog rendert
+    return Response(
+        http_cache.buffered(stream_template_string(LIST_TEMPLATE, employees=employees)),
+        mimetype="text/html",
+    )
+
 
-    return render_template_string(LIST_TEMPLATE, employees=employees)
+EXPORT_COLUMNS = ["id", "name", "email", "department", "role", "status", "deprovisioned", "last_action"]
+
+
+def export_rows(rows, header=True):
+    """
+    CSV-regels (optioneel header + één regel per employee) als generator van
+    strings; rows zijn records.EmployeeListRow.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            row.id, row.name, row.email, row.department, row.role, row.status, row.deprovisioned,
+            events.describe_event(row.last_event, row.last_event_at, row.last_event_detail),
+        ])
+        if buf.tell() > 64 * 1024:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+@app.route("/employees/export.csv", methods=["GET"])
+def export_employees():
+    """Alle medewerkers als CSV, gestreamd vanaf een server-side cursor (read replica)."""
+    def generate():
+        with read_connection() as conn:
+            # named cursor: rijen komen in blokken binnen i.p.v. alles in geheugen
+            with conn.cursor(name="employees_export") as cur:
+                cur.itersize = 2000
+                cur.execute(LIST_EMPLOYEES_SQL)
+                yield from export_rows(map(records.EmployeeListRow._make, cur))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=employees.csv"},
+    )
 
 
 @app.route("/add", methods=["GET", "POST"])
 def add_employee():
-    if request.method == "GET":
-        return render_template_string(ADD_TEMPLATE)
+    if request.method in ("GET", "HEAD"):
+        # statisch formulier: zwakke ETag, een revalidatie zonder wijziging geeft 304
+        response = make_response(render_template_string(ADD_TEMPLATE))
+        response.set_etag(http_cache.etag_for(response.get_data()), weak=True)
+        return response.make_conditional(request)
 
     # POST: form submit -> employee record & onboarding-script starten
     name = request.form.get("name", "").strip()
@@ -811,34 +1668,26 @@ def add_employee():
     if not name or not email or not department or not role:
         return render_template_string(ADD_TEMPLATE)
 
-    # Deze worden (zoals in onboarding.py) uiteindelijk door automation ingevuld;
-    # hier gebruiken we ze alleen voor logica/consistente helper-functies.
-    workspace_username = generate_workspace_username(email)
-    workspace_password = generate_temp_password()
-
-    when = datetime.datetime.utcnow().isoformat() + "Z"
-    action_text = f"Onboarding requested at {when}"
+    # workspace-username en tijdelijk wachtwoord vult de automation in (hrcore/identity.py)
+    start_date, onboard_after, detail = onboarding_schedule(request.form)
+    batch = events.EventBatch(actor="portal")
 
-    conn = get_db_connection()
-    try:
+    with write_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO employees (name, email, department, role, status, last_action)
-                VALUES (%s, %s, %s, %s, 'NEW', %s);
-                """,
-                (name, email, department, role, action_text),
-            )
-        conn.commit()
-    finally:
-        conn.close()
-
-    # onboarding.py automatisch starten (zoals voorheen)
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    onboarding_script = os.path.join(project_root, "automation", "onboarding.py")
-    subprocess.Popen(["python", onboarding_script])
-
-    print(f"[PORTAL] Created NEW employee {email}, onboarding.py started")
+            cur.execute(INSERT_EMPLOYEE_SQL, (
+                name, email, department, role, start_date, onboard_after,
+                queue_priority(request.form), onboard_after,
+            ))
+            employee_id = cur.fetchone()[0]
+            batch.add(employee_id, events.ONBOARDING_REQUESTED, detail=detail)
+            batch.flush(cur)
+            claims.notify(cur, "onboarding" if onboard_after is None else schedule.NOTIFY_PAYLOAD)
+
+    if onboard_after is None:
+        start_automation("onboarding")
+        print(f"[PORTAL] Created NEW employee {email}, onboarding requested ({AUTOMATION_MODE})")
+    else:
+        print(f"[PORTAL] Created NEW employee {email}, onboarding scheduled after {onboard_after.isoformat()}")
 
     # Terug naar detailpagina
     return redirect(url_for("index", email=email))
@@ -847,49 +1696,397 @@ def add_employee():
 @app.route("/offboard/<int:employee_id>", methods=["POST"])
 def offboard_employee(employee_id: int):
     """
-    Markeer employee als INACTIVE en start offboarding.py.
+    Markeer employee als INACTIVE en start offboarding.py, of plan de
+    offboarding op de vertrekdatum (leave_date) als die in de toekomst ligt.
 
     offboarding.py zelf zorgt ervoor dat alleen status = INACTIVE
     én deprovisioned = FALSE verder verwerkt worden. :contentReference[oaicite:2]{index=2}
     """
-    conn = get_db_connection()
-    email = None
-    try:
+    leave_at = schedule.leave_time(schedule.parse_date(request.form.get("leave_date")), events.utcnow())
+    priority = queue_priority(request.form)
+    with write_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT email FROM employees WHERE id = %s;", (employee_id,))
+            cur.execute(EMPLOYEE_EMAIL_BY_ID_SQL, (employee_id,))
             row = cur.fetchone()
             if not row:
                 return redirect(url_for("index"))
             email = row["email"]
 
-        when = datetime.datetime.utcnow().isoformat() + "Z"
-        action_text = f"Marked INACTIVE from portal at {when}"
+        batch = events.EventBatch(actor="portal")
+
+        with conn.cursor() as cur:
+            if leave_at is not None:
+                cur.execute(SCHEDULE_LEAVE_SQL, (leave_at, priority, employee_id))
+                if cur.rowcount == 0:
+                    # intussen al INACTIVE: geen offboarding_scheduled vastleggen
+                    return jsonify({"error": "employee is already INACTIVE"}), 409
+                batch.add(employee_id, events.OFFBOARDING_SCHEDULED,
+                          detail=trace_detail(leave_at=leave_at.isoformat()))
+                batch.flush(cur)
+                claims.notify(cur, schedule.NOTIFY_PAYLOAD)
+            else:
+                cur.execute(MARK_INACTIVE_SQL, (priority, employee_id))
+                batch.add(employee_id, events.OFFBOARDING_REQUESTED, detail=trace_detail())
+                batch.flush(cur)
+                claims.notify(cur, "offboarding")
+
+    if leave_at is not None:
+        print(f"[PORTAL] Scheduled offboarding of {email} (ID {employee_id}) at {leave_at.isoformat()}")
+        return redirect(url_for("index", email=email))
+
+    start_automation("offboarding")
+
+    print(f"[PORTAL] Marked employee {email} (ID {employee_id}) INACTIVE, offboarding requested ({AUTOMATION_MODE})")
+
+    return redirect(url_for("index", email=email))
 
+
+@app.route("/employees/<int:employee_id>/transfer", methods=["POST"])
+def transfer_employee(employee_id: int):
+    """
+    Wijzig department/role. Voor een ACTIVE employee past transfer.py alleen de
+    delta toe (access groups, app bundle, machine type) op het bestaande account
+    en de bestaande VM.
+    """
+    department = request.form.get("department", "").strip()
+    role = request.form.get("role", "").strip()
+    if not department or not role:
+        return redirect(url_for("index"))
+
+    with write_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE employees
-                SET status = 'INACTIVE',
-                    last_action = %s,
-                    updated_at = NOW()
-                WHERE id = %s;
-                """,
-                (action_text, employee_id),
-            )
-        conn.commit()
-    finally:
-        conn.close()
-
-    # offboarding-script starten
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    offboarding_script = os.path.join(project_root, "automation", "offboarding.py")
-    subprocess.Popen(["python", offboarding_script])
-
-    print(f"[PORTAL] Marked employee {email} (ID {employee_id}) INACTIVE, offboarding.py started")
+            cur.execute(TRANSFER_SQL, {
+                "id": employee_id,
+                "department": department,
+                "role": role,
+                "priority": queue_priority(request.form),
+            })
+            row = cur.fetchone()
+            if not row:
+                # onbekend, INACTIVE of niets gewijzigd
+                cur.execute(EMPLOYEE_EMAIL_BY_ID_SQL, (employee_id,))
+                row = cur.fetchone()
+                return redirect(url_for("index", email=row[0]) if row else url_for("index"))
+            email, pending, old_department, old_role = row
+
+            batch = events.EventBatch(actor="portal")
+            batch.add(employee_id, events.TRANSFER_REQUESTED, detail=trace_detail(
+                from_department=old_department, from_role=old_role,
+                department=department, role=role,
+            ))
+            batch.flush(cur)
+            if pending:
+                claims.notify(cur, "transfer")
+
+    print(f"[PORTAL] {email} (ID {employee_id}): {old_department}/{old_role} -> {department}/{role}")
+    if pending:
+        start_automation("transfer")
+        print(f"[PORTAL] Transfer of {email} requested ({AUTOMATION_MODE})")
 
     return redirect(url_for("index", email=email))
 
 
+@app.route("/employees/<int:employee_id>/workstation/start", methods=["POST"])
+def start_workstation(employee_id: int):
+    """On-demand start van de workstation VM (uitgevoerd door power_scheduler.py)."""
+    with write_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(REQUEST_WORKSTATION_START_SQL, (power.POWER_ON_DEMAND_HOURS, employee_id))
+            row = cur.fetchone()
+            if not row:
+                return redirect(url_for("index"))
+            cur.execute("SELECT pg_notify(%s, %s);", (power.NOTIFY_CHANNEL, str(employee_id)))
+
+    print(f"[PORTAL] Requested on-demand workstation start for employee ID {employee_id}")
+    return redirect(url_for("index", email=row[0]))
+
+
+@app.route("/dashboard", methods=["GET"])
+def dashboard():
+    """Headcount per afdeling/status uit de summary-tabel (O(groups), geen full scan)."""
+    groups, stage_report = coalesced_read("dashboard", fetch_dashboard)
+
+    totals, departments = summarize_groups(groups)
+    return render_template_string(
+        DASHBOARD_TEMPLATE,
+        totals=totals,
+        departments=departments,
+        source=DASHBOARD_SOURCE,
+        stage_report=stage_report,
+        stage_report_n=STAGE_REPORT_DEFAULT_N,
+    )
+
+
+@app.route("/dashboard/refresh", methods=["POST"])
+def refresh_dashboard():
+    """Ververs de materialized view (alleen relevant bij DASHBOARD_SOURCE=matview)."""
+    if DASHBOARD_SOURCE == "matview":
+        # CONCURRENTLY mag niet binnen een transactieblok draaien
+        with get_db_router().primary_autocommit() as conn, conn.cursor() as cur:
+            cur.execute(REFRESH_DASHBOARD_SQL)
+
+        print("[PORTAL] Refreshed employee_summary_mv")
+
+    return redirect(url_for("dashboard"))
+
+
+def _event_to_json(ev):
+    return {
+        "event_type": ev["event_type"],
+        "occurred_at": ev["occurred_at"].isoformat(),
+        "duration_ms": ev["duration_ms"],
+        "actor": ev["actor"],
+        "detail": ev["detail"],
+        "description": events.describe_event(ev["event_type"], ev["occurred_at"], ev["detail"]),
+    }
+
+
+def timeline_payload(employee_id, timeline) -> dict:
+    stages = {}
+    for ev in timeline:
+        if ev["event_type"] == events.STAGE_COMPLETED and ev["duration_ms"] is not None:
+            stage = (ev["detail"] or {}).get("stage")
+            stages[stage] = stages.get(stage, 0) + ev["duration_ms"]
+
+    return {
+        "employee_id": employee_id,
+        "events": [_event_to_json(ev) for ev in timeline],
+        "stage_durations_ms": stages,
+    }
+
+
+def progress_done(employee) -> bool:
+    """Geen automation-werk meer onderweg: de live voortgang kan stoppen."""
+    if employee["in_progress"]:
+        return False
+    if employee["status"] == "ACTIVE":
+        return not employee["transfer_pending"]
+    if employee["status"] == "INACTIVE":
+        return employee["deprovisioned"]
+    return False
+
+
+def progress_payload(employee, recent_events) -> dict:
+    """Stand voor één SSE-bericht; recent_events nieuwste eerst (PROGRESS_EVENTS_SQL)."""
+    # last_action zoals LATEST_EVENT_JOIN: stage-timings tellen niet mee
+    latest = next(
+        (ev for ev in recent_events if ev["event_type"] not in events.STAGE_EVENT_TYPES), None
+    )
+    return {
+        "employee_id": employee["id"],
+        "status": employee["status"],
+        "in_progress": employee["in_progress"],
+        "done": progress_done(employee),
+        "last_action": events.describe_event(
+            latest["event_type"], latest["occurred_at"], latest["detail"]
+        ) if latest else "-",
+        "events": [_event_to_json(ev) for ev in reversed(recent_events)],
+    }
+
+
+def clamp_report_n(last_n) -> int:
+    return max(1, min(last_n or STAGE_REPORT_DEFAULT_N, 10000))
+
+
+def stage_report_payload(last_n, rows) -> dict:
+    return {
+        "last_n": last_n,
+        "stages": [
+            {
+                "stage": row["stage"],
+                "samples": row["samples"],
+                "p50_ms": round(row["p50_ms"], 1),
+                "p95_ms": round(row["p95_ms"], 1),
+            }
+            for row in rows
+        ],
+    }
+
+
+@app.route("/employees/<int:employee_id>/timeline", methods=["GET"])
+def employee_timeline(employee_id: int):
+    """Alle events + stage-duur van één employee als JSON."""
+    timeline = coalesced_read("timeline", events.fetch_timeline, employee_id)
+
+    return jsonify(timeline_payload(employee_id, timeline))
+
+
+_progress_hub = None
+_progress_hub_lock = threading.Lock()
+
+
+def get_progress_hub() -> progress.ProgressHub:
+    """Eén hub + LISTEN-connectie (primary) per proces; gestart bij de eerste kijker."""
+    global _progress_hub
+    if _progress_hub is None:
+        with _progress_hub_lock:
+            if _progress_hub is None:
+                hub = progress.ProgressHub(queue.Queue)
+                progress.start_listener(hub, events.PROGRESS_CHANNEL, db.connect, fetch_progress)
+                _progress_hub = hub
+    return _progress_hub
+
+
+@app.route("/employees/<int:employee_id>/progress", methods=["GET"])
+def employee_progress(employee_id: int):
+    """
+    Live voortgang als Server-Sent Events: eerst de huidige stand, daarna een
+    bericht per wijziging (NOTIFY via de gedeelde listener, geen polling).
+    De stream sluit zodra er geen automation-werk meer loopt.
+    """
+    hub = get_progress_hub()
+    # eerst aanmelden, dan lezen: een wijziging daartussen wordt niet gemist
+    watcher = hub.subscribe(employee_id)
+    try:
+        snapshot = fresh_read("progress", fetch_progress, employee_id)
+    except Exception:
+        hub.unsubscribe(employee_id, watcher)
+        raise
+    if snapshot is None:
+        hub.unsubscribe(employee_id, watcher)
+        return jsonify({"error": "employee not found"}), 404
+
+    def generate():
+        yield progress.sse("progress", snapshot)
+        if snapshot["done"]:
+            return
+        deadline = time.monotonic() + progress.PROGRESS_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                current = watcher.get(timeout=progress.PROGRESS_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield progress.KEEPALIVE
+                continue
+            if current is None:
+                continue
+            yield progress.sse("progress", current)
+            if current["done"]:
+                return
+
+    response = Response(
+        generate(), mimetype="text/event-stream", headers={"X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(lambda: hub.unsubscribe(employee_id, watcher))
+    return response
+
+
+@app.route("/reports/onboarding-stages", methods=["GET"])
+def onboarding_stage_report():
+    """p50/p95 per onboarding-stap over de laatste N onboardings (?n=50)."""
+    last_n = clamp_report_n(request.args.get("n", STAGE_REPORT_DEFAULT_N, type=int))
+
+    rows = coalesced_read("stage_report", events.fetch_stage_report, last_n)
+
+    return jsonify(stage_report_payload(last_n, rows))
+
+
+# ---------- HEALTH / METRICS (k8s probes, HPA) ----------
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: het proces reageert (geen DB-I/O, anders herstart k8s bij een DB-storing)."""
+    return jsonify({"status": "ok"})
+
+
+health = HealthMonitor(interval=HEALTH_CHECK_INTERVAL, critical=["db_primary"])
+
+
+def _check_db_primary():
+    router = get_db_router()
+    router.ping()  # pooled connectie, geen nieuwe connectie per check
+    return router.status()["primary"]
+
+
+def _check_automation_queue():
+    with get_db_router().read() as conn:
+        return claims.queue_depth(conn)
+
+
+def _check_db_replicas():
+    # lag wordt door de router zelf gemeten bij reads; hier alleen de laatste stand
+    return get_db_router().status()["replicas"]
+
+
+HEALTH_CHECKS = {
+    "db_primary": _check_db_primary,
+    "automation_queue": _check_automation_queue,
+    "db_replicas": _check_db_replicas,
+}
+
+
+_schedule_thread = None
+
+
+def schedule_tick_forever() -> None:
+    """
+    AUTOMATION_MODE=subprocess: zonder worker start niemand de geplande hires en
+    vertrekkers. Zelfde aanpak als de worker (schedule.DueQueue): slapen tot het
+    eerstvolgende onboarding/leave tijdstip (hooguit SCHEDULE_TICK_SECONDS) en
+    dan onboarding.py / offboarding.py starten.
+    """
+    due = schedule.DueQueue()
+    pending = {"onboarding", "offboarding"}  # bij opstart: gemiste tijdstippen inhalen
+    while True:
+        try:
+            for queue in pending:
+                start_automation(queue)
+            with get_db_router().read() as conn:
+                due.reset(schedule.next_due(conn))
+            time.sleep(due.timeout(events.utcnow(), SCHEDULE_TICK_SECONDS))
+            pending = due.pop_due(events.utcnow())
+        except Exception as e:
+            print(f"[PORTAL] Schedule tick failed: {e}")
+            pending = set()
+            time.sleep(SCHEDULE_TICK_SECONDS)
+
+
+def start_background() -> None:
+    """
+    Health checks starten bij het laden van de app (ook onder een WSGI server),
+    zodat de eerste probe al een uitkomst vindt. De eerste check maakt de pools
+    aan; is de DB nog niet bereikbaar, dan is dat een mislukte check en geen
+    crash bij import. In subprocess-modus ook de schedule tick.
+    """
+    global _schedule_thread
+    if not PORTAL_BACKGROUND:
+        return
+    # Werkzeug reloader: alleen het child-proces (WERKZEUG_RUN_MAIN) serveert requests
+    if __name__ == "__main__" and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return
+    health.start(HEALTH_CHECKS)
+    if AUTOMATION_MODE != "worker" and _schedule_thread is None:
+        _schedule_thread = threading.Thread(target=schedule_tick_forever, name="schedule-tick", daemon=True)
+        _schedule_thread.start()
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """
+    Readiness uit de gecachte achtergrondcheck (pool, queue depth, latency).
+    Alleen de snapshot lezen: geen DB-I/O in de request zelf.
+    """
+    ready, payload = health.snapshot()
+    return jsonify(payload), (200 if ready else 503)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metrics van deze replica (inflight requests, pool wait/in-use)."""
+    if generate_latest is None:
+        return Response("prometheus_client not installed\n", status=501, mimetype="text/plain")
+
+    if _db_router is not None:
+        status = _db_router.status()
+        DB_POOL_IN_USE.labels(node="primary").set(status["primary"]["in_use"])
+        for i, replica in enumerate(status["replicas"]):
+            DB_POOL_IN_USE.labels(node=f"replica-{i}").set(replica["in_use"])
+
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+
+start_background()
+
+
 if __name__ == "__main__":
     # Dev-run: in Cloud Shell / lokaal
     app.run(host="0.0.0.0", port=8080, debug=True)
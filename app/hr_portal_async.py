@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Async variant van de HR portal (Quart + psycopg 3 AsyncConnectionPool).
+
+Zelfde routes, templates en queries als hr_portal.py, maar alle Postgres I/O
+en het starten van de automation-scripts zijn awaitable. Eén proces kan zo
+honderden gelijktijdige trage requests (grote lijsten, zoekopdrachten)
+openhouden zonder een worker-thread per request te blokkeren.
+
+Starten:
+    python app/hr_portal_async.py
+    # of via een ASGI server:
+    hypercorn --bind 0.0.0.0:8080 --chdir app hr_portal_async:app
+
+Pool-instellingen via env vars: ASYNC_DB_POOL_MIN (default 2),
+ASYNC_DB_POOL_MAX (default 20), ASYNC_DB_POOL_TIMEOUT (seconden, default 10).
+"""
+
+import os
+import sys
+import asyncio
+
+import psycopg
+from psycopg.rows import args_row, dict_row
+from psycopg_pool import AsyncConnectionPool
+from quart import Quart, Response, request, render_template_string, redirect, url_for, jsonify, g
+
+# Templates, queries en helpers delen met de Flask-app (zelfde gedrag);
+# hr_portal zet ook de project-root (hrcore/) op sys.path. Zijn health-thread
+# niet starten: deze app heeft een eigen (asyncio) monitor.
+os.environ.setdefault("PORTAL_BACKGROUND", "0")
+import hr_portal as portal  # noqa: E402
+import http_cache
+import progress
+from health import HealthMonitor
+from single_flight import AsyncSingleFlight
+from hrcore import claims, events, power, records, schedule, tracing  # noqa: E402
+
+tracing.set_service_name("hr-portal-async")
+
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "2"))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "20"))
+ASYNC_DB_POOL_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_TIMEOUT", "10"))
+
+app = Quart(__name__)
+app.jinja_env.globals["describe_event"] = events.describe_event
+app.jinja_env.globals["workstation_profile"] = portal.workstation_profile_summary
+app.jinja_env.globals["local_time"] = schedule.format_local
+
+pool = None
+health_task = None
+progress_task = None
+schedule_task = None
+progress_hub = progress.ProgressHub(asyncio.Queue)
+health = HealthMonitor(interval=portal.HEALTH_CHECK_INTERVAL, critical=["db_primary"])
+
+
+def _conninfo() -> str:
+    return psycopg.conninfo.make_conninfo(
+        host=portal.DB_HOST,
+        port=portal.DB_PORT,
+        dbname=portal.DB_NAME,
+        user=portal.DB_USER,
+        password=portal.DB_PASSWORD,
+    )
+
+
+@app.before_serving
+async def _open_pool():
+    global pool, health_task, progress_task, schedule_task
+    pool = AsyncConnectionPool(
+        _conninfo(),
+        min_size=ASYNC_DB_POOL_MIN,
+        max_size=ASYNC_DB_POOL_MAX,
+        timeout=ASYNC_DB_POOL_TIMEOUT,
+        kwargs={"row_factory": dict_row},
+        open=False,
+    )
+    await pool.open()
+    print(f"[PORTAL] Async DB pool ready ({ASYNC_DB_POOL_MIN}-{ASYNC_DB_POOL_MAX} connections)")
+    health_task = asyncio.create_task(_health_loop())
+    progress_task = asyncio.create_task(_progress_loop())
+    if portal.AUTOMATION_MODE != "worker":
+        schedule_task = asyncio.create_task(_schedule_loop())
+
+
+@app.after_serving
+async def _close_pool():
+    if health_task is not None:
+        health_task.cancel()
+    if progress_task is not None:
+        progress_task.cancel()
+    if schedule_task is not None:
+        schedule_task.cancel()
+    if pool is not None:
+        await pool.close()
+
+
+async def _health_loop():
+    """Zelfde checks als de sync portal, maar via de async pool."""
+    while True:
+        with health.measure("db_primary") as result:
+            await fetch_one("SELECT 1 AS ok;")
+            stats = pool.get_stats()
+            result.detail = {"in_use": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+                             "max": ASYNC_DB_POOL_MAX}
+        with health.measure("automation_queue") as result:
+            row = await fetch_one(claims.QUEUE_DEPTH_SQL)
+            result.detail = {"onboarding": row["onboarding"], "offboarding": row["offboarding"]}
+        await asyncio.sleep(health.interval)
+
+
+async def _progress_loop():
+    """Eén LISTEN-connectie voor alle SSE-kijkers van dit proces (zie progress.py)."""
+    while True:
+        try:
+            conn = await psycopg.AsyncConnection.connect(_conninfo(), autocommit=True)
+            async with conn:
+                await conn.execute(f"LISTEN {events.PROGRESS_CHANNEL};")
+                # na een (her)verbinding: gemiste NOTIFY's inhalen
+                await _publish_progress(progress_hub.watched())
+                async for notify in conn.notifies():
+                    await _publish_progress(progress_hub.watched(progress.parse_ids(notify.payload)))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[PROGRESS] Listener failed, reconnecting in {progress.PROGRESS_RECONNECT_SECONDS:.0f}s: {e}")
+            await asyncio.sleep(progress.PROGRESS_RECONNECT_SECONDS)
+
+
+async def _schedule_loop():
+    """AUTOMATION_MODE=subprocess: geplande hires/vertrekkers starten (zie portal.schedule_tick_forever)."""
+    due = schedule.DueQueue()
+    pending = {"onboarding", "offboarding"}
+    while True:
+        try:
+            for queue in pending:
+                await start_automation(queue)
+            row = await fetch_one(schedule.NEXT_DUE_SQL)
+            due.reset({"onboarding": row["onboarding"], "offboarding": row["offboarding"]})
+            await asyncio.sleep(due.timeout(events.utcnow(), portal.SCHEDULE_TICK_SECONDS))
+            pending = due.pop_due(events.utcnow())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[PORTAL] Schedule tick failed: {e}")
+            pending = set()
+            await asyncio.sleep(portal.SCHEDULE_TICK_SECONDS)
+
+
+async def _publish_progress(employee_ids):
+    # altijd een eigen read: een lopende (gedeelde) read kan van vóór de NOTIFY zijn
+    for employee_id in employee_ids:
+        progress_hub.publish(employee_id, await fetch_progress(employee_id))
+
+
+# ---------- DB HELPERS ----------
+
+async def _execute(cur, sql, params=None):
+    """cur.execute met een db.query span (zelfde instrumentatie als de sync portal)."""
+    with tracing.span("db.query", **{"db.system": "postgresql",
+                                     "db.statement": " ".join(sql.split())[:300]}):
+        await cur.execute(sql, params)
+
+
+async def fetch_one(sql, params=None):
+    async with pool.connection() as conn, conn.cursor() as cur:
+        await _execute(cur, sql, params)
+        return await cur.fetchone()
+
+
+async def fetch_all(sql, params=None, record=None):
+    """Alle rijen als dicts, of met `record` als compacte records (hrcore/records.py)."""
+    row_factory = args_row(record) if record is not None else dict_row
+    async with pool.connection() as conn, conn.cursor(row_factory=row_factory) as cur:
+        await _execute(cur, sql, params)
+        return await cur.fetchall()
+
+
+# gelijktijdige identieke reads delen één query; metrics via dezelfde counter als hr_portal.py
+_reads = AsyncSingleFlight(observer=portal.observe_read)
+
+
+async def coalesced(name, fetch, *args):
+    """await fetch(*args); requests met dezelfde name/args wachten op de lopende query."""
+    return await _reads.do((name,) + args, lambda: fetch(*args), name=name)
+
+
+async def fetch_employee(email):
+    """(employee, timeline) voor de detailpagina; (None, []) als het email onbekend is."""
+    employee = await fetch_one(portal.EMPLOYEE_BY_EMAIL_SQL, (email,))
+    if not employee:
+        return None, []
+    return employee, await fetch_all(events.TIMELINE_SQL, (employee["id"],))
+
+
+async def fetch_progress(employee_id):
+    """portal.progress_payload() voor één employee, of None als hij niet bestaat."""
+    employee = await fetch_one(portal.PROGRESS_SQL, (employee_id,))
+    if employee is None:
+        return None
+    recent = await fetch_all(portal.PROGRESS_EVENTS_SQL, (employee_id, portal.PROGRESS_EVENTS_LIMIT))
+    return portal.progress_payload(employee, recent)
+
+
+async def fetch_stage_report(last_n):
+    return await fetch_all(events.STAGE_REPORT_SQL, events.stage_report_params(last_n))
+
+
+async def fetch_dashboard():
+    """(headcount-groepen, stage report) voor /dashboard, parallel."""
+    return await asyncio.gather(
+        fetch_all(portal.dashboard_sql()),
+        fetch_stage_report(portal.STAGE_REPORT_DEFAULT_N),
+    )
+
+
+async def start_automation(queue: str):
+    """Start onboarding.py / offboarding.py zonder te wachten (niet in AUTOMATION_MODE=worker)."""
+    if portal.AUTOMATION_MODE == "worker":
+        return None  # de NOTIFY uit de write-transactie maakt de worker wakker
+    script = os.path.join(portal.PROJECT_ROOT, "automation", f"{queue}.py")
+    return await asyncio.create_subprocess_exec(
+        sys.executable, script, env=tracing.child_env()
+    )
+
+
+# ---------- TRACING / HTTP CACHING ----------
+
+@app.before_request
+async def _start_request_span():
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace_span = tracing.start_span(
+        f"HTTP {request.method} {route}",
+        parent=tracing.parse_traceparent(request.headers.get("traceparent")),
+        attributes={"http.method": request.method, "http.route": route},
+    ).activate()
+
+
+@app.after_request
+async def _tag_request_span(response):
+    span = g.get("trace_span")
+    if span is not None:
+        span.set_attribute("http.status_code", response.status_code)
+        if span.recording:
+            response.headers["traceparent"] = span.context.to_traceparent()
+    return response
+
+
+@app.after_request
+async def _compress_and_cache(response):
+    """Cache-Control/Vary per endpoint en gzip/br-compressie, zoals in hr_portal.py."""
+    policy = http_cache.cache_policy(request.endpoint)
+    if policy is not None and request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        cache_control, vary = policy
+        response.headers.setdefault("Cache-Control", cache_control)
+        for header in vary:
+            response.vary.add(header)
+
+    if request.method == "HEAD" or not http_cache.compressible(
+            response.status_code, response.mimetype, response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = http_cache.choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+
+    if isinstance(response.response, response.iterable_body_class):
+        # lengte is vooraf onbekend: altijd comprimeren, chunk voor chunk
+        response.response = response.iterable_body_class(_compressed_body(response.response, encoding))
+        response.headers.pop("Content-Length", None)
+    else:
+        data = await response.get_data()
+        if len(data) < http_cache.HTTP_COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(http_cache.compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+async def _compressed_body(body, encoding):
+    async with body as chunks:
+        async for out in http_cache.compress_chunks_async(chunks, encoding):
+            yield out
+
+
+@app.teardown_request
+async def _end_request_span(exc):
+    span = g.pop("trace_span", None)
+    if span is not None:
+        if exc is not None:
+            span.record_exception(exc)
+        span.end()
+
+
+# ---------- ROUTES ----------
+
+@app.route("/", methods=["GET"])
+async def index():
+    email = request.args.get("email", "").strip()
+    employee = None
+    timeline = []
+
+    if email:
+        employee, timeline = await coalesced("employee", fetch_employee, email)
+
+    return await render_template_string(
+        portal.INDEX_TEMPLATE, email=email, employee=employee, timeline=timeline, now=events.utcnow()
+    )
+
+
+@app.route("/employees", methods=["GET"])
+async def list_employees():
+    """Overzicht met alle medewerkers."""
+    employees = await coalesced(
+        "employee_list", fetch_all, portal.LIST_EMPLOYEES_SQL, None, records.EmployeeListRow,
+    )
+    return await render_template_string(portal.LIST_TEMPLATE, employees=employees)
+
+
+@app.route("/employees/export.csv", methods=["GET"])
+async def export_employees():
+    """Alle medewerkers als CSV, gestreamd vanaf een server-side cursor."""
+    async def generate():
+        header = True
+        async with pool.connection() as conn, conn.transaction():
+            row_factory = args_row(records.EmployeeListRow)
+            async with conn.cursor(name="employees_export", row_factory=row_factory) as cur:
+                await cur.execute(portal.LIST_EMPLOYEES_SQL)
+                while True:
+                    rows = await cur.fetchmany(2000)
+                    if not rows:
+                        break
+                    for chunk in portal.export_rows(rows, header=header):
+                        yield chunk
+                    header = False
+        if header:
+            yield "".join(portal.export_rows([]))
+
+    return Response(
+        generate(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=employees.csv"},
+    )
+
+
+@app.route("/add", methods=["GET", "POST"])
+async def add_employee():
+    if request.method in ("GET", "HEAD"):
+        # statisch formulier: zwakke ETag, een revalidatie zonder wijziging geeft 304
+        body = await render_template_string(portal.ADD_TEMPLATE)
+        etag = http_cache.etag_for(body)
+        if request.if_none_match.contains_weak(etag):
+            response = Response("", status=304)
+        else:
+            response = Response(body, mimetype="text/html")
+        response.set_etag(etag, weak=True)
+        return response
+
+    form = await request.form
+    name = form.get("name", "").strip()
+    email = form.get("email", "").strip()
+    department = form.get("department", "").strip()
+    role = form.get("role", "").strip()
+
+    if not name or not email or not department or not role:
+        return await render_template_string(portal.ADD_TEMPLATE)
+
+    start_date, onboard_after, detail = portal.onboarding_schedule(form)
+    batch = events.EventBatch(actor="portal")
+
+    async with pool.connection() as conn:
+        async with conn.transaction(), conn.cursor() as cur:
+            await _execute(cur, portal.INSERT_EMPLOYEE_SQL, (
+                name, email, department, role, start_date, onboard_after,
+                portal.queue_priority(form), onboard_after,
+            ))
+            employee_id = (await cur.fetchone())["id"]
+            batch.add(employee_id, events.ONBOARDING_REQUESTED, detail=detail)
+            await batch.flush_async(cur)
+            await cur.execute("SELECT pg_notify(%s, %s);", (
+                claims.NOTIFY_CHANNEL, "onboarding" if onboard_after is None else schedule.NOTIFY_PAYLOAD
+            ))
+
+    if onboard_after is None:
+        await start_automation("onboarding")
+        print(f"[PORTAL] Created NEW employee {email}, onboarding requested ({portal.AUTOMATION_MODE})")
+    else:
+        print(f"[PORTAL] Created NEW employee {email}, onboarding scheduled after {onboard_after.isoformat()}")
+
+    return redirect(url_for("index", email=email))
+
+
+@app.route("/offboard/<int:employee_id>", methods=["POST"])
+async def offboard_employee(employee_id: int):
+    """Markeer employee als INACTIVE en start offboarding.py, of plan de offboarding op leave_date."""
+    form = await request.form
+    leave_at = schedule.leave_time(schedule.parse_date(form.get("leave_date")), events.utcnow())
+    priority = portal.queue_priority(form)
+    async with pool.connection() as conn:
+        async with conn.transaction(), conn.cursor() as cur:
+            await _execute(cur, portal.EMPLOYEE_EMAIL_BY_ID_SQL, (employee_id,))
+            row = await cur.fetchone()
+            if not row:
+                return redirect(url_for("index"))
+            email = row["email"]
+
+            batch = events.EventBatch(actor="portal")
+            if leave_at is not None:
+                await _execute(cur, portal.SCHEDULE_LEAVE_SQL, (leave_at, priority, employee_id))
+                if cur.rowcount == 0:
+                    # intussen al INACTIVE: geen offboarding_scheduled vastleggen
+                    return jsonify({"error": "employee is already INACTIVE"}), 409
+                batch.add(employee_id, events.OFFBOARDING_SCHEDULED,
+                          detail=portal.trace_detail(leave_at=leave_at.isoformat()))
+                await batch.flush_async(cur)
+                await cur.execute("SELECT pg_notify(%s, %s);",
+                                  (claims.NOTIFY_CHANNEL, schedule.NOTIFY_PAYLOAD))
+            else:
+                await _execute(cur, portal.MARK_INACTIVE_SQL, (priority, employee_id))
+                batch.add(employee_id, events.OFFBOARDING_REQUESTED, detail=portal.trace_detail())
+                await batch.flush_async(cur)
+                await cur.execute("SELECT pg_notify(%s, %s);", (claims.NOTIFY_CHANNEL, "offboarding"))
+
+    if leave_at is not None:
+        print(f"[PORTAL] Scheduled offboarding of {email} (ID {employee_id}) at {leave_at.isoformat()}")
+        return redirect(url_for("index", email=email))
+
+    await start_automation("offboarding")
+    print(f"[PORTAL] Marked employee {email} (ID {employee_id}) INACTIVE, offboarding requested ({portal.AUTOMATION_MODE})")
+
+    return redirect(url_for("index", email=email))
+
+
+@app.route("/employees/<int:employee_id>/transfer", methods=["POST"])
+async def transfer_employee(employee_id: int):
+    """Wijzig department/role; transfer.py past voor ACTIVE employees alleen de delta toe."""
+    form = await request.form
+    department = form.get("department", "").strip()
+    role = form.get("role", "").strip()
+    if not department or not role:
+        return redirect(url_for("index"))
+
+    async with pool.connection() as conn:
+        async with conn.transaction(), conn.cursor() as cur:
+            await _execute(cur, portal.TRANSFER_SQL, {
+                "id": employee_id,
+                "department": department,
+                "role": role,
+                "priority": portal.queue_priority(form),
+            })
+            row = await cur.fetchone()
+            if not row:
+                # onbekend, INACTIVE of niets gewijzigd
+                await _execute(cur, portal.EMPLOYEE_EMAIL_BY_ID_SQL, (employee_id,))
+                row = await cur.fetchone()
+                return redirect(url_for("index", email=row["email"]) if row else url_for("index"))
+            email, pending = row["email"], row["transfer_pending"]
+
+            batch = events.EventBatch(actor="portal")
+            batch.add(employee_id, events.TRANSFER_REQUESTED, detail=portal.trace_detail(
+                from_department=row["department"], from_role=row["role"],
+                department=department, role=role,
+            ))
+            await batch.flush_async(cur)
+            if pending:
+                await cur.execute("SELECT pg_notify(%s, %s);", (claims.NOTIFY_CHANNEL, "transfer"))
+
+    print(f"[PORTAL] {email} (ID {employee_id}): {row['department']}/{row['role']} -> {department}/{role}")
+    if pending:
+        await start_automation("transfer")
+        print(f"[PORTAL] Transfer of {email} requested ({portal.AUTOMATION_MODE})")
+
+    return redirect(url_for("index", email=email))
+
+
+@app.route("/employees/<int:employee_id>/workstation/start", methods=["POST"])
+async def start_workstation(employee_id: int):
+    """On-demand start van de workstation VM (uitgevoerd door power_scheduler.py)."""
+    async with pool.connection() as conn:
+        async with conn.transaction(), conn.cursor() as cur:
+            await _execute(cur, portal.REQUEST_WORKSTATION_START_SQL,
+                           (power.POWER_ON_DEMAND_HOURS, employee_id))
+            row = await cur.fetchone()
+            if not row:
+                return redirect(url_for("index"))
+            await cur.execute("SELECT pg_notify(%s, %s);", (power.NOTIFY_CHANNEL, str(employee_id)))
+
+    print(f"[PORTAL] Requested on-demand workstation start for employee ID {employee_id}")
+    return redirect(url_for("index", email=row["email"]))
+
+
+@app.route("/dashboard", methods=["GET"])
+async def dashboard():
+    """Headcount per afdeling/status uit de summary-tabel (O(groups), geen full scan)."""
+    groups, stage_report = await coalesced("dashboard", fetch_dashboard)
+
+    totals, departments = portal.summarize_groups(groups)
+    return await render_template_string(
+        portal.DASHBOARD_TEMPLATE,
+        totals=totals,
+        departments=departments,
+        source=portal.DASHBOARD_SOURCE,
+        stage_report=stage_report,
+        stage_report_n=portal.STAGE_REPORT_DEFAULT_N,
+    )
+
+
+@app.route("/dashboard/refresh", methods=["POST"])
+async def refresh_dashboard():
+    """Ververs de materialized view (alleen relevant bij DASHBOARD_SOURCE=matview)."""
+    if portal.DASHBOARD_SOURCE == "matview":
+        # CONCURRENTLY mag niet in een transactie: aparte autocommit-connectie
+        async with await psycopg.AsyncConnection.connect(_conninfo(), autocommit=True) as conn:
+            await conn.execute(portal.REFRESH_DASHBOARD_SQL)
+        print("[PORTAL] Refreshed employee_summary_mv")
+
+    return redirect(url_for("dashboard"))
+
+
+@app.route("/employees/<int:employee_id>/timeline", methods=["GET"])
+async def employee_timeline(employee_id: int):
+    """Alle events + stage-duur van één employee als JSON."""
+    timeline = await coalesced("timeline", fetch_all, events.TIMELINE_SQL, (employee_id,))
+    return jsonify(portal.timeline_payload(employee_id, timeline))
+
+
+@app.route("/employees/<int:employee_id>/progress", methods=["GET"])
+async def employee_progress(employee_id: int):
+    """Live voortgang als Server-Sent Events, gevoed door de gedeelde listener (_progress_loop)."""
+    # eerst aanmelden, dan lezen: een wijziging daartussen wordt niet gemist
+    watcher = progress_hub.subscribe(employee_id)
+    try:
+        # niet coalescen: de stand moet van ná het aanmelden zijn
+        snapshot = await fetch_progress(employee_id)
+    except BaseException:
+        progress_hub.unsubscribe(employee_id, watcher)
+        raise
+    if snapshot is None:
+        progress_hub.unsubscribe(employee_id, watcher)
+        return jsonify({"error": "employee not found"}), 404
+
+    async def generate():
+        loop = asyncio.get_running_loop()
+        try:
+            yield progress.sse("progress", snapshot)
+            if snapshot["done"]:
+                return
+            deadline = loop.time() + progress.PROGRESS_STREAM_MAX_SECONDS
+            while loop.time() < deadline:
+                try:
+                    current = await asyncio.wait_for(watcher.get(), progress.PROGRESS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield progress.KEEPALIVE
+                    continue
+                if current is None:
+                    continue
+                yield progress.sse("progress", current)
+                if current["done"]:
+                    return
+        finally:
+            progress_hub.unsubscribe(employee_id, watcher)
+
+    response = Response(generate(), mimetype="text/event-stream", headers={"X-Accel-Buffering": "no"})
+    response.timeout = None  # geen RESPONSE_TIMEOUT voor een lange stream
+    return response
+
+
+@app.route("/reports/onboarding-stages", methods=["GET"])
+async def onboarding_stage_report():
+    """p50/p95 per onboarding-stap over de laatste N onboardings (?n=50)."""
+    last_n = portal.clamp_report_n(request.args.get("n", portal.STAGE_REPORT_DEFAULT_N, type=int))
+    rows = await coalesced("stage_report", fetch_stage_report, last_n)
+    return jsonify(portal.stage_report_payload(last_n, rows))
+
+
+@app.route("/healthz", methods=["GET"])
+async def healthz():
+    """Liveness: geen DB-I/O."""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=["GET"])
+async def readyz():
+    """Readiness uit de gecachte health checks (zie _health_loop); geen DB-I/O."""
+    ready, payload = health.snapshot()
+    return jsonify(payload), (200 if ready else 503)
+
+
+if __name__ == "__main__":
+    # Dev-run: in Cloud Shell / lokaal
+    app.run(host="0.0.0.0", port=8080, debug=True)
@@ -0,0 +1,182 @@
+"""
+Compressie en cache-headers voor de portal-responses.
+
+De pagina's zetten hun CSS inline en /employees is bij 10k medewerkers
+megabytes HTML. Responses vanaf HTTP_COMPRESS_MIN_BYTES gaan daarom
+gecomprimeerd de deur uit (br als de client en de optionele brotli-module
+dat ondersteunen, anders gzip). Gestreamde responses (CSV-export, de lijst)
+worden per chunk door de compressor gehaald, zodat de eerste bytes al
+verstuurd zijn voordat de laatste rij gelezen is.
+
+CACHE_POLICIES legt per endpoint Cache-Control en Vary vast; de statische
+/add-pagina krijgt daarnaast een zwakke ETag (revalidatie geeft 304).
+
+Framework-onafhankelijk: hr_portal.py (Flask) en hr_portal_async.py (Quart)
+roepen deze helpers aan vanuit hun after_request hook.
+"""
+
+import hashlib
+import os
+import zlib
+
+# Optionele brotli-support (valt terug op gzip als de library ontbreekt)
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Kleinere bodies niet comprimeren: de gzip-header en CPU wegen dan niet op tegen de winst
+HTTP_COMPRESS_MIN_BYTES = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+HTTP_GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+HTTP_BROTLI_QUALITY = int(os.getenv("HTTP_BROTLI_QUALITY", "5"))
+# Gestreamde bodies: kleine chunks (bv. per template-node) samenvoegen tot dit aantal bytes
+HTTP_STREAM_CHUNK_BYTES = int(os.getenv("HTTP_STREAM_CHUNK_BYTES", str(64 * 1024)))
+
+COMPRESSIBLE_MIMETYPES = {"text/html", "text/csv", "text/plain", "application/json"}
+
+# endpoint -> (Cache-Control, Vary). Pagina's die via read_connection() lezen
+# hangen ook af van de read-your-writes cookie (hr_min_lsn).
+CACHE_POLICIES = {
+    # toont o.a. het tijdelijke wachtwoord: nergens bewaren
+    "index": ("private, no-store", ("Accept-Encoding",)),
+    "list_employees": ("private, no-cache", ("Accept-Encoding", "Cookie")),
+    "export_employees": ("private, no-store", ("Accept-Encoding",)),
+    # statisch formulier: mag gedeeld gecachet worden, altijd revalideren via de ETag
+    "add_employee": ("public, no-cache", ("Accept-Encoding",)),
+    "dashboard": ("private, no-cache", ("Accept-Encoding", "Cookie")),
+    "employee_timeline": ("private, no-cache", ("Accept-Encoding", "Cookie")),
+    "onboarding_stage_report": ("private, no-cache", ("Accept-Encoding", "Cookie")),
+    # SSE: nooit cachen; text/event-stream wordt ook niet gecomprimeerd (bufferen vertraagt de events)
+    "employee_progress": ("no-store", ()),
+    "healthz": ("no-store", ()),
+    "readyz": ("no-store", ()),
+    "metrics": ("no-store", ("Accept-Encoding",)),
+}
+
+
+def cache_policy(endpoint):
+    """(Cache-Control, Vary) voor een endpoint, of None (headers ongemoeid laten)."""
+    return CACHE_POLICIES.get(endpoint)
+
+
+def etag_for(body) -> str:
+    """Waarde voor een zwakke ETag (W/"...") op basis van de inhoud van de body."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def _accepted(accept_encoding):
+    """{coding: q} uit een Accept-Encoding header."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' of None volgens de Accept-Encoding van de client."""
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compressible(status_code, mimetype, headers) -> bool:
+    """Alleen complete 200-responses met tekst en nog zonder Content-Encoding."""
+    return (
+        status_code == 200
+        and mimetype in COMPRESSIBLE_MIMETYPES
+        and "Content-Encoding" not in headers
+    )
+
+
+class Compressor:
+    """Incrementele compressor met één interface voor gzip en brotli."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=HTTP_BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            # wbits=31: gzip-header en -trailer
+            self._zlib = zlib.compressobj(HTTP_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress(data: bytes, encoding) -> bytes:
+    """Een complete body in één keer comprimeren."""
+    compressor = Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def _to_bytes(chunk) -> bytes:
+    return chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+def compress_chunks(chunks, encoding):
+    """
+    Generator die een gestreamde body comprimeert. De compressor buffert zelf
+    tot hij een blok vol heeft; lege uitkomsten worden niet doorgegeven.
+    """
+    compressor = Compressor(encoding)
+    for chunk in chunks:
+        out = compressor.compress(_to_bytes(chunk))
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+async def compress_chunks_async(chunks, encoding):
+    """compress_chunks() voor een async iterable (Quart)."""
+    compressor = Compressor(encoding)
+    async for chunk in chunks:
+        out = compressor.compress(_to_bytes(chunk))
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+def buffered(chunks, size=None):
+    """
+    Voeg kleine str-chunks (bv. uit een gestreamde Jinja-template, één per
+    node) samen tot blokken van ~size bytes: minder writes naar de client en
+    de compressor krijgt bruikbare stukken.
+    """
+    size = size or HTTP_STREAM_CHUNK_BYTES
+    parts, pending = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        pending += len(chunk)
+        if pending >= size:
+            yield "".join(parts)
+            parts, pending = [], 0
+    if parts:
+        yield "".join(parts)
@@ -0,0 +1,135 @@
+"""
+Live voortgang per employee voor de portal (Server-Sent Events).
+
+Elke EventBatch.flush en elke claim doet een NOTIFY op hrcore.events.
+PROGRESS_CHANNEL met de employee-ids. Per portal-proces luistert één
+connectie op dat kanaal; alleen voor ids waar iemand naar kijkt wordt de
+stand één keer opgehaald en naar alle kijkers van die employee gestuurd.
+Kijkers pollen dus niet en houden geen DB-connectie vast.
+
+    hub = ProgressHub(queue.Queue)            # Flask (threads)
+    hub = ProgressHub(asyncio.Queue)          # Quart (één event loop)
+
+ProgressHub is alleen het register; het luisteren zelf doet listen_forever()
+(psycopg2, eigen thread) of een asyncio task in hr_portal_async.py.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+# Commentregel zodat proxies een stille stream niet afsluiten
+PROGRESS_KEEPALIVE_SECONDS = float(os.getenv("PROGRESS_KEEPALIVE_SECONDS", "15"))
+# Een stream sluit daarna; EventSource maakt zelf opnieuw verbinding
+PROGRESS_STREAM_MAX_SECONDS = float(os.getenv("PROGRESS_STREAM_MAX_SECONDS", "900"))
+# Wachttijd voor een nieuwe listen-connectie na een fout
+PROGRESS_RECONNECT_SECONDS = float(os.getenv("PROGRESS_RECONNECT_SECONDS", "5"))
+
+KEEPALIVE = ": keepalive\n\n"
+
+
+def sse(event, data) -> str:
+    """Eén SSE-bericht met JSON data."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def parse_ids(payload):
+    """Employee-ids uit een NOTIFY payload ("12,13,20")."""
+    ids = set()
+    for part in (payload or "").split(","):
+        part = part.strip()
+        if part.isdigit():
+            ids.add(int(part))
+    return ids
+
+
+class ProgressHub:
+    def __init__(self, queue_factory):
+        # queue_factory(maxsize=1): elke kijker bewaart alleen de nieuwste stand
+        self._queue_factory = queue_factory
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, employee_id):
+        watcher = self._queue_factory(maxsize=1)
+        with self._lock:
+            self._watchers.setdefault(employee_id, set()).add(watcher)
+        return watcher
+
+    def unsubscribe(self, employee_id, watcher) -> None:
+        with self._lock:
+            watchers = self._watchers.get(employee_id)
+            if watchers is not None:
+                watchers.discard(watcher)
+                if not watchers:
+                    del self._watchers[employee_id]
+
+    def watched(self, employee_ids=None):
+        """Ids (uit employee_ids, of alle) waar minstens één kijker op wacht."""
+        with self._lock:
+            if employee_ids is None:
+                return list(self._watchers)
+            return [employee_id for employee_id in employee_ids if employee_id in self._watchers]
+
+    def publish(self, employee_id, snapshot) -> None:
+        """Nieuwe stand naar alle kijkers; een oudere, nog niet gelezen stand vervalt."""
+        with self._lock:
+            watchers = list(self._watchers.get(employee_id, ()))
+        for watcher in watchers:
+            try:
+                watcher.get_nowait()
+            except (queue.Empty, asyncio.QueueEmpty):
+                pass
+            try:
+                watcher.put_nowait(snapshot)
+            except (queue.Full, asyncio.QueueFull):
+                pass
+
+
+def listen_forever(hub, channel, connect, fetch):
+    """
+    Thread-loop (Flask): LISTEN op `channel` via connect() (psycopg2) en
+    publiceer fetch(conn, employee_id) voor elke gewijzigde employee met
+    kijkers. Na een verbroken verbinding worden alle bekeken employees
+    opnieuw opgehaald (tussendoor gemiste NOTIFY's).
+    """
+    while True:
+        conn = None
+        try:
+            conn = connect()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {channel};")
+            changed = set(hub.watched())
+            while True:
+                for employee_id in hub.watched(changed):
+                    hub.publish(employee_id, fetch(conn, employee_id))
+                changed = set()
+                ready, _, _ = select.select([conn], [], [], PROGRESS_KEEPALIVE_SECONDS)
+                if not ready:
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    changed |= parse_ids(conn.notifies.pop(0).payload)
+        except Exception as e:
+            print(f"[PROGRESS] Listener failed, reconnecting in {PROGRESS_RECONNECT_SECONDS:.0f}s: {e}")
+            time.sleep(PROGRESS_RECONNECT_SECONDS)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def start_listener(hub, channel, connect, fetch):
+    """listen_forever() in een daemon thread."""
+    thread = threading.Thread(
+        target=listen_forever, args=(hub, channel, connect, fetch), name="progress-listener", daemon=True,
+    )
+    thread.start()
+    return thread
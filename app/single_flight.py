@@ -0,0 +1,94 @@
+"""
+Request coalescing ("single flight") voor de reads van de portal.
+
+Na een afgeronde onboarding/offboarding verversen vaak meerdere HR-mensen
+tegelijk dezelfde pagina. Zonder coalescing draait elke request dezelfde
+query. Hier draait per key maar één query tegelijk; requests die binnenkomen
+terwijl hij loopt wachten op die uitkomst in plaats van zelf een query te
+starten. Er wordt niets bewaard: zodra de query klaar is, doet de volgende
+request weer een eigen read.
+
+De uitkomst wordt gedeeld tussen requests en moet dus alleen gelezen worden.
+
+    reads = SingleFlight(observer=lambda name, coalesced: ...)
+    employee = reads.do(("employee", email), lambda: fetch(email), name="employee")
+
+SingleFlight is voor de threaded Flask portal, AsyncSingleFlight voor de
+Quart portal (één event loop).
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, observer=None):
+        # observer(name, coalesced): voor metrics, per aanroep van do()
+        self.observer = observer
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, name=None):
+        """fn() voor key, of de uitkomst (of exception) van de lopende aanroep met dezelfde key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._observe(name, True)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self._observe(name, False)
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _observe(self, name, coalesced):
+        if self.observer is not None:
+            self.observer(name, coalesced)
+
+
+class AsyncSingleFlight:
+    def __init__(self, observer=None):
+        self.observer = observer
+        self._calls = {}
+
+    async def do(self, key, fn, name=None):
+        """await fn() voor key, gedeeld met de lopende aanroep met dezelfde key."""
+        task = self._calls.get(key)
+        coalesced = task is not None
+        if not coalesced:
+            # eigen task: een afgebroken request (client weg) annuleert de query niet voor de wachtenden
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        if self.observer is not None:
+            self.observer(name, coalesced)
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # geen "exception was never retrieved" als iedereen al weg is
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Access-group reconciliation (hrcore/identity_sync.py)
+
+- Computes the desired groups of every employee from their role in one query,
+  diffs them against group_memberships and applies only the difference to the
+  identity backend (IDENTITY_BACKEND), batched per group.
+- Onboarding and offboarding reconcile their own batch; this full run picks up
+  role changes, failed batches from earlier runs and memberships that existed
+  before group_memberships did.
+- The automation worker runs it on NOTIFY hr_automation 'groups' and at most
+  every GROUP_SYNC_INTERVAL_SECONDS on its periodic sweep.
+
+With --plan it only writes the diff as JSON Lines (one line per batch call plus a
+summary line); nothing is applied.
+"""
+
+import json
+import os
+import sys
+
+# Shared modules (hrcore/) live in the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from hrcore import db, identity_sync, tracing  # noqa: E402
+
+SERVICE_NAME = "automation-group-sync"
+tracing.set_service_name(SERVICE_NAME)
+
+
+def main():
+    print("=== Group sync run started ===")
+    run_span = tracing.start_process_span("groups.reconcile").activate()
+    try:
+        with db.connection() as conn:
+            result = identity_sync.reconcile(conn)
+        for key, value in result.items():
+            run_span.set_attribute(f"groups.{key}", value)
+        print(
+            f"[IDENTITY] {result['added']} added, {result['removed']} removed in "
+            f"{result['calls']} call(s), {result['failed']} failed."
+        )
+    finally:
+        run_span.end()
+        tracing.flush()
+
+
+def write_plan(out=None):
+    """--plan: the add/remove batches a run would send now, as JSON Lines."""
+    out = out or sys.stdout
+    summary = {"added": 0, "removed": 0, "calls": 0}
+    try:
+        with db.connection() as conn:
+            with conn.cursor() as cur:
+                changes = identity_sync.diff(cur)
+            for op, group, members in identity_sync.plan_batches(changes):
+                summary["calls"] += 1
+                summary["added" if op == identity_sync.ADD else "removed"] += len(members)
+                out.write(json.dumps({
+                    "op": op,
+                    "group": group,
+                    "members": [email for _, email in members],
+                }) + "\n")
+        out.write(json.dumps({"summary": summary}) + "\n")
+        out.flush()
+        return summary
+    finally:
+        tracing.flush()
+
+
+if __name__ == "__main__":
+    if "--plan" in sys.argv[1:]:
+        write_plan()
+    else:
+        main()
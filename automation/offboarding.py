@@ -2,19 +2,41 @@
 """
 Offboarding Automation Service (prototype)
 
+- Marks employees whose scheduled leave_at has passed as INACTIVE, all in one
+  UPDATE (hrcore/schedule.py)
 - Selects employees with status = 'INACTIVE' and deprovisioned = false
 - Simulates disabling the cloud identity account and removing group access
-- Updates the employees table:
+- Deletes the employee's workstation VM (hr-ws-<id>) for the whole claimed
+  batch at once: instances.delete calls and operation polls are sent as GCE
+  batch requests, with at most OFFBOARDING_DELETE_CONCURRENCY operations
+  in flight
+- Optionally (OFFBOARDING_SNAPSHOT=true) snapshots the boot disk first, as a
+  separate stage per VM; a VM is deleted as soon as its own snapshot succeeded
+  (compute.run_chains), without waiting for the snapshots of the rest of the batch
+- Updates the employees table only after the deletion is confirmed:
     deprovisioned = true
-    last_action = 'Offboarding completed at ...'
     updated_at = NOW()
+- Records an offboarding_completed event in employee_events
+
+COMPUTE_BACKEND=fake runs the same flow against hrcore/fake_compute.py.
+
+With --plan (dry-run) it only writes the plan as JSON Lines: per employee the
+groups to remove and the VM to snapshot/delete, plus an estimated duration and
+cost saving (hrcore/plan.py). Nothing is claimed, deleted or updated.
 """
 
 import os
 import sys
-import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import time
+
+# Shared modules (hrcore/) live in the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from hrcore import (  # noqa: E402
+    claims, compute, db, events, identity, identity_sync, plan, records, schedule, sizing, tracing,
+)
 
 # Optional Prometheus metrics (safe fallback if library is missing)
 try:
@@ -22,12 +44,18 @@ try:
 except ImportError:  # pragma: no cover - optional dependency
     Counter = None
 
-# Same env vars as onboarding.py
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME", "hr_employees")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
+SERVICE_NAME = "automation-offboarding"
+tracing.set_service_name(SERVICE_NAME)
+
+# Database config (DB_*) and the connection pool: hrcore/db.py
+
+GCP_PROJECT = os.getenv("GCP_PROJECT", "cs3-innovatech-hr-project")
+GCP_ZONE = os.getenv("GCP_ZONE", "europe-west1-b")
+
+# Max. number of GCE delete/snapshot operations running at the same time
+OFFBOARDING_DELETE_CONCURRENCY = int(os.getenv("OFFBOARDING_DELETE_CONCURRENCY", "10"))
+# Snapshot the boot disk before deleting the VM (kept for data retention)
+OFFBOARDING_SNAPSHOT = os.getenv("OFFBOARDING_SNAPSHOT", "false").strip().lower() in ("1", "true", "yes")
 
 # Prometheus-style counters (optional; only active when prometheus_client is installed)
 if Counter is not None:
@@ -40,123 +68,287 @@ else:
     OFFBOARDING_ATTEMPTS = None
 
 
-def get_db_connection():
-    """Create a PostgreSQL connection."""
-    missing = [name for name, value in [
-        ("DB_HOST", DB_HOST),
-        ("DB_USER", DB_USER),
-        ("DB_PASSWORD", DB_PASSWORD),
-    ] if not value]
-
-    if missing:
-        print(f"ERROR: Missing environment variables: {', '.join(missing)}")
-        sys.exit(1)
-
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-    )
-    return conn
+def claim_employees_to_offboard(conn):
+    """Claim the next batch of employees that must be deprovisioned (FOR UPDATE SKIP LOCKED)."""
+    return claims.claim_batch(conn, "offboarding", records.OffboardingEmployee)
 
 
-def fetch_employees_to_offboard(conn):
-    """Get all employees that must be deprovisioned."""
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
-            """
-            SELECT id, name, email, department, role
-            FROM employees
-            WHERE status = 'INACTIVE'
-              AND deprovisioned = FALSE
-            ORDER BY id;
-            """
-        )
-        return cur.fetchall()
+def simulate_cloud_identity_offboarding(employee):
+    """
+    Simulate the Cloud Identity offboarding.
 
+    In a real implementation this function would disable the user in Cloud
+    Identity and revoke their sessions. Group removal is done per batch by
+    sync_groups (hrcore/identity_sync.py).
+    """
+    email = employee.get("email")
 
-def _groups_for_role(role: str):
-    """Return the logical access groups for a given business role."""
-    base_groups = ["corp-all-employees"]
-    role_norm = (role or "Employee").strip().upper()
+    print(f"[OFFBOARD] Disabling cloud identity account for {email}")
+    print(f"[OFFBOARD] Revoking active sessions / tokens for {email}")
 
-    if role_norm == "MANAGER":
-        base_groups.append("corp-managers")
-    elif role_norm in {"HR_ADMIN", "HR-ADMIN", "HR ADMIN"}:
-        base_groups.append("corp-hr-admins")
 
-    return base_groups
+def sync_groups(conn, employee_ids):
+    """Remove the batch from all access groups (INACTIVE employees have no desired groups)."""
+    with tracing.span("identity.groups", **{"employees.count": len(employee_ids)}):
+        try:
+            # employees never seen by a full group sync have no membership rows:
+            # remove them from their role's groups anyway
+            result = identity_sync.reconcile(
+                conn, employee_ids, actor="automation:offboarding", record_events=False,
+                assume_role_groups=True,
+            )
+        except Exception as e:
+            # picked up again by the next full run of group_sync.py
+            print(f"[OFFBOARD] Group sync for batch failed: {e}")
+            return
+    print(f"[OFFBOARD] Removed {result['removed']} group membership(s) in {result['calls']} call(s).")
 
 
-def simulate_cloud_identity_offboarding(employee):
+def _snapshot_name(instance: str) -> str:
+    return f"{instance}-offboard-{events.utcnow():%Y%m%d%H%M%S}"
+
+
+def teardown_workstations(employees, timers):
     """
-    Simulate the Cloud Identity offboarding.
+    Snapshot (optional) and delete the workstation VMs of a batch of employees.
 
-    In a real implementation this function would:
-    - disable the user in Cloud Identity
-    - remove the user from all access groups
+    Returns {employee_id: (stage, error)} for employees whose VM could not be
+    removed; everyone else has a confirmed deletion (or never had a VM).
     """
-    email = employee.get("email")
-    role = employee.get("role", "Employee")
-    groups = _groups_for_role(role)
+    gce = compute.get_compute_client()
+    vms = {
+        emp["id"]: (emp.get("workstation_zone") or GCP_ZONE, emp["workstation_instance"])
+        for emp in employees
+        if emp.get("workstation_instance")
+    }
+    failures = {}
+    if not vms:
+        return failures
 
-    print(f"[OFFBOARD] Disabling cloud identity account for {email}")
-    print(f"[OFFBOARD] Revoking active sessions / tokens for {email}")
+    def steps(zone, name):
+        delete = ("vm_delete", zone, lambda: gce.instances().delete(
+            project=GCP_PROJECT, zone=zone, instance=name,
+        ))
+        if not OFFBOARDING_SNAPSHOT:
+            return [delete]
+        snapshot = ("vm_snapshot", zone, lambda: gce.disks().createSnapshot(
+            project=GCP_PROJECT, zone=zone, disk=name, body={"name": _snapshot_name(name)},
+        ))
+        return [snapshot, delete]
 
-    for g in groups:
-        print(f"[OFFBOARD] Removing {email} from group {g}")
+    # per VM snapshot -> delete as its own chain: a VM is deleted as soon as its
+    # own snapshot is done, a slow snapshot does not hold up the other deletes
+    stages = "snapshot + delete" if OFFBOARDING_SNAPSHOT else "delete"
+    print(f"[VM] Teardown ({stages}) of {len(vms)} workstation VM(s)...")
+    with tracing.span("offboarding.vm_teardown", **{"vm.count": len(vms), "vm.snapshot": OFFBOARDING_SNAPSHOT}):
+        chains = compute.run_chains(
+            gce,
+            GCP_PROJECT,
+            {emp_id: steps(zone, name) for emp_id, (zone, name) in vms.items()},
+            concurrency=OFFBOARDING_DELETE_CONCURRENCY,
+            # VM/disk already gone: nothing to keep, and already deleted counts as confirmed
+            ignore_not_found=True,
+        )
 
+    results = {}
+    for emp_id, stage_results in chains.items():
+        for stage, result in stage_results.items():
+            timers[emp_id].record(stage, result.duration_ms, result.started_at, error=result.error)
+            if not result.ok:
+                failures[emp_id] = (stage, result.error)
+        if "vm_delete" in stage_results:
+            results[emp_id] = stage_results["vm_delete"]
+    to_delete = {emp_id: vms[emp_id] for emp_id in results}
+
+    for emp_id, result in results.items():
+        zone, name = to_delete[emp_id]
+        if result.not_found:
+            print(f"[VM] {name} ({zone}) was already gone.")
+        elif result.ok:
+            print(f"[VM] Deleted {name} ({zone}).")
+        else:
+            print(f"[ERROR] Failed to delete {name} ({zone}): {result.error}")
+    return failures
 
-def mark_employee_as_offboarded(conn, employee_id):
-    """Update employee record after successful offboarding."""
-    now = datetime.datetime.utcnow()
-    action_text = f"Offboarding completed at {now.isoformat()}Z"
 
+def mark_employee_as_offboarded(conn, employee_id):
+    """
+    Update employee record after successful offboarding. Returns False (nothing
+    changed) if the claim expired and another worker took the employee over.
+    """
     with conn.cursor() as cur:
+        if not claims.release_claim(cur, employee_id):
+            return False
         cur.execute(
             """
             UPDATE employees
             SET deprovisioned = TRUE,
-                last_action = %s,
                 updated_at = NOW()
             WHERE id = %s;
             """,
-            (action_text, employee_id),
+            (employee_id,),
         )
+    return True
+
+
+def finish_offboarding(conn, batch, emp, started, failure=None):
+    """Record the outcome for one employee; events are collected in batch."""
+    duration_ms = (time.monotonic() - started) * 1000
+    # savepoint: a failure only undoes this employee, not the rest of the batch
+    with conn.cursor() as cur:
+        cur.execute("SAVEPOINT offboard_employee;")
+    try:
+        if failure is not None:
+            stage, error = failure
+            raise RuntimeError(f"{stage}: {error}")
+        if not mark_employee_as_offboarded(conn, emp["id"]):
+            print(f"[WARN] Claim on {emp['email']} was taken over by another worker; skipping.")
+            if OFFBOARDING_ATTEMPTS is not None:
+                OFFBOARDING_ATTEMPTS.labels(result="claim_lost").inc()
+            return
+    except Exception as e:
+        print(f"[ERROR] Failed to offboard {emp['email']}: {e}")
+        with conn.cursor() as cur:
+            cur.execute("ROLLBACK TO SAVEPOINT offboard_employee;")
+            claims.defer_claim(cur, emp["id"])
+        detail = {"error": str(e)}
+        if failure is not None:
+            detail["stage"] = failure[0]
+        batch.add(emp["id"], events.OFFBOARDING_FAILED, duration_ms=duration_ms, detail=detail)
+        if OFFBOARDING_ATTEMPTS is not None:
+            OFFBOARDING_ATTEMPTS.labels(result="error").inc()
+        return
+
+    batch.add(
+        emp["id"],
+        events.OFFBOARDING_COMPLETED,
+        duration_ms=duration_ms,
+        detail={"instance": emp.get("workstation_instance")},
+    )
+    print(f"[OK] {emp['email']} marked as deprovisioned in database.")
+    if OFFBOARDING_ATTEMPTS is not None:
+        OFFBOARDING_ATTEMPTS.labels(result="success").inc()
+
+
+def offboard_batch(conn, batch, employees, run_span):
+    """Identity, VM teardown (parallel for the whole batch) and DB update."""
+    started = time.monotonic()
+    timers = {emp["id"]: events.StageTimer(batch, emp["id"]) for emp in employees}
+    failures = {}
+
+    for emp in employees:
+        print(f"\nProcessing employee ID {emp['id']} - {emp['email']}")
+        try:
+            with timers[emp["id"]].stage("identity"):
+                simulate_cloud_identity_offboarding(emp)
+        except Exception as e:
+            failures[emp["id"]] = ("identity", str(e))
+
+    sync_groups(conn, [emp["id"] for emp in employees if emp["id"] not in failures])
+
+    failures.update(teardown_workstations(
+        [emp for emp in employees if emp["id"] not in failures], timers
+    ))
+
+    with conn:
+        for emp in employees:
+            # child of the portal request that marked this employee INACTIVE
+            parent = tracing.parse_traceparent(emp.get("traceparent")) or run_span.context
+            with tracing.start_span(
+                "offboarding.employee",
+                parent=parent,
+                attributes={"employee.id": emp["id"]},
+                links=[run_span.context],
+            ):
+                finish_offboarding(conn, batch, emp, started, failures.get(emp["id"]))
+
+        # all events of this batch in one INSERT, same transaction as the updates
+        with conn.cursor() as cur:
+            written = batch.flush(cur)
+        print(f"[EVENTS] Recorded {written} employee event(s).")
 
 
 def main():
     print("=== Offboarding run started ===")
-    conn = get_db_connection()
+    run_span = tracing.start_process_span("offboarding.run").activate()
+    batch = events.EventBatch(actor="automation:offboarding")
+    processed = 0
     try:
-        with conn:
-            employees = fetch_employees_to_offboard(conn)
-            if not employees:
-                print("No employees with status INACTIVE to offboard.")
-                return
-
-            print(f"Found {len(employees)} employee(s) to offboard.")
-            for emp in employees:
-                print(f"\nProcessing employee ID {emp['id']} - {emp['email']}")
-                try:
-                    simulate_cloud_identity_offboarding(emp)
-                    mark_employee_as_offboarded(conn, emp["id"])
-                except Exception as e:
-                    print(f"[ERROR] Failed to offboard {emp['email']}: {e}")
-                    if OFFBOARDING_ATTEMPTS is not None:
-                        OFFBOARDING_ATTEMPTS.labels(result="error").inc()
-                    continue
-
-                print("[OK] Employee marked as deprovisioned in database.")
-                if OFFBOARDING_ATTEMPTS is not None:
-                    OFFBOARDING_ATTEMPTS.labels(result="success").inc()
+        with db.connection() as conn:
+            leavers = schedule.activate_leavers(conn)
+            if leavers:
+                print(f"{leavers} employee(s) reached their leave date.")
+
+            while True:
+                employees = claim_employees_to_offboard(conn)
+                if not employees:
+                    break
+
+                print(f"Claimed {len(employees)} employee(s) to offboard.")
+                offboard_batch(conn, batch, employees, run_span)
+                processed += len(employees)
+
+        run_span.set_attribute("employees.count", processed)
+        if not processed:
+            print("No employees with status INACTIVE to offboard.")
+            return
 
         print("\n=== Offboarding run finished successfully ===")
     finally:
-        conn.close()
+        run_span.end()
+        tracing.flush()
+
+
+# ---------- Plan mode ----------
+
+def plan_employee(emp, estimate):
+    """Actions of one employee's offboarding, without running them."""
+    instance = emp.get("workstation_instance")
+    profile = None
+    if instance:
+        profiles, _, _ = sizing.load_profiles()
+        profile = profiles.get(emp.get("workstation_profile") or "")
+    estimate.add(
+        emp,
+        hourly_cost=-profile.hourly_cost if profile and profile.hourly_cost is not None else None,
+        vms="delete" if instance else "none",
+    )
+    return {
+        "employee_id": emp["id"],
+        "email": emp["email"],
+        "lane": claims.lane("offboarding", emp.get("queue_priority")),
+        "identity": {
+            "disable": emp["email"],
+            "remove_groups": list(identity.groups_for_role(emp.get("role"))),
+        },
+        "vm": {
+            "name": instance,
+            "zone": emp.get("workstation_zone") or GCP_ZONE,
+            "profile": profile.name if profile else emp.get("workstation_profile"),
+            "snapshot": OFFBOARDING_SNAPSHOT,
+        } if instance else None,
+    }
+
+
+def write_plan(out=None):
+    """--plan: what a run would do now, as JSON Lines; nothing is claimed or deleted."""
+    estimate = plan.Estimate(
+        parallel_stages=(["vm_snapshot"] if OFFBOARDING_SNAPSHOT else []) + ["vm_delete"],
+        serial_stages=["identity"],
+        concurrency=OFFBOARDING_DELETE_CONCURRENCY,
+    )
+    try:
+        with db.connection() as conn:
+            rows = plan.plan_rows(
+                conn, "offboarding", actor="automation:offboarding", record=records.OffboardingPlanRow,
+            )
+            return plan.write(rows, plan_employee, estimate, out)
+    finally:
+        tracing.flush()
 
 
 if __name__ == "__main__":
-    main()
+    if "--plan" in sys.argv[1:]:
+        write_plan()
+    else:
+        main()
@@ -13,20 +13,30 @@ Flow per nieuwe medewerker:
     cloud_account_created = true
     device_enrolled = true
     workspace_username, workspace_temp_password invullen
-    last_action = 'Onboarding completed at ...'
+- Leg een onboarding_completed event vast in employee_events
+
+Met --plan (dry-run) alleen het plan als JSON Lines: per employee VM-naam,
+profiel, zone, groepen en mail, plus geschatte duur en kosten (hrcore/plan.py).
+Er wordt niets geclaimd, aangemaakt of verstuurd.
 """
 
+import concurrent.futures
+import contextvars
 import os
 import sys
 import time
-import datetime
-import random
-import string
-import psycopg2
-from psycopg2.extras import RealDictCursor
+
+# Gedeelde modules (hrcore/) staan in de project-root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from hrcore import (  # noqa: E402
+    claims, compute, db, events, identity, identity_sync, placement, plan, records, sizing,
+    startup_scripts, tracing,
+)
 
 # ---- NIEUW: Google Compute Engine API ----
-from googleapiclient import discovery
 from googleapiclient.errors import HttpError
 
 # ---- NIEUW: email versturen ----
@@ -41,25 +51,25 @@ except ImportError:  # pragma: no cover - optional dependency
 
 # ========= CONFIG =========
 
-DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME", "hr_employees")
-DB_USER = os.getenv("DB_USER", "hr_app_user")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "12345")
+SERVICE_NAME = "automation-onboarding"
+tracing.set_service_name(SERVICE_NAME)
+
+# Database-config (DB_*) en de connectiepool: hrcore/db.py
 
-# GCP project + zone voor de Windows VM's
+# GCP project voor de Windows VM's; zones/regio's/subnets staan in config/placement.json
 GCP_PROJECT = os.getenv("GCP_PROJECT", "cs3-innovatech-hr-project")  # <-- jouw project ID
-GCP_ZONE = os.getenv("GCP_ZONE", "europe-west1-b")
 
-# Windows image (standaard Windows Server 2019)
-WINDOWS_IMAGE_PROJECT = "windows-cloud"
-WINDOWS_IMAGE_FAMILY = "windows-2019"
+# Max. aantal VM-inserts dat tegelijk loopt
+ONBOARDING_INSERT_CONCURRENCY = int(os.getenv("ONBOARDING_INSERT_CONCURRENCY", "10"))
+
+# Machine type, disk en Windows image per afdeling/rol: config/sizing_profiles.json
 
 # SMTP voor welkomstmail  (Gmail voorbeeld)
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 SMTP_USER = os.getenv("HR_SMTP_USER")       # <-- zet deze als env var
 SMTP_PASSWORD = os.getenv("HR_SMTP_PASS")   # <-- zet deze als env var
+WELCOME_SUBJECT = "Welkom bij Innovatech – je digitale werkplek is klaar"
 
 # Prometheus-style counters (optional; only active when prometheus_client is installed)
 if Counter is not None:
@@ -71,167 +81,69 @@ if Counter is not None:
 else:
     ONBOARDING_ATTEMPTS = None
 
-# ================= HELPERS =================
-
-def get_db_connection():
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-    )
-    return conn
-
-
-def generate_temp_password(length: int = 12) -> str:
-    chars = string.ascii_letters + string.digits
-    return "".join(random.choice(chars) for _ in range(length))
-
-
-def generate_username(emp):
-    """Maak een simpele username, bv. voornaam.achternaam of fallback."""
-    name = emp["name"].strip().lower()
-    safe = "".join(c for c in name.replace(" ", ".") if c.isalnum() or c == ".")
-    if not safe:
-        safe = f"user{emp['id']}"
-    return safe[:20]
-
-
 # ========= GOOGLE COMPUTE ENGINE ==========
 
-_compute_client = None
-
+def lookup_source_image(profile):
+    """selfLink van de nieuwste image uit de image-familie van een sizing profile."""
+    with tracing.span("gce.image_lookup", **{"vm.profile": profile.name}), \
+            compute.compute_client() as gce:
+        image_response = gce.images().getFromFamily(
+            project=profile.image_project,
+            family=profile.image_family,
+        ).execute()
+    return image_response["selfLink"]
 
-def get_compute_client():
-    global _compute_client
-    if _compute_client is None:
-        _compute_client = discovery.build("compute", "v1")
-    return _compute_client
 
-
-def wait_for_operation(compute, project, zone, operation):
-    """Wacht tot een GCE-operatie klaar is."""
-    print(f"[VM] Waiting for operation {operation} to finish...")
-    while True:
-        result = (
-            compute.zoneOperations()
-            .get(project=project, zone=zone, operation=operation)
-            .execute()
-        )
-        if result["status"] == "DONE":
-            if "error" in result:
-                raise RuntimeError(f"GCE operation error: {result['error']}")
-            return
-        time.sleep(5)
-
-
-def create_windows_vm_for_employee(emp, username, temp_password):
+def lookup_source_images(profiles):
     """
-    Maakt een Windows VM + lokale user met RDP-rechten.
-    Retourneert (instance_name, public_ip).
+    {profiel-naam: selfLink of HttpError}; de lookups lopen parallel, elk op
+    een eigen (warme) client uit de pool.
     """
-    compute = get_compute_client()
-
-    instance_name = f"hr-ws-{emp['id']}"
-    instance_name = instance_name.replace("_", "-")
-
-    # Haal de laatste image uit de windows-2019 familie
-    image_response = compute.images().getFromFamily(
-        project=WINDOWS_IMAGE_PROJECT,
-        family=WINDOWS_IMAGE_FAMILY,
-    ).execute()
-    source_disk_image = image_response["selfLink"]
-
-    # Startup script: maakt lokale user aan op Windows
-    # rol en afdeling van de medewerker voor op de VM
-    role = (emp.get("role") or "Employee")
-    department = (emp.get("department") or "General")
-
-    # Startup script: maakt lokale user aan op Windows
-    # en zet een PowerShell-installatiescript op C:\ dat de medewerker later
-    # zelf kan draaien om zijn afdeling-specifieke apps te krijgen.
-    department = (emp.get("department") or "General")
-
-    # App-commando's per afdeling
-    if department == "HR":
-        apps_commands = """
-choco install googlechrome -y --no-progress
-choco install libreoffice-fresh -y --no-progress
-choco install sumatrapdf -y --no-progress
-"""
-    elif department == "IT":
-        apps_commands = """
-choco install googlechrome -y --no-progress
-choco install vscode -y --no-progress
-choco install git -y --no-progress
-choco install putty -y --no-progress
-"""
-    elif department == "Sales":
-        apps_commands = """
-choco install googlechrome -y --no-progress
-choco install sumatrapdf -y --no-progress
-"""
-    else:
-        apps_commands = """
-Write-Host "No specific app bundle configured for this department."
-"""
-
-    startup_script = f"""
-<powershell>
-$u = "{username}"
-$p = "{temp_password}"
-
-# 1) Lokale user + RDP-rechten
-net user $u $p /add
-net localgroup "Remote Desktop Users" $u /add
-
-# 2) PowerShell-install script voor later gebruik
-$scriptPath = "C:\\Install-Apps.ps1"
-
-$scriptContent = @"
-# Department-specific application install script
-# Run this inside an elevated PowerShell window (Run as Administrator)
-
-Set-ExecutionPolicy Bypass -Scope Process -Force
-[System.Net.ServicePointManager]::SecurityProtocol = [System.Net.ServicePointManager]::SecurityProtocol -bor 3072
-
-if (!(Get-Command choco.exe -ErrorAction SilentlyContinue)) {{
-  Write-Host "Installing Chocolatey..."
-  iex ((New-Object System.Net.WebClient).DownloadString('https://community.chocolatey.org/install.ps1'))
-}}
-
-{apps_commands}
-"@
-
-$folder = Split-Path $scriptPath -Parent
-New-Item -Path $folder -ItemType Directory -Force | Out-Null
-$scriptContent | Out-File -FilePath $scriptPath -Encoding UTF8
-
-Write-Host "App install script written to $scriptPath"
-</powershell>
-"""
-
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(profiles))) as pool:
+        futures = {
+            profile.name: pool.submit(contextvars.copy_context().run, lookup_source_image, profile)
+            for profile in profiles
+        }
+    images = {}
+    for name, future in futures.items():
+        try:
+            images[name] = future.result()
+        except HttpError as e:
+            images[name] = e
+    return images
+
+
+def build_startup_script(emp, username, temp_password, shared=True) -> str:
+    """
+    PowerShell startup script: lokale user + afdelings-specifiek install-script
+    (config/app_bundles.json). Met shared=True haalt de VM het install-script
+    uit de project metadata, anders staat het inline in de startup script.
+    """
+    bundle = startup_scripts.bundle_for(emp.get("department"))
+    return startup_scripts.render(username, temp_password, bundle, shared=shared)
 
 
-    # LET OP: netwerk + subnet moeten bestaan in jouw project
-    config = {
-        "name": instance_name,
-        "machineType": f"zones/{GCP_ZONE}/machineTypes/e2-standard-2",
+def build_instance_config(emp, startup_script, profile, source_disk_image, zone, placement_scheduler):
+    """instances.insert body voor `zone`; het subnet hoort altijd bij de regio van die zone."""
+    return {
+        "name": f"hr-ws-{emp['id']}".replace("_", "-"),
+        "machineType": f"zones/{zone.name}/machineTypes/{profile.machine_type}",
         "disks": [
             {
                 "boot": True,
                 "autoDelete": True,
                 "initializeParams": {
                     "sourceImage": source_disk_image,
-                    "diskSizeGb": 50,
+                    "diskSizeGb": profile.disk_size_gb,
+                    "diskType": f"zones/{zone.name}/diskTypes/{profile.disk_type}",
                 },
             }
         ],
+        # LET OP: netwerk + subnet moeten bestaan in jouw project (config/placement.json)
         "networkInterfaces": [
             {
-                "network": f"projects/{GCP_PROJECT}/global/networks/innovatech-vpc",
-                "subnetwork": f"projects/{GCP_PROJECT}/regions/europe-west1/subnetworks/innovatech-vpc-automation",
+                "network": placement_scheduler.network_url(),
+                "subnetwork": zone.subnetwork_url(GCP_PROJECT),
                 "accessConfigs": [
                     {
                         "type": "ONE_TO_ONE_NAT",
@@ -243,7 +155,7 @@ Write-Host "App install script written to $scriptPath"
         "metadata": {
             "items": [
                 {
-                    "key": "windows-startup-script-ps1",
+                    "key": startup_scripts.STARTUP_SCRIPT_KEY,
                     "value": startup_script,
                 }
             ]
@@ -251,62 +163,158 @@ Write-Host "App install script written to $scriptPath"
         "tags": {"items": ["allow-rdp"]},
     }
 
-    print(f"[VM] Creating Windows VM {instance_name} in {GCP_ZONE}...")
-
-    op = compute.instances().insert(
-        project=GCP_PROJECT, zone=GCP_ZONE, body=config
-    ).execute()
 
-    wait_for_operation(compute, GCP_PROJECT, GCP_ZONE, op["name"])
-
-    # VM info ophalen om public IP te tonen
-    inst = compute.instances().get(
-        project=GCP_PROJECT, zone=GCP_ZONE, instance=instance_name
-    ).execute()
-
-    nic = inst["networkInterfaces"][0]
-    access_cfg = nic.get("accessConfigs", [])[0]
-    public_ip = access_cfg.get("natIP")
+def provision_workstations(employees, credentials, timers):
+    """
+    Maak de Windows VM's van een hele batch tegelijk, verspreid over de zones
+    uit config/placement.json (hrcore/placement.py). Een insert die op
+    capaciteit of quota faalt wordt in een andere zone opnieuw geprobeerd.
 
-    print(f"[VM] VM ready: {instance_name} (IP: {public_ip})")
-    return instance_name, public_ip
+    Retourneert {employee_id: (PlacementResult, public_ip)}.
+    """
+    gce = compute.get_compute_client()
+    scheduler = placement.PlacementScheduler(gce, GCP_PROJECT)
+    vms = {}
+
+    # image lookup één keer per sizing profile
+    groups = sizing.group_by_profile(employees)
+    images = lookup_source_images([profile for profile, _ in groups])
+    # app bundles één keer in de project metadata; lukt dat niet, dan inline
+    bundles = {startup_scripts.bundle_for(emp.get("department")) for emp in employees}
+    with tracing.span("gce.publish_app_bundles", **{"bundle.count": len(bundles)}):
+        published = startup_scripts.publish(gce, GCP_PROJECT, bundles)
+
+    requests, scripts = {}, {}
+    for profile, group in groups:
+        source_disk_image = images[profile.name]
+        if isinstance(source_disk_image, HttpError):
+            e = source_disk_image
+            print(f"[VM] Image lookup for profile {profile.name} failed: {e}")
+            for emp in group:
+                result = placement.PlacementResult()
+                result.error = f"vm_image_lookup: {e}"
+                vms[emp["id"]] = (result, None)
+            continue
+
+        for emp in group:
+            username, temp_password = credentials[emp["id"]]
+            shared = startup_scripts.bundle_for(emp.get("department")).key in published
+            startup_script = scripts[emp["id"]] = build_startup_script(
+                emp, username, temp_password, shared=shared,
+            )
+            requests[emp["id"]] = (
+                profile,
+                lambda zone, emp=emp, script=startup_script, profile=profile, image=source_disk_image:
+                    build_instance_config(emp, script, profile, image, zone, scheduler),
+            )
+
+    if not requests:
+        return vms
+
+    print(f"[VM] Creating {len(requests)} Windows VM(s) over {len(scheduler.zones)} zone(s)...")
+    with tracing.span("onboarding.vm_insert", **{"vm.count": len(requests)}):
+        results = placement.provision(scheduler, requests, concurrency=ONBOARDING_INSERT_CONCURRENCY)
+    for emp_id, result in results.items():
+        timers[emp_id].record("vm_insert", result.duration_ms, result.started_at, error=result.error)
+
+    adopt_workstations(gce, {emp_id: r for emp_id, r in results.items() if r.ok and r.adopted},
+                       scripts, timers)
+
+    # VM info ophalen om public IP te tonen (één batch request)
+    created = {emp_id: r for emp_id, r in results.items() if r.ok}
+    started_at, started = events.utcnow(), time.monotonic()
+    described = compute.execute_batch(gce, {
+        emp_id: gce.instances().get(
+            project=GCP_PROJECT, zone=r.zone.name, instance=f"hr-ws-{emp_id}"
+        )
+        for emp_id, r in created.items()
+    }) if created else {}
+    describe_ms = (time.monotonic() - started) * 1000
+
+    for emp_id, result in results.items():
+        public_ip = None
+        if emp_id in described:
+            inst, exc = described[emp_id]
+            timers[emp_id].record("vm_describe", describe_ms, started_at,
+                                  error=str(exc) if exc is not None else None)
+            if inst is not None:
+                access_cfg = inst["networkInterfaces"][0].get("accessConfigs", [{}])[0]
+                public_ip = access_cfg.get("natIP")
+                print(f"[VM] VM ready: hr-ws-{emp_id} in {result.zone.name} (IP: {public_ip})")
+        vms[emp_id] = (result, public_ip)
+    return vms
+
+
+def adopt_workstations(gce, adopted, scripts, timers):
+    """
+    VM's die al bestonden (409 op de insert: een eerdere run brak af na de
+    insert) overnemen: startup script met de credentials van deze run erop
+    zetten en de VM herstarten, zodat de lokale user dit wachtwoord krijgt.
+    Mislukt dat, dan krijgt het PlacementResult een error (onboarding_failed).
+    """
+    if not adopted:
+        return
+    print(f"[VM] Adopting {len(adopted)} existing VM(s) from an earlier run...")
+    started_at, started = events.utcnow(), time.monotonic()
+    with tracing.span("onboarding.vm_adopt", **{"vm.count": len(adopted)}):
+        current = compute.execute_batch(gce, {
+            emp_id: gce.instances().get(project=GCP_PROJECT, zone=r.zone.name, instance=f"hr-ws-{emp_id}")
+            for emp_id, r in adopted.items()
+        })
+        failures, instances = {}, {}
+        for emp_id, (inst, exc) in current.items():
+            if exc is not None:
+                failures[emp_id] = str(exc)
+            else:
+                instances[emp_id] = inst
+
+        def metadata_body(emp_id):
+            metadata = instances[emp_id].get("metadata") or {}
+            items = [item for item in metadata.get("items", [])
+                     if item.get("key") != startup_scripts.STARTUP_SCRIPT_KEY]
+            items.append({"key": startup_scripts.STARTUP_SCRIPT_KEY, "value": scripts[emp_id]})
+            return {"fingerprint": metadata.get("fingerprint"), "items": items}
+
+        updated = compute.run_operations(gce, GCP_PROJECT, {
+            emp_id: (adopted[emp_id].zone.name, lambda emp_id=emp_id: gce.instances().setMetadata(
+                project=GCP_PROJECT, zone=adopted[emp_id].zone.name, instance=f"hr-ws-{emp_id}",
+                body=metadata_body(emp_id),
+            ))
+            for emp_id in instances
+        }, concurrency=ONBOARDING_INSERT_CONCURRENCY)
+        failures.update({emp_id: op.error for emp_id, op in updated.items() if not op.ok})
+
+        # startup script draait bij boot: een draaiende VM resetten, een gestopte starten
+        restarted = compute.run_operations(gce, GCP_PROJECT, {
+            emp_id: (adopted[emp_id].zone.name, lambda emp_id=emp_id, inst=inst: (
+                gce.instances().reset if inst.get("status") == "RUNNING" else gce.instances().start
+            )(project=GCP_PROJECT, zone=adopted[emp_id].zone.name, instance=f"hr-ws-{emp_id}"))
+            for emp_id, inst in instances.items() if emp_id not in failures
+        }, concurrency=ONBOARDING_INSERT_CONCURRENCY)
+        failures.update({emp_id: op.error for emp_id, op in restarted.items() if not op.ok})
+
+    duration_ms = (time.monotonic() - started) * 1000
+    for emp_id, result in adopted.items():
+        error = failures.get(emp_id)
+        timers[emp_id].record("vm_adopt", duration_ms, started_at, error=error)
+        if error is not None:
+            result.error = f"vm_adopt: {error}"
 
 
 # ========== CLOUD IDENTITY (SIMULATED) ==========
 
-def _groups_for_role(role: str):
-    """Return the logical access groups for a given business role."""
-    base_groups = ["corp-all-employees"]
-    role_norm = (role or "Employee").strip().upper()
-
-    if role_norm == "MANAGER":
-        base_groups.append("corp-managers")
-    elif role_norm in {"HR_ADMIN", "HR-ADMIN", "HR ADMIN"}:
-        base_groups.append("corp-hr-admins")
-
-    return base_groups
-
-
 def simulate_cloud_identity_onboarding(emp, username: str) -> None:
     """
     Simuleert de stappen die normaal via Cloud Identity / Admin SDK gaan:
-    - aanmaken van een Identity-account
-    - toevoegen aan de juiste access-groepen op basis van role.
+    aanmaken van een Identity-account en de baseline policies.
     Dit blijft bewust bij logging; er worden geen echte accounts aangemaakt.
+    De access-groepen zet onboard_batch per batch (hrcore/identity_sync.py).
     """
     email = emp.get("email")
-    role = emp.get("role", "Employee")
-    groups = _groups_for_role(role)
 
     print(f"[IDENTITY] Creating Cloud Identity user {email} (username: {username})")
     print(f"[IDENTITY] Applying baseline security / org unit policies for {email}")
 
-    for g in groups:
-        print(f"[IDENTITY] Adding {email} to group {g}")
-
-    if not groups:
-        print(f"[IDENTITY] No groups configured for role {role}, skipping group assignment")
-
 
 # ========== EMAIL ==========
 
@@ -316,7 +324,7 @@ def send_welcome_email(emp, username, temp_password, public_ip):
         return
 
     msg = EmailMessage()
-    msg["Subject"] = "Welkom bij Innovatech – je digitale werkplek is klaar"
+    msg["Subject"] = WELCOME_SUBJECT
     msg["From"] = SMTP_USER
     msg["To"] = emp["email"]
 
@@ -337,7 +345,8 @@ Innovatech IT Automation Service
     msg.set_content(body)
 
     print(f"[MAIL] Sending welcome email to {emp['email']}...")
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+    with tracing.span("smtp.send", server=SMTP_SERVER), \
+            smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
         server.starttls()
         server.login(SMTP_USER, SMTP_PASSWORD)
         server.send_message(msg)
@@ -346,23 +355,31 @@ Innovatech IT Automation Service
 
 # ========== DATABASE LOGIC ==========
 
-def fetch_new_employees(conn):
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
-            """
-            SELECT *
-            FROM employees
-            WHERE status = 'NEW'
-              AND cloud_account_created = false
-            ORDER BY id;
-            """
-        )
-        return cur.fetchall()
+def claim_new_employees(conn):
+    """
+    Claim de volgende batch NEW employees voor deze worker (FOR UPDATE SKIP LOCKED),
+    zodat meerdere workers nooit dezelfde medewerker onboarden.
+    """
+    return claims.claim_batch(conn, "onboarding", records.OnboardingEmployee)
 
 
-def mark_employee_as_onboarded(conn, emp_id, username, temp_password):
-    now = datetime.datetime.utcnow().isoformat() + "Z"
+def mark_employee_as_onboarded(conn, emp_id, username, temp_password, instance_name,
+                               zone, profile_name, bundle_key, batch, timer=None, started=None):
+    """
+    Zet de employee op ACTIVE en schrijf de verzamelde events in dezelfde transactie.
+    De VM-naam + zone worden bewaard zodat offboarding de VM kan verwijderen;
+    sizing profile en app bundle voor de portal en voor een latere transfer.
+    onboarding_completed komt ná de db_update stage: het is het laatste event van de run.
+
+    Retourneert False (niets gewijzigd) als de claim intussen door een andere
+    worker is overgenomen.
+    """
+    timer = timer or events.StageTimer(None, emp_id)
     with conn.cursor() as cur:
+        if not claims.release_claim(cur, emp_id):
+            conn.rollback()
+            return False
+    with conn.cursor() as cur, timer.stage("db_update"):
         cur.execute(
             """
             UPDATE employees
@@ -372,61 +389,261 @@ def mark_employee_as_onboarded(conn, emp_id, username, temp_password):
                 device_enrolled = true,
                 workspace_username = %s,
                 workspace_temp_password = %s,
-                last_action = %s,
+                workstation_instance = %s,
+                workstation_zone = %s,
+                workstation_profile = %s,
+                workstation_bundle = %s,
+                workstation_power_state = 'RUNNING',
+                workstation_power_reason = 'provisioned',
+                workstation_power_changed_at = NOW(),
                 updated_at = NOW()
             WHERE id = %s;
             """,
-            (username, temp_password, f"Onboarding completed at {now}", emp_id),
+            (username, temp_password, instance_name, zone, profile_name, bundle_key, emp_id),
         )
+    batch.add(
+        emp_id,
+        events.ONBOARDING_COMPLETED,
+        duration_ms=(time.monotonic() - started) * 1000 if started is not None else None,
+        detail={"instance": instance_name, "zone": zone, "profile": profile_name},
+    )
+    with conn.cursor() as cur:
+        batch.flush(cur)
     conn.commit()
+    return True
 
 
-# ========== MAIN FLOW ==========
+def record_onboarding_failure(conn, emp_id, batch):
+    """Schrijf een mislukte onboarding weg zonder de employee-status te wijzigen."""
+    with conn.cursor() as cur:
+        claims.defer_claim(cur, emp_id)
+        batch.flush(cur)
+    conn.commit()
 
-def main():
-    print("=== Onboarding run started ===")
-    conn = get_db_connection()
+
+def fail_onboarding(conn, batch, emp, error, started):
+    """Onverwachte fout na de VM-stap: rollback, onboarding_failed + claim uitstellen."""
+    print(f"[ERROR] Onboarding of {emp['email']} failed: {error}")
+    conn.rollback()
+    # niet weggeschreven uitkomst van deze poging (completed, of een failed van
+    # het VM-pad) vervalt: per poging precies één onboarding_failed
+    batch.discard(emp["id"], {events.ONBOARDING_COMPLETED, events.ONBOARDING_FAILED})
+    batch.add(
+        emp["id"],
+        events.ONBOARDING_FAILED,
+        duration_ms=(time.monotonic() - started) * 1000,
+        detail={"stage": "finish", "error": str(error)[:500]},
+    )
     try:
-        employees = fetch_new_employees(conn)
-        if not employees:
-            print("No employees to onboard.")
-            return
+        record_onboarding_failure(conn, emp["id"], batch)
+    except Exception as e:
+        # DB zelf onbereikbaar: de lease verloopt en de employee komt vanzelf terug
+        conn.rollback()
+        print(f"[ERROR] Could not record onboarding failure for {emp['email']}: {e}")
+    if ONBOARDING_ATTEMPTS is not None:
+        ONBOARDING_ATTEMPTS.labels(result="error").inc()
 
-        print(f"Found {len(employees)} employee(s) to onboard.")
 
-        for emp in employees:
-            print(f"\nProcessing employee ID {emp['id']} - {emp['email']}")
+# ========== MAIN FLOW ==========
 
-            username = generate_username(emp)
-            temp_password = generate_temp_password()
+def finish_onboarding(conn, batch, emp, credentials, vm, timer, started):
+    """Identity, welkomstmail en DB-update van één employee waarvan de VM klaar is (of faalde)."""
+    print(f"\nProcessing employee ID {emp['id']} - {emp['email']}")
+    username, temp_password = credentials
+    result, public_ip = vm
+    profile = sizing.profile_for_employee(emp)
+
+    if not result.ok:
+        print(f"[ERROR] Failed to create VM for {emp['email']}: {result.error}")
+        batch.add(
+            emp["id"],
+            events.ONBOARDING_FAILED,
+            duration_ms=(time.monotonic() - started) * 1000,
+            detail={"stage": "vm_create", "error": result.error,
+                    "zones": [zone for zone, _ in result.attempts]},
+        )
+        record_onboarding_failure(conn, emp["id"], batch)
+        if ONBOARDING_ATTEMPTS is not None:
+            ONBOARDING_ATTEMPTS.labels(result="vm_error").inc()
+        return
+
+    instance_name = f"hr-ws-{emp['id']}"
+
+    # Simulated Cloud Identity account + group assignment
+    with timer.stage("identity"):
+        simulate_cloud_identity_onboarding(emp, username)
+
+    # Welkomstmail
+    with timer.stage("welcome_email"):
+        send_welcome_email(emp, username, temp_password, public_ip)
+
+    # DB updaten
+    if not mark_employee_as_onboarded(
+        conn, emp["id"], username, temp_password, instance_name, result.zone.name,
+        profile.name, startup_scripts.bundle_for(emp.get("department")).key, batch,
+        timer=timer, started=started,
+    ):
+        print(f"[WARN] Claim on {emp['email']} expired and was taken over by another worker; not marking ACTIVE.")
+        if ONBOARDING_ATTEMPTS is not None:
+            ONBOARDING_ATTEMPTS.labels(result="claim_lost").inc()
+        return
+    print("[OK] Employee marked as ACTIVE in database.")
+    print("[TIMING] " + ", ".join(
+        f"{name}={ms:.0f}ms" for name, ms in timer.durations_ms.items()
+    ))
 
+    if ONBOARDING_ATTEMPTS is not None:
+        ONBOARDING_ATTEMPTS.labels(result="success").inc()
+
+
+def onboard_batch(conn, batch, employees, run_span):
+    """
+    VM's voor de hele batch parallel, daarna identity/mail/DB per employee en
+    tot slot de access-groepen van de hele batch in één reconciliation.
+    """
+    started = time.monotonic()
+    timers = {emp["id"]: events.StageTimer(batch, emp["id"]) for emp in employees}
+    credentials = {
+        emp["id"]: (identity.generate_username(emp), identity.generate_temp_password()) for emp in employees
+    }
+
+    vms = provision_workstations(employees, credentials, timers)
+
+    # stage events van de VM's al wegschrijven: de portal toont de voortgang live
+    with conn.cursor() as cur:
+        batch.flush(cur)
+    conn.commit()
+
+    for emp in employees:
+        # Child van de portal-request die deze hire aanmaakte (traceparent
+        # bij het onboarding_requested event), gelinkt aan deze run.
+        parent = tracing.parse_traceparent(emp.get("traceparent")) or run_span.context
+        with tracing.start_span(
+            "onboarding.employee",
+            parent=parent,
+            attributes={"employee.id": emp["id"]},
+            links=[run_span.context],
+        ) as span:
             try:
-                instance_name, public_ip = create_windows_vm_for_employee(
-                    emp, username, temp_password
+                finish_onboarding(
+                    conn, batch, emp, credentials[emp["id"]], vms[emp["id"]], timers[emp["id"]], started
                 )
-            except HttpError as e:
-                print(f"[ERROR] Failed to create VM for {emp['email']}: {e}")
-                if ONBOARDING_ATTEMPTS is not None:
-                    ONBOARDING_ATTEMPTS.labels(result="vm_error").inc()
-                continue
+            except Exception as e:
+                # één employee (SMTP, DB, ...) mag de rest van de batch niet tegenhouden;
+                # de VM blijft staan en wordt bij de volgende poging overgenomen (409)
+                span.record_exception(e)
+                fail_onboarding(conn, batch, emp, e, started)
+
+    sync_groups(conn, [emp["id"] for emp in employees])
+
+
+def sync_groups(conn, employee_ids):
+    """Access-groepen van de batch; alleen wie nu ACTIVE is krijgt groepen."""
+    with tracing.span("identity.groups", **{"employees.count": len(employee_ids)}):
+        try:
+            result = identity_sync.reconcile(
+                conn, employee_ids, actor="automation:onboarding", record_events=False
+            )
+        except Exception as e:
+            # group_sync.py pakt het bij de volgende volledige run op
+            print(f"[IDENTITY] Group sync for batch failed: {e}")
+            return
+    print(f"[IDENTITY] Added {result['added']} group membership(s) in {result['calls']} call(s).")
 
-            # Simulated Cloud Identity account + group assignment
-            simulate_cloud_identity_onboarding(emp, username)
 
-            # Welkomstmail
-            send_welcome_email(emp, username, temp_password, public_ip)
+def main(preemptible=False):
+    """
+    Onboard alle claimbare employees. Met preemptible=True (automation worker)
+    stopt de run na de lopende batch zodra er urgente offboarding wacht en
+    geeft True terug; de worker doet dan eerst de offboarding.
+    """
+    print("=== Onboarding run started ===")
+    run_span = tracing.start_process_span("onboarding.run").activate()
+    batch = events.EventBatch(actor="automation:onboarding")
+    processed = 0
+    preempted = False
+    try:
+        with db.connection() as conn:
+            # kleine batches claimen zodat de lease niet verloopt tijdens een grote import
+            while True:
+                employees = claim_new_employees(conn)
+                if not employees:
+                    break
+
+                print(f"Claimed {len(employees)} employee(s) to onboard.")
+                onboard_batch(conn, batch, employees, run_span)
+                processed += len(employees)
+
+                if preemptible and claims.urgent_waiting(conn, "offboarding"):
+                    print("Urgent offboarding waiting, yielding after this batch.")
+                    preempted = True
+                    break
+
+        run_span.set_attribute("employees.count", processed)
+        if not processed:
+            print("No employees to onboard.")
+            return False
 
-            # DB updaten
-            mark_employee_as_onboarded(conn, emp["id"], username, temp_password)
-            print("[OK] Employee marked as ACTIVE in database.")
+        print("\n=== Onboarding run finished successfully ===")
+        return preempted
+    finally:
+        run_span.end()
+        tracing.flush()
+
+
+# ========== PLAN MODE ==========
+
+def plan_employee(emp, estimate, scheduler):
+    """Acties van de onboarding van één employee, zonder ze uit te voeren."""
+    profile = sizing.profile_for_employee(emp)
+    zone = scheduler.choose(profile)  # zonder quota-check: spreiding zoals bij provisioning
+    zone_name = zone.name if zone else None
+    estimate.add(emp, hourly_cost=profile.hourly_cost, profiles=profile.name, zones=zone_name)
+    return {
+        "employee_id": emp["id"],
+        "email": emp["email"],
+        "lane": claims.lane("onboarding", emp.get("queue_priority")),
+        "vm": {
+            "name": f"hr-ws-{emp['id']}",
+            "profile": profile.name,
+            "machine_type": profile.machine_type,
+            "disk": f"{profile.disk_size_gb} GB {profile.disk_type}",
+            "image": f"{profile.image_project}/{profile.image_family}",
+            "zone": zone_name,
+            "app_bundle": startup_scripts.bundle_for(emp.get("department")).name,
+        },
+        "identity": {
+            "username": identity.generate_username(emp),
+            "groups": list(identity.groups_for_role(emp.get("role"))),
+        },
+        "mail": {
+            "to": emp["email"],
+            "subject": WELCOME_SUBJECT,
+            "send": bool(SMTP_USER and SMTP_PASSWORD),
+        },
+    }
 
-            if ONBOARDING_ATTEMPTS is not None:
-                ONBOARDING_ATTEMPTS.labels(result="success").inc()
 
-        print("\n=== Onboarding run finished successfully ===")
+def write_plan(out=None):
+    """--plan: wat een run nu zou doen, als JSON Lines; geen claims, VM's of mails."""
+    scheduler = placement.PlacementScheduler(None, GCP_PROJECT, check_quotas=False)
+    estimate = plan.Estimate(
+        parallel_stages=["vm_insert", "vm_describe"],
+        serial_stages=["identity", "welcome_email", "db_update"],
+        concurrency=ONBOARDING_INSERT_CONCURRENCY,
+    )
+    try:
+        with db.connection() as conn:
+            rows = plan.plan_rows(
+                conn, "onboarding", actor="automation:onboarding", record=records.OnboardingPlanRow,
+            )
+            return plan.write(rows, lambda emp, est: plan_employee(emp, est, scheduler), estimate, out)
     finally:
-        conn.close()
+        tracing.flush()
 
 
 if __name__ == "__main__":
-    main()
+    if "--plan" in sys.argv[1:]:
+        write_plan()
+    else:
+        main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Placement simulatie (geen GCP nodig)
+
+Stuurt N synthetische workstation-inserts door de PlacementScheduler
+(hrcore/placement.py) tegen een in-memory FakeComputeClient, met optioneel
+krappe quota en zones zonder capaciteit. Print doorvoer, aantal pogingen en
+de verdeling over de zones.
+
+Voorbeeld:
+    python automation/placement_sim.py --vms 200 --quota CPUS=400,SSD_TOTAL_GB=20000 \
+        --stockout europe-west1-c --all-regions
+"""
+
+import argparse
+import collections
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from hrcore import placement, sizing  # noqa: E402
+from hrcore.fake_compute import FakeComputeClient  # noqa: E402
+
+SIM_PROJECT = "placement-sim"
+
+
+def parse_quota(value):
+    quota = {}
+    for item in (value or "").split(","):
+        if item.strip():
+            metric, _, limit = item.partition("=")
+            quota[metric.strip()] = float(limit)
+    return quota
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vms", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--profile", default=None, help="sizing profile (default: default profiel)")
+    parser.add_argument("--quota", default="", help='regionale limieten, bv. "CPUS=200,SSD_TOTAL_GB=8000"')
+    parser.add_argument("--stockout", default="", help="komma-gescheiden zones zonder capaciteit")
+    parser.add_argument("--op-polls", type=int, default=1)
+    parser.add_argument("--all-regions", action="store_true", help="ook regio's met enabled=false")
+    args = parser.parse_args()
+
+    profiles, default, _ = sizing.load_profiles()
+    profile = profiles[args.profile] if args.profile else default
+
+    config = placement.load_config()
+    if args.all_regions:
+        config = dict(config, regions={
+            region: dict(settings, enabled=True) for region, settings in config["regions"].items()
+        })
+
+    gce = FakeComputeClient(
+        op_polls=args.op_polls,
+        quota=parse_quota(args.quota),
+        stockout_zones=[z.strip() for z in args.stockout.split(",") if z.strip()],
+    )
+    scheduler = placement.PlacementScheduler(gce, SIM_PROJECT, config=config)
+
+    def build_body(zone, i):
+        return {
+            "name": f"sim-ws-{i}",
+            "machineType": f"zones/{zone.name}/machineTypes/{profile.machine_type}",
+            "disks": [{"boot": True, "initializeParams": {
+                "diskSizeGb": profile.disk_size_gb,
+                "diskType": f"zones/{zone.name}/diskTypes/{profile.disk_type}",
+            }}],
+            "networkInterfaces": [{
+                "network": scheduler.network_url(),
+                "subnetwork": zone.subnetwork_url(SIM_PROJECT),
+            }],
+        }
+
+    requests = {
+        i: (profile, lambda zone, i=i: build_body(zone, i)) for i in range(args.vms)
+    }
+
+    print(f"[SIM] {args.vms} VM(s) with profile {profile.summary()} over "
+          f"{len(scheduler.zones)} zone(s), concurrency {args.concurrency}")
+    started = time.monotonic()
+    results = placement.provision(scheduler, requests, concurrency=args.concurrency)
+    elapsed = time.monotonic() - started
+
+    ok = [r for r in results.values() if r.ok]
+    per_zone = collections.Counter(r.zone.name for r in ok)
+    attempts = sum(len(r.attempts) for r in results.values())
+    errors = collections.Counter(r.error.split(":", 1)[0] for r in results.values() if not r.ok)
+
+    print(f"[SIM] {len(ok)}/{len(results)} created in {elapsed:.2f}s "
+          f"({len(ok) / elapsed if elapsed else 0:.1f} VM/s), {attempts} insert attempt(s)")
+    for zone in scheduler.zones:
+        print(f"[SIM]   {zone.name:<20} {per_zone.get(zone.name, 0):>5} VM(s)  "
+              f"failure_rate={zone.failure_rate:.2f}")
+    for code, count in errors.most_common():
+        print(f"[SIM]   failed: {count} x {code}")
+
+
+if __name__ == "__main__":
+    main()
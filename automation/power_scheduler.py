@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Workstation Power Scheduler (daemon)
+
+- Elke POWER_SCHEDULER_INTERVAL seconden:
+    * actuele status van alle actieve workstation VM's ophalen (batched instances.get)
+    * CPU-utilization ophalen voor VM's die idle kunnen zijn (één Monitoring-query)
+    * per VM beslissen volgens de afdelings-policy (hrcore/power.py)
+    * starts/stops uitvoeren als GCE batch requests met begrensde concurrency
+    * power state in employees bijwerken (zichtbaar in de portal)
+- LISTEN op hr_workstation_power: de portal vraagt een on-demand start aan,
+  die direct wordt uitgevoerd (niet pas bij de volgende tick).
+- Eén scheduler tegelijk actief (pg advisory lock); extra replicas wachten.
+
+Met --once draait één tick en stopt het script (bv. als CronJob).
+"""
+
+import os
+import select
+import sys
+import time
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+
+# Shared modules (hrcore/) live in the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from hrcore import compute, db, events, power, records, tracing  # noqa: E402
+
+# Optional Prometheus metrics (safe fallback if library is missing)
+try:
+    from prometheus_client import Counter
+except ImportError:  # pragma: no cover - optional dependency
+    Counter = None
+
+SERVICE_NAME = "automation-power-scheduler"
+tracing.set_service_name(SERVICE_NAME)
+
+# Database config (DB_*): hrcore/db.py
+
+GCP_PROJECT = os.getenv("GCP_PROJECT", "cs3-innovatech-hr-project")
+GCP_ZONE = os.getenv("GCP_ZONE", "europe-west1-b")
+
+POWER_SCHEDULER_INTERVAL = float(os.getenv("POWER_SCHEDULER_INTERVAL", "300"))
+POWER_CONCURRENCY = int(os.getenv("POWER_CONCURRENCY", "20"))
+
+# willekeurige, vaste sleutel voor pg_try_advisory_lock
+SCHEDULER_LOCK_KEY = 73_350_001
+
+if Counter is not None:
+    POWER_ACTIONS = Counter(
+        "automation_power_actions_total",
+        "Workstation VM start/stop actions by the power scheduler",
+        ["action", "reason", "result"],
+    )
+else:
+    POWER_ACTIONS = None
+
+WORKSTATIONS_SQL = """
+    SELECT {columns}
+    FROM employees e
+    WHERE status = 'ACTIVE'
+      AND deprovisioned = FALSE
+      AND workstation_instance IS NOT NULL
+      {extra}
+    ORDER BY id;
+"""
+
+# (id, state, reason, changed): changed = state is nu veranderd
+UPDATE_POWER_SQL = """
+    UPDATE employees e
+    SET workstation_power_state = v.state,
+        workstation_power_reason = CASE WHEN v.changed THEN v.reason ELSE e.workstation_power_reason END,
+        workstation_power_changed_at = CASE WHEN v.changed THEN NOW() ELSE e.workstation_power_changed_at END
+    FROM (VALUES %s) AS v (id, state, reason, changed)
+    WHERE e.id = v.id;
+"""
+
+
+def _zone(emp):
+    return emp.get("workstation_zone") or GCP_ZONE
+
+
+def fetch_workstations(conn, employee_ids=None):
+    extra, params = "", None
+    if employee_ids is not None:
+        extra, params = "AND id = ANY(%s)", (list(employee_ids),)
+    with conn.cursor() as cur:
+        cur.execute(WORKSTATIONS_SQL.format(columns=records.Workstation.projection(), extra=extra), params)
+        return records.Workstation.from_rows(cur.fetchall())
+
+
+def fetch_power_states(gce, workstations):
+    """{employee_id: power state} via batched instances.get (max. GCE_MAX_BATCH per request)."""
+    states = {}
+    for i in range(0, len(workstations), compute.GCE_MAX_BATCH):
+        chunk = workstations[i:i + compute.GCE_MAX_BATCH]
+        responses = compute.execute_batch(gce, {
+            emp["id"]: gce.instances().get(
+                project=GCP_PROJECT, zone=_zone(emp), instance=emp["workstation_instance"]
+            )
+            for emp in chunk
+        })
+        for emp_id, (response, exc) in responses.items():
+            if exc is not None:
+                if compute.is_not_found(exc):
+                    states[emp_id] = power.MISSING
+                else:
+                    print(f"[POWER] Could not read state of employee {emp_id}'s VM: {exc}")
+            else:
+                states[emp_id] = power.GCE_STATUS.get(response.get("status"), power.STARTING)
+    return states
+
+
+def fetch_idle_cpu(workstations, states, now):
+    """{employee_id: cpu} voor VM's die volgens hun policy idle kunnen zijn."""
+    by_window = {}
+    for emp in workstations:
+        if power.needs_idle_check(emp, states.get(emp["id"]), now):
+            minutes = power.policy_for(emp["department"]).idle_minutes
+            by_window.setdefault(minutes, []).append(emp)
+
+    cpu = {}
+    for minutes, emps in by_window.items():
+        utilization = compute.fetch_cpu_utilization(GCP_PROJECT, minutes)
+        for emp in emps:
+            if emp["workstation_instance"] in utilization:
+                cpu[emp["id"]] = utilization[emp["workstation_instance"]]
+    return cpu
+
+
+def apply_actions(gce, workstations, actions):
+    """
+    Voer {employee_id: (actie, reden)} uit als batched start/stop calls.
+    Geeft {employee_id: nieuwe state} terug voor de geslaagde acties.
+    """
+    by_id = {emp["id"]: emp for emp in workstations}
+    calls = {}
+    for emp_id, (action, _) in actions.items():
+        emp = by_id[emp_id]
+        method = gce.instances().start if action == power.START else gce.instances().stop
+        calls[emp_id] = (_zone(emp), lambda method=method, emp=emp: method(
+            project=GCP_PROJECT, zone=_zone(emp), instance=emp["workstation_instance"],
+        ))
+
+    with tracing.span("power.apply", **{"vm.count": len(calls)}):
+        results = compute.run_operations(gce, GCP_PROJECT, calls, concurrency=POWER_CONCURRENCY)
+
+    new_states = {}
+    for emp_id, result in results.items():
+        action, reason = actions[emp_id]
+        name = by_id[emp_id]["workstation_instance"]
+        if result.ok:
+            new_states[emp_id] = power.RUNNING if action == power.START else power.STOPPED
+            print(f"[POWER] {action} {name} ({reason}) in {result.duration_ms / 1000:.1f}s")
+        else:
+            print(f"[ERROR] Failed to {action} {name}: {result.error}")
+        if POWER_ACTIONS is not None:
+            POWER_ACTIONS.labels(
+                action=action, reason=reason, result="success" if result.ok else "error"
+            ).inc()
+    return new_states
+
+
+def save_power_states(conn, workstations, states, actions, new_states):
+    """Schrijf de power state van alle bekeken VM's weg (één UPDATE)."""
+    rows = []
+    for emp in workstations:
+        emp_id = emp["id"]
+        if emp_id in new_states:
+            rows.append((emp_id, new_states[emp_id], actions[emp_id][1], True))
+        elif emp_id in states:
+            state = states[emp_id]
+            rows.append((emp_id, state, "observed", state != emp["workstation_power_state"]))
+    if not rows:
+        return
+    with conn, conn.cursor() as cur:
+        execute_values(cur, UPDATE_POWER_SQL, rows)
+
+
+def reconcile(conn, employee_ids=None):
+    """Eén ronde: state ophalen, beslissen, uitvoeren, opslaan."""
+    gce = compute.get_compute_client()
+    now = events.utcnow()
+    workstations = fetch_workstations(conn, employee_ids)
+    if not workstations:
+        return
+
+    states = fetch_power_states(gce, workstations)
+    cpu = fetch_idle_cpu(workstations, states, now)
+
+    actions = {}
+    for emp in workstations:
+        decision = power.decide(emp, states.get(emp["id"]), now, cpu.get(emp["id"]))
+        if decision is not None:
+            actions[emp["id"]] = decision
+
+    new_states = apply_actions(gce, workstations, actions) if actions else {}
+    save_power_states(conn, workstations, states, actions, new_states)
+    print(f"[POWER] Checked {len(workstations)} VM(s), {len(new_states)}/{len(actions)} action(s) applied.")
+
+
+def listen_connection():
+    conn = db.connect()
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {power.NOTIFY_CHANNEL};")
+    return conn
+
+
+def try_leader_lock(conn) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s);", (SCHEDULER_LOCK_KEY,))
+        return cur.fetchone()[0]
+
+
+def wait_for_requests(conn, timeout):
+    """Employee ids van on-demand starts, of een lege set na de timeout."""
+    ids = set()
+    if select.select([conn], [], [], max(timeout, 0))[0]:
+        conn.poll()
+        while conn.notifies:
+            payload = conn.notifies.pop(0).payload
+            if payload.isdigit():
+                ids.add(int(payload))
+    return ids
+
+
+def main():
+    once = "--once" in sys.argv[1:]
+    print("=== Power scheduler started ===")
+    listen = listen_connection()
+    conn = db.connect()
+    try:
+        if once:
+            with tracing.start_process_span("power.reconcile"):
+                reconcile(conn)
+            return
+
+        leader = False
+        next_tick = 0.0
+        while True:
+            if not leader:
+                leader = try_leader_lock(listen)
+                if not leader:
+                    time.sleep(POWER_SCHEDULER_INTERVAL)
+                    continue
+                print("[POWER] Acquired scheduler lock.")
+
+            if time.monotonic() >= next_tick:
+                with tracing.start_span("power.reconcile"):
+                    reconcile(conn)
+                next_tick = time.monotonic() + POWER_SCHEDULER_INTERVAL
+
+            requested = wait_for_requests(listen, next_tick - time.monotonic())
+            if requested:
+                print(f"[POWER] On-demand start requested for employee(s) {sorted(requested)}")
+                with tracing.start_span("power.on_demand", attributes={"vm.count": len(requested)}):
+                    reconcile(conn, requested)
+    finally:
+        conn.close()
+        listen.close()
+        tracing.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Transfer / Role-change Automation Service
+
+For ACTIVE employees whose department or role was changed in the portal
+(transfer_pending = true), only the delta is applied instead of an offboarding
+plus a new onboarding:
+- Access groups: the batch is reconciled against the new role (hrcore/identity_sync.py)
+- App bundle: if the new department has another bundle, it is published to the
+  project metadata and the VM's startup script is replaced (instances.setMetadata).
+  The new script only writes Install-Apps.ps1 for the new bundle at the next boot;
+  the local user and its data stay as they are.
+- Machine type: if the new sizing profile has another machine type, the VM is
+  stopped, resized (instances.setMachineType) and started again if it was running.
+  Disk size/type and image are not changed on an existing VM. The resulting power
+  state is written to workstation_power_state; a VM that could not be started
+  again keeps reason 'transfer-restart' and the next transfer run starts it.
+- The GCE calls of the whole batch go out as batch requests (hrcore/compute.py).
+- Updates workstation_profile / workstation_bundle, clears transfer_pending
+  (unless the portal changed the employee again in the meantime) and records a
+  transfer_completed or transfer_failed event.
+
+COMPUTE_BACKEND=fake / IDENTITY_BACKEND=fake run the same flow without GCP.
+"""
+
+import os
+import sys
+import time
+
+# Shared modules (hrcore/) live in the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from hrcore import (  # noqa: E402
+    claims, compute, db, events, identity_sync, power, records, sizing, startup_scripts, tracing,
+)
+
+# Optional Prometheus metrics (safe fallback if library is missing)
+try:
+    from prometheus_client import Counter
+except ImportError:  # pragma: no cover - optional dependency
+    Counter = None
+
+SERVICE_NAME = "automation-transfer"
+tracing.set_service_name(SERVICE_NAME)
+
+GCP_PROJECT = os.getenv("GCP_PROJECT", "cs3-innovatech-hr-project")
+GCP_ZONE = os.getenv("GCP_ZONE", "europe-west1-b")
+
+# Max. number of GCE operations (setMetadata / stop / setMachineType / start) in flight
+TRANSFER_CONCURRENCY = int(os.getenv("TRANSFER_CONCURRENCY", "10"))
+
+if Counter is not None:
+    TRANSFER_ATTEMPTS = Counter(
+        "automation_transfer_attempts_total",
+        "Number of employees processed by the transfer service",
+        ["result"],
+    )
+else:
+    TRANSFER_ATTEMPTS = None
+
+# transfer_pending stays set if department/role changed again while this run was busy
+MARK_TRANSFERRED_SQL = """
+    UPDATE employees
+    SET transfer_pending = NOT (department IS NOT DISTINCT FROM %(department)s
+                                AND role IS NOT DISTINCT FROM %(role)s),
+        workstation_profile = COALESCE(%(profile)s, workstation_profile),
+        workstation_bundle = COALESCE(%(bundle)s, workstation_bundle),
+        updated_at = NOW()
+    WHERE id = %(id)s;
+"""
+
+# workstation_power_reason: 'transfer', or 'transfer-restart' while a VM that was
+# running before the resize still has to be started again
+POWER_REASON = "transfer"
+POWER_RESTART_REASON = "transfer-restart"
+
+UPDATE_POWER_SQL = """
+    UPDATE employees
+    SET workstation_power_state = %s,
+        workstation_power_reason = %s,
+        workstation_power_changed_at = NOW()
+    WHERE id = %s;
+"""
+
+UPDATE_BUNDLE_SQL = """
+    UPDATE employees
+    SET workstation_bundle = %s,
+        updated_at = NOW()
+    WHERE id = %s;
+"""
+
+
+class Change:
+    """What a transfer has to do for one employee."""
+
+    __slots__ = (
+        "emp", "profile", "bundle", "resize", "update_bundle", "was_running", "restart", "metadata",
+        "power_state",
+    )
+
+    def __init__(self, emp):
+        self.emp = emp
+        self.profile = sizing.profile_for_employee(emp)
+        self.bundle = startup_scripts.bundle_for(emp.get("department"))
+        self.resize = False
+        self.update_bundle = False
+        self.was_running = False
+        # should be RUNNING after the transfer (was running, or a restart is still owed)
+        self.restart = False
+        self.metadata = None
+        # (state, reason) to write to the employee row, or None if unchanged
+        self.power_state = None
+
+    @property
+    def vm(self):
+        return self.emp.get("workstation_zone") or GCP_ZONE, self.emp["workstation_instance"]
+
+
+def claim_transfers(conn):
+    """Claim the next batch of employees with a pending transfer (FOR UPDATE SKIP LOCKED)."""
+    return claims.claim_batch(conn, "transfer", records.TransferEmployee)
+
+
+def inspect_workstations(gce, changes):
+    """
+    Read the current VMs of the batch (one batch request) and work out the
+    delta: resize if the machine type differs, new startup script if the app
+    bundle differs. Returns {employee_id: (stage, error)} for unreadable VMs.
+    """
+    failures = {}
+    with tracing.span("transfer.vm_get", **{"vm.count": len(changes)}):
+        responses = compute.execute_batch(gce, {
+            emp_id: gce.instances().get(project=GCP_PROJECT, zone=change.vm[0], instance=change.vm[1])
+            for emp_id, change in changes.items()
+        })
+    for emp_id, (instance, exc) in responses.items():
+        if exc is not None:
+            failures[emp_id] = ("vm_get", str(exc))
+            continue
+        change = changes[emp_id]
+        machine_type = (instance.get("machineType") or "").rsplit("/", 1)[-1]
+        change.resize = machine_type != change.profile.machine_type
+        change.update_bundle = change.emp.get("workstation_bundle") != change.bundle.key
+        change.was_running = instance.get("status") == "RUNNING"
+        change.restart = change.was_running or (
+            instance.get("status") == "TERMINATED"
+            and change.emp.get("workstation_power_reason") == POWER_RESTART_REASON
+        )
+        change.metadata = instance.get("metadata") or {}
+    return failures
+
+
+def _metadata_body(change, shared):
+    items = [item for item in change.metadata.get("items", [])
+             if item.get("key") != startup_scripts.STARTUP_SCRIPT_KEY]
+    items.append({
+        "key": startup_scripts.STARTUP_SCRIPT_KEY,
+        "value": startup_scripts.render_bundle_update(change.bundle, shared=shared),
+    })
+    return {"fingerprint": change.metadata.get("fingerprint"), "items": items}
+
+
+def update_workstations(changes, timers):
+    """
+    Apply the VM delta of a batch: startup scripts first, then stop ->
+    setMachineType -> start for the VMs that need another machine type.
+    Returns {employee_id: (stage, error)}.
+    """
+    gce = compute.get_compute_client()
+    with_vm = {emp_id: c for emp_id, c in changes.items() if c.emp.get("workstation_instance")}
+    if not with_vm:
+        return {}
+
+    failures = inspect_workstations(gce, with_vm)
+
+    def record(stage, results):
+        for emp_id, result in results.items():
+            timers[emp_id].record(stage, result.duration_ms, result.started_at, error=result.error)
+            if not result.ok:
+                failures[emp_id] = (stage, result.error)
+            elif stage == "vm_stop":
+                # stays like this if the start below fails: the next run retries it
+                with_vm[emp_id].power_state = (power.STOPPED, POWER_RESTART_REASON)
+            elif stage == "vm_start":
+                with_vm[emp_id].power_state = (power.RUNNING, POWER_REASON)
+
+    def run(stage, targets, make_request):
+        if not targets:
+            return
+        print(f"[VM] {stage}: {len(targets)} workstation VM(s)...")
+        with tracing.span(f"transfer.{stage}", **{"vm.count": len(targets)}):
+            results = compute.run_operations(
+                gce,
+                GCP_PROJECT,
+                {
+                    emp_id: (c.vm[0], lambda c=c: make_request(c))
+                    for emp_id, c in targets.items()
+                },
+                concurrency=TRANSFER_CONCURRENCY,
+            )
+        record(stage, results)
+
+    bundles = {c.bundle for emp_id, c in with_vm.items() if c.update_bundle and emp_id not in failures}
+    published = startup_scripts.publish(gce, GCP_PROJECT, bundles) if bundles else set()
+    run("vm_metadata", {
+        emp_id: c for emp_id, c in with_vm.items() if c.update_bundle and emp_id not in failures
+    }, lambda c: gce.instances().setMetadata(
+        project=GCP_PROJECT, zone=c.vm[0], instance=c.vm[1],
+        body=_metadata_body(c, shared=c.bundle.key in published),
+    ))
+
+    def resizing():
+        return {emp_id: c for emp_id, c in with_vm.items() if c.resize and emp_id not in failures}
+
+    run("vm_stop", {emp_id: c for emp_id, c in resizing().items() if c.was_running},
+        lambda c: gce.instances().stop(project=GCP_PROJECT, zone=c.vm[0], instance=c.vm[1]))
+    run("vm_resize", resizing(), lambda c: gce.instances().setMachineType(
+        project=GCP_PROJECT, zone=c.vm[0], instance=c.vm[1],
+        body={"machineType": f"zones/{c.vm[0]}/machineTypes/{c.profile.machine_type}"},
+    ))
+    # also start again if the resize failed: the VM was running before. A VM whose
+    # start failed in an earlier run (no resize needed any more) is started here too.
+    run("vm_start", {
+        emp_id: c for emp_id, c in with_vm.items()
+        if c.restart and (c.resize or not c.was_running)
+        and failures.get(emp_id, ("vm_resize",))[0] == "vm_resize"
+    }, lambda c: gce.instances().start(project=GCP_PROJECT, zone=c.vm[0], instance=c.vm[1]))
+    return failures
+
+
+def sync_groups(conn, employee_ids):
+    """Move the batch to the access groups of their new role."""
+    with tracing.span("identity.groups", **{"employees.count": len(employee_ids)}):
+        result = identity_sync.reconcile(conn, employee_ids, actor="automation:transfer", record_events=False)
+    print(
+        f"[IDENTITY] {result['added']} added, {result['removed']} removed in {result['calls']} call(s)."
+    )
+    return result
+
+
+def finish_transfer(cur, batch, change, started, failure=None):
+    """Record the outcome for one employee; events are collected in batch."""
+    emp = change.emp
+    duration_ms = (time.monotonic() - started) * 1000
+    has_vm = bool(emp.get("workstation_instance"))
+    if failure is not None:
+        stage, error = failure
+        print(f"[ERROR] Transfer of {emp['email']} failed at {stage}: {error}")
+        # a startup script that was already replaced does not have to be done again
+        if claims.defer_claim(cur, emp["id"]):
+            if has_vm and change.update_bundle and stage not in ("vm_get", "vm_metadata"):
+                cur.execute(UPDATE_BUNDLE_SQL, (change.bundle.key, emp["id"]))
+            if change.power_state is not None:
+                cur.execute(UPDATE_POWER_SQL, change.power_state + (emp["id"],))
+        batch.add(emp["id"], events.TRANSFER_FAILED, duration_ms=duration_ms,
+                  detail={"stage": stage, "error": error})
+        if TRANSFER_ATTEMPTS is not None:
+            TRANSFER_ATTEMPTS.labels(result="error").inc()
+        return
+
+    if not claims.release_claim(cur, emp["id"]):
+        # lease expired and another worker took over: leave the row to that worker
+        print(f"[WARN] Claim on {emp['email']} was taken over by another worker; skipping.")
+        if TRANSFER_ATTEMPTS is not None:
+            TRANSFER_ATTEMPTS.labels(result="claim_lost").inc()
+        return
+    cur.execute(MARK_TRANSFERRED_SQL, {
+        "id": emp["id"],
+        "department": emp.get("department"),
+        "role": emp.get("role"),
+        "profile": change.profile.name if has_vm else None,
+        "bundle": change.bundle.key if has_vm else None,
+    })
+    if change.power_state is not None:
+        cur.execute(UPDATE_POWER_SQL, change.power_state + (emp["id"],))
+    batch.add(emp["id"], events.TRANSFER_COMPLETED, duration_ms=duration_ms, detail={
+        "department": emp.get("department"),
+        "role": emp.get("role"),
+        "profile": change.profile.name if has_vm else None,
+        "resized": has_vm and change.resize,
+        "bundle": change.bundle.name if has_vm else None,
+        "bundle_updated": has_vm and change.update_bundle,
+    })
+    print(f"[OK] Transfer of {emp['email']} to {emp.get('department')} / {emp.get('role')} done.")
+    if TRANSFER_ATTEMPTS is not None:
+        TRANSFER_ATTEMPTS.labels(result="success").inc()
+
+
+def transfer_batch(conn, batch, employees, run_span):
+    """VM delta (parallel for the whole batch), access groups and DB update."""
+    started = time.monotonic()
+    timers = {emp["id"]: events.StageTimer(batch, emp["id"]) for emp in employees}
+    changes = {emp["id"]: Change(emp) for emp in employees}
+
+    failures = update_workstations(changes, timers)
+
+    try:
+        sync_groups(conn, [emp_id for emp_id in changes if emp_id not in failures])
+    except Exception as e:
+        print(f"[IDENTITY] Group sync for batch failed: {e}")
+        failures.update({emp_id: ("identity", str(e)) for emp_id in changes if emp_id not in failures})
+
+    with conn, conn.cursor() as cur:
+        for emp_id, change in changes.items():
+            parent = tracing.parse_traceparent(change.emp.get("traceparent")) or run_span.context
+            with tracing.start_span(
+                "transfer.employee",
+                parent=parent,
+                attributes={"employee.id": emp_id},
+                links=[run_span.context],
+            ):
+                finish_transfer(cur, batch, change, started, failures.get(emp_id))
+
+        # all events of this batch in one INSERT, same transaction as the updates
+        written = batch.flush(cur)
+    print(f"[EVENTS] Recorded {written} employee event(s).")
+
+
+def main():
+    print("=== Transfer run started ===")
+    run_span = tracing.start_process_span("transfer.run").activate()
+    batch = events.EventBatch(actor="automation:transfer")
+    processed = 0
+    try:
+        with db.connection() as conn:
+            while True:
+                employees = claim_transfers(conn)
+                if not employees:
+                    break
+
+                print(f"Claimed {len(employees)} employee(s) to transfer.")
+                transfer_batch(conn, batch, employees, run_span)
+                processed += len(employees)
+
+        run_span.set_attribute("employees.count", processed)
+        if not processed:
+            print("No pending transfers.")
+            return
+
+        print("\n=== Transfer run finished successfully ===")
+    finally:
+        run_span.end()
+        tracing.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Automation Worker (daemon)
+
+Draait los van de portal (eigen Deployment), zodat de portal stateless is en
+op N replicas kan draaien zonder dat er per request een onboarding.py /
+offboarding.py proces in de portal-pod start.
+
+- LISTEN op kanaal hr_automation; de portal doet NOTIFY in dezelfde transactie
+  als de insert/update, dus de worker wordt direct wakker na de commit.
+- Zonder notificatie wordt elke WORKER_POLL_SECONDS toch gekeken (gemiste
+  NOTIFY, verlopen claims).
+- Meerdere workers zijn veilig: onboarding/offboarding claimen rijen met
+  FOR UPDATE SKIP LOCKED + lease (hrcore/claims.py).
+- Lanes: offboarding gaat voor onboarding; een lange onboarding-run stopt na
+  de lopende batch zodra er urgente offboarding wacht en gaat daarna verder.
+  Binnen een queue: prioriteit, aging en round-robin per afdeling (hrcore/claims.py).
+- Transfers (transfer.py): department/rol-wijzigingen van ACTIVE employees,
+  in een eigen lane na onboarding.
+- Access groups (group_sync.py): op NOTIFY 'groups' en bij de sweep hooguit
+  elke GROUP_SYNC_INTERVAL_SECONDS een volledige reconciliation.
+- Effective dates (hrcore/schedule.py): de worker slaapt tot het eerstvolgende
+  onboard_after / leave_at (DueQueue) en draait dan alleen die queue, in
+  plaats van te wachten op de volgende sweep.
+- Heartbeat-bestand voor de k8s livenessProbe; optioneel Prometheus metrics.
+"""
+
+import functools
+import os
+import select
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+import group_sync
+import onboarding
+import offboarding
+import transfer
+from hrcore import claims, db, events, schedule, tracing  # onboarding zet de project-root op sys.path
+
+# Optional Prometheus metrics (safe fallback if library is missing)
+try:
+    from prometheus_client import Counter, Gauge, start_http_server
+except ImportError:  # pragma: no cover - optional dependency
+    Counter = Gauge = start_http_server = None
+
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "30"))
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+WORKER_HEARTBEAT_FILE = os.getenv("WORKER_HEARTBEAT_FILE", "/tmp/automation-worker-heartbeat")
+GROUP_SYNC_INTERVAL_SECONDS = float(os.getenv("GROUP_SYNC_INTERVAL_SECONDS", "900"))
+
+JOBS = {
+    "onboarding": functools.partial(onboarding.main, preemptible=True),
+    "offboarding": offboarding.main,
+    "transfer": transfer.main,
+    "groups": group_sync.main,
+}
+# elke job-module zet bij import zijn service name; in de worker per run opnieuw
+SERVICES = {
+    "onboarding": onboarding.SERVICE_NAME,
+    "offboarding": offboarding.SERVICE_NAME,
+    "transfer": transfer.SERVICE_NAME,
+    "groups": group_sync.SERVICE_NAME,
+}
+# volgorde = prioriteit
+LANES = ["offboarding", "onboarding", "transfer", "groups"]
+
+_last_group_sync = None
+
+if Counter is not None:
+    WORKER_RUNS = Counter(
+        "automation_worker_runs_total",
+        "Number of automation runs started by the worker",
+        ["job", "result"],
+    )
+    QUEUE_DEPTH = Gauge(
+        "automation_queue_depth",
+        "Employees waiting for onboarding / offboarding / transfer",
+        ["queue"],
+    )
+    LANE_DEPTH = Gauge(
+        "automation_lane_depth",
+        "Employees waiting per priority lane",
+        ["lane"],
+    )
+    LANE_OLDEST_WAIT = Gauge(
+        "automation_lane_oldest_wait_seconds",
+        "How long the oldest employee in a priority lane has been waiting",
+        ["lane"],
+    )
+else:
+    WORKER_RUNS = None
+    QUEUE_DEPTH = None
+    LANE_DEPTH = None
+    LANE_OLDEST_WAIT = None
+
+
+def heartbeat() -> None:
+    with open(WORKER_HEARTBEAT_FILE, "w") as f:
+        f.write(str(time.time()))
+
+
+def listen_connection():
+    """Autocommit-connectie die LISTEN doet op het automation-kanaal."""
+    conn = db.connect()
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {claims.NOTIFY_CHANNEL};")
+    return conn
+
+
+def wait_for_jobs(conn, due):
+    """
+    Wacht op NOTIFY's of het eerstvolgende geplande tijdstip. Geeft de set
+    queues terug die werk hebben; bij de poll-timeout alle queues (periodieke sweep).
+    """
+    ready, _, _ = select.select([conn], [], [], due.timeout(events.utcnow(), WORKER_POLL_SECONDS))
+    if not ready:
+        return due.pop_due(events.utcnow()) or sweep_jobs()
+
+    conn.poll()
+    jobs = set()
+    while conn.notifies:
+        payload = conn.notifies.pop(0).payload
+        if payload == schedule.NOTIFY_PAYLOAD:
+            continue  # alleen opnieuw plannen (volgende loop)
+        jobs.add(payload if payload in JOBS else "onboarding")
+    return jobs
+
+
+def sweep_jobs():
+    """Periodieke sweep: alle queues, de volledige group sync hooguit elke GROUP_SYNC_INTERVAL_SECONDS."""
+    jobs = set(JOBS)
+    if _last_group_sync is not None and time.monotonic() - _last_group_sync < GROUP_SYNC_INTERVAL_SECONDS:
+        jobs.discard("groups")
+    return jobs
+
+
+def update_queue_depth(conn) -> None:
+    if QUEUE_DEPTH is None:
+        return
+    for queue, depth in claims.queue_depth(conn).items():
+        QUEUE_DEPTH.labels(queue=queue).set(depth)
+    for lane, (depth, oldest_wait) in claims.lane_stats(conn).items():
+        LANE_DEPTH.labels(lane=lane).set(depth)
+        LANE_OLDEST_WAIT.labels(lane=lane).set(oldest_wait)
+
+
+def run_job(job: str) -> bool:
+    """Draai één job; True als hij halverwege voorrang gaf aan een urgentere lane."""
+    global _last_group_sync
+    if job == "groups":
+        _last_group_sync = time.monotonic()
+    preempted = False
+    tracing.set_service_name(SERVICES[job])
+    try:
+        preempted = bool(JOBS[job]())
+        result = "preempted" if preempted else "success"
+    except Exception as e:
+        # één mislukte run mag de daemon niet stoppen
+        print(f"[WORKER] {job} run failed: {e}")
+        result = "error"
+    if WORKER_RUNS is not None:
+        WORKER_RUNS.labels(job=job, result=result).inc()
+    return preempted
+
+
+def run_lanes(pending) -> None:
+    """Draai de jobs in lane-volgorde; een onderbroken job komt na de urgentere lane terug."""
+    pending = set(pending)
+    while pending:
+        job = next(lane for lane in LANES if lane in pending)
+        pending.discard(job)
+        heartbeat()
+        if run_job(job):
+            pending.update({"offboarding", job})
+
+
+def main():
+    print(f"=== Automation worker {claims.WORKER_ID} started ===")
+    if start_http_server is not None:
+        start_http_server(WORKER_METRICS_PORT)
+        print(f"[WORKER] Metrics on :{WORKER_METRICS_PORT}/metrics")
+
+    conn = None
+    due = schedule.DueQueue()
+    pending = set(JOBS)  # bij opstart alles één keer nalopen
+    while True:
+        try:
+            if conn is None or conn.closed:
+                conn = listen_connection()
+
+            heartbeat()
+            run_lanes(pending)
+            update_queue_depth(conn)
+            due.reset(schedule.next_due(conn))
+
+            pending = wait_for_jobs(conn, due)
+        except psycopg2.Error as e:
+            print(f"[WORKER] Database connection lost, retrying in 5s: {e}")
+            if conn is not None:
+                conn.close()
+            conn = None
+            time.sleep(5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+-- Headcount / pipeline summary for the HR dashboard (/dashboard).
+--
+-- employee_summary holds one row per (department, status, deprovisioned,
+-- device_enrolled) group and is kept up to date by a row-level trigger on
+-- employees, so the portal reads O(groups) rows instead of scanning the
+-- whole employees table.
+--
+-- employee_summary_mv is the same aggregate as a materialized view. It is
+-- only used when the portal runs with DASHBOARD_SOURCE=matview and is
+-- refreshed on demand from the dashboard (REFRESH ... CONCURRENTLY).
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/001_employee_summary.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS employee_summary (
+    department      TEXT    NOT NULL,
+    status          TEXT    NOT NULL,
+    deprovisioned   BOOLEAN NOT NULL,
+    device_enrolled BOOLEAN NOT NULL,
+    headcount       BIGINT  NOT NULL DEFAULT 0,
+    PRIMARY KEY (department, status, deprovisioned, device_enrolled)
+);
+
+CREATE OR REPLACE FUNCTION employee_summary_bump(
+    p_department      TEXT,
+    p_status          TEXT,
+    p_deprovisioned   BOOLEAN,
+    p_device_enrolled BOOLEAN,
+    p_delta           INTEGER
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO employee_summary AS s
+        (department, status, deprovisioned, device_enrolled, headcount)
+    VALUES (
+        COALESCE(p_department, '-'),
+        COALESCE(p_status, '-'),
+        COALESCE(p_deprovisioned, FALSE),
+        COALESCE(p_device_enrolled, FALSE),
+        p_delta
+    )
+    ON CONFLICT (department, status, deprovisioned, device_enrolled)
+    DO UPDATE SET headcount = s.headcount + EXCLUDED.headcount;
+
+    -- lege groepen opruimen zodat de tabel O(groups) blijft
+    DELETE FROM employee_summary
+    WHERE department = COALESCE(p_department, '-')
+      AND status = COALESCE(p_status, '-')
+      AND deprovisioned = COALESCE(p_deprovisioned, FALSE)
+      AND device_enrolled = COALESCE(p_device_enrolled, FALSE)
+      AND headcount <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION employee_summary_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.department IS NOT DISTINCT FROM OLD.department
+       AND NEW.status IS NOT DISTINCT FROM OLD.status
+       AND NEW.deprovisioned IS NOT DISTINCT FROM OLD.deprovisioned
+       AND NEW.device_enrolled IS NOT DISTINCT FROM OLD.device_enrolled THEN
+        -- bv. alleen last_action / updated_at gewijzigd: groep blijft gelijk
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM employee_summary_bump(
+            OLD.department, OLD.status, OLD.deprovisioned, OLD.device_enrolled, -1
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM employee_summary_bump(
+            NEW.department, NEW.status, NEW.deprovisioned, NEW.device_enrolled, 1
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS employees_summary_maintain ON employees;
+CREATE TRIGGER employees_summary_maintain
+    AFTER INSERT OR UPDATE OR DELETE ON employees
+    FOR EACH ROW EXECUTE FUNCTION employee_summary_trigger();
+
+-- Backfill vanuit de bestaande employees-tabel
+LOCK TABLE employees IN SHARE MODE;
+TRUNCATE employee_summary;
+INSERT INTO employee_summary (department, status, deprovisioned, device_enrolled, headcount)
+SELECT COALESCE(department, '-'),
+       COALESCE(status, '-'),
+       COALESCE(deprovisioned, FALSE),
+       COALESCE(device_enrolled, FALSE),
+       COUNT(*)
+FROM employees
+GROUP BY 1, 2, 3, 4;
+
+-- Optionele materialized view (DASHBOARD_SOURCE=matview)
+CREATE MATERIALIZED VIEW IF NOT EXISTS employee_summary_mv AS
+SELECT COALESCE(department, '-')        AS department,
+       COALESCE(status, '-')            AS status,
+       COALESCE(deprovisioned, FALSE)   AS deprovisioned,
+       COALESCE(device_enrolled, FALSE) AS device_enrolled,
+       COUNT(*)                         AS headcount
+FROM employees
+GROUP BY 1, 2, 3, 4;
+
+-- unieke index is nodig voor REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS employee_summary_mv_key
+    ON employee_summary_mv (department, status, deprovisioned, device_enrolled);
+
+COMMIT;
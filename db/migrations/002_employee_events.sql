@@ -0,0 +1,71 @@
+-- Append-only audit/event log for employees.
+--
+-- Vervangt de vrije-tekst kolom employees.last_action: elke write van de
+-- portal of de automation services voegt een getypeerd event toe (type,
+-- tijdstip, duur, actor, detail) in plaats van de vorige tekst te
+-- overschrijven. De tabel is per maand gepartitioneerd; partities worden
+-- aangemaakt via employee_events_ensure_partition() (zie hrcore/events.py).
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/002_employee_events.sql
+-- Deploy de bijbehorende portal/automation code vóór deze migratie: de
+-- laatste stap verwijdert employees.last_action.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS employee_events (
+    id          BIGSERIAL,
+    employee_id INTEGER     NOT NULL,
+    event_type  TEXT        NOT NULL,
+    occurred_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    duration_ms INTEGER,
+    actor       TEXT        NOT NULL,
+    detail      JSONB,
+    PRIMARY KEY (id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
+
+-- "laatste event per employee" voor de list- en detailpagina
+CREATE INDEX IF NOT EXISTS employee_events_employee_latest
+    ON employee_events (employee_id, occurred_at DESC);
+
+CREATE OR REPLACE FUNCTION employee_events_ensure_partition(p_at TIMESTAMPTZ)
+RETURNS void AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_at AT TIME ZONE 'UTC')::date;
+    month_end   DATE := (month_start + INTERVAL '1 month')::date;
+    part_name   TEXT := format('employee_events_%s', to_char(month_start, 'YYYY_MM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF employee_events
+             FOR VALUES FROM (%L) TO (%L)',
+        part_name,
+        month_start::timestamp AT TIME ZONE 'UTC',
+        month_end::timestamp AT TIME ZONE 'UTC'
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- huidige maand + twee maanden vooruit
+SELECT employee_events_ensure_partition(NOW());
+SELECT employee_events_ensure_partition(NOW() + INTERVAL '1 month');
+SELECT employee_events_ensure_partition(NOW() + INTERVAL '2 months');
+
+-- Backfill: de huidige last_action tekst wordt één 'legacy' event
+SELECT employee_events_ensure_partition(m)
+FROM (
+    SELECT DISTINCT date_trunc('month', COALESCE(updated_at, NOW())) AS m
+    FROM employees
+    WHERE last_action IS NOT NULL
+) months;
+
+INSERT INTO employee_events (employee_id, event_type, occurred_at, actor, detail)
+SELECT id,
+       'legacy',
+       COALESCE(updated_at, NOW()),
+       'migration',
+       jsonb_build_object('text', last_action)
+FROM employees
+WHERE last_action IS NOT NULL;
+
+ALTER TABLE employees DROP COLUMN IF EXISTS last_action;
+
+COMMIT;
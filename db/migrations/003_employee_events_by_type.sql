@@ -0,0 +1,7 @@
+-- Index voor de stage-latency rapportage: "laatste N onboarding_completed
+-- events" zonder de hele employee_events tabel te scannen.
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/003_employee_events_by_type.sql
+
+CREATE INDEX IF NOT EXISTS employee_events_type_latest
+    ON employee_events (event_type, occurred_at DESC);
@@ -0,0 +1,25 @@
+-- Lease-based claiming of automation work, so that several automation
+-- workers (and several portal replicas) never process the same employee.
+--
+-- Een worker claimt rijen met UPDATE ... FOR UPDATE SKIP LOCKED en zet
+-- claimed_by / claim_expires_at. Een verlopen claim (crash van een worker)
+-- wordt bij de volgende run weer opgepakt.
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/004_automation_claims.sql
+
+BEGIN;
+
+ALTER TABLE employees
+    ADD COLUMN IF NOT EXISTS claimed_by       TEXT,
+    ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMPTZ;
+
+-- kleine partial indexes: alleen rijen die nog werk hebben
+CREATE INDEX IF NOT EXISTS employees_onboarding_queue
+    ON employees (id)
+    WHERE status = 'NEW' AND cloud_account_created = FALSE;
+
+CREATE INDEX IF NOT EXISTS employees_offboarding_queue
+    ON employees (id)
+    WHERE status = 'INACTIVE' AND deprovisioned = FALSE;
+
+COMMIT;
@@ -0,0 +1,21 @@
+-- Store which Compute Engine VM belongs to an employee, so offboarding can
+-- delete it (and optionally snapshot its boot disk) instead of leaving it running.
+--
+-- onboarding.py vult workstation_instance / workstation_zone bij het aanmaken.
+-- Bestaande medewerkers met een VM krijgen de naam die onboarding altijd
+-- gebruikte (hr-ws-<id>); een lege zone betekent GCP_ZONE.
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/005_workstation_instances.sql
+
+BEGIN;
+
+ALTER TABLE employees
+    ADD COLUMN IF NOT EXISTS workstation_instance TEXT,
+    ADD COLUMN IF NOT EXISTS workstation_zone     TEXT;
+
+UPDATE employees
+SET workstation_instance = 'hr-ws-' || id
+WHERE cloud_account_created = TRUE
+  AND workstation_instance IS NULL;
+
+COMMIT;
@@ -0,0 +1,33 @@
+-- Power state of the workstation VMs, kept up to date by
+-- automation/power_scheduler.py and shown in the portal.
+--
+-- workstation_power_state         RUNNING | STOPPED | STARTING | STOPPING | MISSING
+-- workstation_power_changed_at    laatste keer dat de state veranderde
+-- workstation_power_reason        schedule | idle | on-demand | observed | provisioned
+-- workstation_power_override_until  on-demand start vanuit de portal: tot dit
+--                                   tijdstip stopt de scheduler de VM niet
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/006_workstation_power.sql
+
+BEGIN;
+
+ALTER TABLE employees
+    ADD COLUMN IF NOT EXISTS workstation_power_state          TEXT,
+    ADD COLUMN IF NOT EXISTS workstation_power_changed_at     TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS workstation_power_reason         TEXT,
+    ADD COLUMN IF NOT EXISTS workstation_power_override_until TIMESTAMPTZ;
+
+-- bestaande VM's zijn altijd aan geweest
+UPDATE employees
+SET workstation_power_state = 'RUNNING',
+    workstation_power_reason = 'provisioned'
+WHERE workstation_instance IS NOT NULL
+  AND deprovisioned = FALSE
+  AND workstation_power_state IS NULL;
+
+-- de scheduler leest alleen actieve werkplekken
+CREATE INDEX IF NOT EXISTS employees_workstations
+    ON employees (id)
+    WHERE status = 'ACTIVE' AND deprovisioned = FALSE AND workstation_instance IS NOT NULL;
+
+COMMIT;
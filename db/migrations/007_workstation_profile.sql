@@ -0,0 +1,17 @@
+-- Sizing profile (config/sizing_profiles.json) waarmee de workstation VM is
+-- aangemaakt, zodat de portal het gekozen profiel kan tonen.
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/007_workstation_profile.sql
+
+BEGIN;
+
+ALTER TABLE employees
+    ADD COLUMN IF NOT EXISTS workstation_profile TEXT;
+
+-- bestaande VM's zijn allemaal met de vaste e2-standard-2 / 50 GB gemaakt
+UPDATE employees
+SET workstation_profile = 'standard'
+WHERE workstation_instance IS NOT NULL
+  AND workstation_profile IS NULL;
+
+COMMIT;
@@ -0,0 +1,28 @@
+-- Effective dates for onboarding/offboarding (see hrcore/schedule.py).
+--
+-- start_date     eerste werkdag (door HR ingevuld)
+-- onboard_after  vroegste tijdstip waarop onboarding de VM mag maken: een
+--                off-peak venster vóór start_date; NULL = direct
+-- leave_at       vertrektijdstip; tot dan blijft de medewerker ACTIVE, daarna
+--                zet de automation worker hem in één batch op INACTIVE
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/008_effective_dates.sql
+
+BEGIN;
+
+ALTER TABLE employees
+    ADD COLUMN IF NOT EXISTS start_date    DATE,
+    ADD COLUMN IF NOT EXISTS onboard_after TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS leave_at      TIMESTAMPTZ;
+
+-- "wat is het volgende tijdstip" en "wat is nu aan de beurt" zijn
+-- index-range scans op alleen de geplande rijen
+CREATE INDEX IF NOT EXISTS employees_onboarding_due
+    ON employees (onboard_after)
+    WHERE status = 'NEW' AND cloud_account_created = FALSE AND onboard_after IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS employees_leave_due
+    ON employees (leave_at)
+    WHERE status <> 'INACTIVE' AND leave_at IS NOT NULL;
+
+COMMIT;
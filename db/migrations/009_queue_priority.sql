@@ -0,0 +1,23 @@
+-- Priority lanes in the automation work queue (see hrcore/claims.py).
+--
+-- queue_priority  0 = urgent (bv. security-offboarding), 1 = normaal
+-- queued_at       sinds wanneer de rij claimbaar is: bij een geplande onboarding
+--                 onboard_after, bij een geplande offboarding leave_at. Basis
+--                 voor de wachttijd-metrics en voor aging (starvation protection).
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/009_queue_priority.sql
+
+BEGIN;
+
+ALTER TABLE employees
+    ADD COLUMN IF NOT EXISTS queue_priority SMALLINT NOT NULL DEFAULT 1,
+    ADD COLUMN IF NOT EXISTS queued_at      TIMESTAMPTZ;
+
+-- rijen die nu al wachten
+UPDATE employees
+SET queued_at = COALESCE(onboard_after, leave_at, updated_at, NOW())
+WHERE queued_at IS NULL
+  AND ((status = 'NEW' AND cloud_account_created = FALSE)
+       OR (status = 'INACTIVE' AND deprovisioned = FALSE));
+
+COMMIT;
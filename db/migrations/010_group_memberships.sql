@@ -0,0 +1,28 @@
+-- Actual access-group membership per employee, as last applied to the identity
+-- backend (see hrcore/identity_sync.py).
+--
+-- De reconciliation berekent de gewenste groepen uit employees.role en doet
+-- alleen het verschil met deze tabel (batched add/remove). Geen foreign key:
+-- ook als een employee-rij verdwijnt moet de volgende run hem nog uit zijn
+-- groepen kunnen halen, daarom staat member_email erbij.
+-- Bestaande medewerkers staan er nog niet in; de eerste volledige run
+-- (automation/group_sync.py) voegt ze toe (adds zijn idempotent). Wordt een
+-- employee zonder rijen eerder geoffboard, dan haalt offboarding hem uit de
+-- groepen van zijn rol (identity_sync.reconcile(assume_role_groups=True)).
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/010_group_memberships.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS group_memberships (
+    employee_id  INTEGER     NOT NULL,
+    group_name   TEXT        NOT NULL,
+    member_email TEXT        NOT NULL,
+    synced_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (employee_id, group_name)
+);
+
+CREATE INDEX IF NOT EXISTS group_memberships_group
+    ON group_memberships (group_name);
+
+COMMIT;
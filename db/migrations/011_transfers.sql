@@ -0,0 +1,21 @@
+-- Role changes and department transfers of active employees (automation/transfer.py).
+--
+-- transfer_pending     de portal heeft department/role gewijzigd; de transfer-run
+--                      past alleen de delta toe (groepen, app bundle, machine type)
+-- workstation_bundle   app bundle (metadata key, zie hrcore/startup_scripts.py) die
+--                      op de VM staat; leeg bij bestaande VM's, de eerste transfer
+--                      zet hem dan opnieuw
+--
+-- Apply with:  psql "$DATABASE_URL" -f db/migrations/011_transfers.sql
+
+BEGIN;
+
+ALTER TABLE employees
+    ADD COLUMN IF NOT EXISTS transfer_pending   BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS workstation_bundle TEXT;
+
+CREATE INDEX IF NOT EXISTS employees_transfer_queue
+    ON employees (id)
+    WHERE status = 'ACTIVE' AND transfer_pending = TRUE;
+
+COMMIT;
@@ -0,0 +1,22 @@
+"""
+Gedeelde code voor de HR portal (app/) en de automation services (automation/).
+
+Submodules worden pas geladen bij het eerste gebruik (`hrcore.db`,
+`from hrcore import identity`): een entry point betaalt alleen voor de
+imports (psycopg2, googleapiclient, ...) van de modules die het echt gebruikt.
+"""
+
+import importlib
+
+
+def __getattr__(name):
+    if name.startswith("_"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        module = importlib.import_module(f"{__name__}.{name}")
+    except ModuleNotFoundError as e:
+        if e.name != f"{__name__}.{name}":
+            raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    globals()[name] = module
+    return module
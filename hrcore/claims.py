@@ -0,0 +1,261 @@
+"""
+Claimen van automation-werk met leases (zie db/migrations/004_automation_claims.sql).
+
+Meerdere onboarding/offboarding workers kunnen tegelijk draaien: elke worker
+claimt een kleine batch rijen met FOR UPDATE SKIP LOCKED en zet een lease
+(claimed_by / claim_expires_at). Na een crash verloopt de lease en pakt een
+andere worker de rij op.
+
+Binnen een queue bepaalt de volgorde van claimen:
+- queue_priority (0 = urgent); een rij die langer dan QUEUE_AGING_SECONDS wacht
+  telt als urgent, zodat niets blijft liggen (starvation protection);
+- daarna round-robin over afdelingen: de oudste van elke afdeling eerst, zodat
+  een import van 500 medewerkers van één afdeling een losse hire niet blokkeert;
+- daarna queued_at.
+Tussen de queues gaat urgente offboarding voor: onboarding stopt na de lopende
+batch als er een urgente offboarding wacht (urgent_waiting).
+"""
+
+import os
+import socket
+
+from hrcore import events
+
+# Optional Prometheus metrics (safe fallback if library is missing)
+try:
+    from prometheus_client import Histogram
+except ImportError:  # pragma: no cover - optional dependency
+    Histogram = None
+
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+# Lease moet langer zijn dan één VM-provisioning (minuten)
+CLAIM_LEASE_SECONDS = int(os.getenv("CLAIM_LEASE_SECONDS", "1800"))
+# Na een mislukte poging: zo lang wachten voor een nieuwe poging
+CLAIM_RETRY_SECONDS = int(os.getenv("CLAIM_RETRY_SECONDS", "300"))
+CLAIM_BATCH_SIZE = int(os.getenv("CLAIM_BATCH_SIZE", "10"))
+# Na zo lang wachten krijgt een normale rij dezelfde voorrang als een urgente
+QUEUE_AGING_SECONDS = int(os.getenv("QUEUE_AGING_SECONDS", "3600"))
+
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+
+if Histogram is not None:
+    QUEUE_WAIT = Histogram(
+        "automation_queue_wait_seconds",
+        "Time an employee waited in the automation queue before being claimed",
+        ["lane"],
+        buckets=(5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600),
+    )
+else:
+    QUEUE_WAIT = None
+
+# queue -> (WHERE-conditie, event type dat de traceparent van de aanvraag bevat)
+QUEUES = {
+    "onboarding": (
+        "e.status = 'NEW' AND e.cloud_account_created = FALSE"
+        " AND (e.onboard_after IS NULL OR e.onboard_after <= NOW())",
+        events.ONBOARDING_REQUESTED,
+    ),
+    "offboarding": (
+        "e.status = 'INACTIVE' AND e.deprovisioned = FALSE",
+        events.OFFBOARDING_REQUESTED,
+    ),
+    "transfer": (
+        "e.status = 'ACTIVE' AND e.transfer_pending = TRUE",
+        events.TRANSFER_REQUESTED,
+    ),
+}
+
+# window functions mogen niet samen met FOR UPDATE: eerst rangschikken, dan locken
+CLAIM_SQL = """
+    WITH waiting AS (
+        SELECT e.id,
+               CASE WHEN e.queued_at < NOW() - make_interval(secs => %(aging)s)
+                    THEN 0 ELSE e.queue_priority END AS priority,
+               row_number() OVER (
+                   PARTITION BY e.department ORDER BY e.queue_priority, e.queued_at, e.id
+               ) AS department_rank
+        FROM employees e
+        WHERE {where}
+          AND (e.claim_expires_at IS NULL OR e.claim_expires_at < NOW())
+    ),
+    candidates AS (
+        SELECT e.id, w.priority, w.department_rank
+        FROM employees e
+        JOIN waiting w ON w.id = e.id
+        WHERE {where}
+          AND (e.claim_expires_at IS NULL OR e.claim_expires_at < NOW())
+        ORDER BY w.priority, w.department_rank, e.queued_at, e.id
+        LIMIT %(limit)s
+        FOR UPDATE OF e SKIP LOCKED
+    ),
+    claimed AS (
+        UPDATE employees e
+        SET claimed_by = %(worker)s,
+            claim_expires_at = NOW() + make_interval(secs => %(lease)s)
+        FROM candidates c
+        WHERE e.id = c.id
+        RETURNING e.*
+    )
+    SELECT {columns}, req.detail->>'traceparent' AS traceparent,
+           e.queue_priority AS lane_priority,
+           EXTRACT(EPOCH FROM NOW() - e.queued_at) AS queue_wait_seconds
+    FROM claimed e
+    JOIN candidates c ON c.id = e.id
+    LEFT JOIN LATERAL (
+        SELECT ev.detail
+        FROM employee_events ev
+        WHERE ev.employee_id = e.id
+          AND ev.event_type = %(request_event)s
+        ORDER BY ev.occurred_at DESC
+        LIMIT 1
+    ) req ON TRUE
+    -- zelfde volgorde als de selectie: round-robin per afdeling binnen een prioriteit
+    ORDER BY c.priority, c.department_rank, e.queued_at, e.id;
+"""
+
+QUEUE_DEPTH_SQL = """
+    SELECT
+        COUNT(*) FILTER (WHERE status = 'NEW' AND cloud_account_created = FALSE
+                           AND (onboard_after IS NULL OR onboard_after <= NOW())) AS onboarding,
+        COUNT(*) FILTER (WHERE status = 'INACTIVE' AND deprovisioned = FALSE) AS offboarding,
+        COUNT(*) FILTER (WHERE status = 'ACTIVE' AND transfer_pending = TRUE) AS transfer
+    FROM employees
+    WHERE (status = 'NEW' AND cloud_account_created = FALSE)
+       OR (status = 'INACTIVE' AND deprovisioned = FALSE)
+       OR (status = 'ACTIVE' AND transfer_pending = TRUE);
+"""
+
+
+URGENT_WAITING_SQL = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM employees e
+        WHERE {where}
+          AND (e.claim_expires_at IS NULL OR e.claim_expires_at < NOW())
+          AND (e.queue_priority = 0 OR e.queued_at < NOW() - make_interval(secs => %s))
+    );
+"""
+
+
+def lane(queue: str, priority) -> str:
+    """Lane-naam voor metrics, bv. 'offboarding-urgent'."""
+    return f"{queue}-urgent" if priority == PRIORITY_URGENT else queue
+
+
+def claim_batch(conn, queue: str, record, limit: int = None):
+    """
+    Claim (en commit) de volgende batch rijen van een queue voor deze worker,
+    als `record`-rijen (hrcore/records.py; computed = records.CLAIM_FIELDS).
+    """
+    where, request_event = QUEUES[queue]
+    with conn.cursor() as cur:
+        cur.execute(
+            CLAIM_SQL.format(where=where, columns=record.projection()),
+            {
+                "limit": limit or CLAIM_BATCH_SIZE,
+                "worker": WORKER_ID,
+                "lease": CLAIM_LEASE_SECONDS,
+                "aging": QUEUE_AGING_SECONDS,
+                "request_event": request_event,
+            },
+        )
+        rows = record.from_rows(cur.fetchall())
+        # portal: live voortgang laat zien dat de automation bezig is
+        events.notify_progress(cur, [row.id for row in rows])
+    conn.commit()
+
+    if QUEUE_WAIT is not None:
+        for row in rows:
+            if row.queue_wait_seconds is not None:
+                QUEUE_WAIT.labels(lane=lane(queue, row.lane_priority)).observe(
+                    max(0.0, float(row.queue_wait_seconds))
+                )
+    return rows
+
+
+def urgent_waiting(conn, queue: str = "offboarding") -> bool:
+    """Wacht er urgent (of te lang wachtend) werk in deze queue?"""
+    where, _ = QUEUES[queue]
+    with conn.cursor() as cur:
+        cur.execute(URGENT_WAITING_SQL.format(where=where), (QUEUE_AGING_SECONDS,))
+        waiting = cur.fetchone()[0]
+    conn.commit()
+    return waiting
+
+
+def release_claim(cur, employee_id) -> bool:
+    """
+    Werk is klaar: claim vrijgeven (zelfde transactie als de status-update,
+    die pas daarna volgt). False als de lease verlopen is en een andere worker
+    de employee heeft overgenomen; de caller laat de status dan ongemoeid.
+    """
+    cur.execute(
+        """
+        UPDATE employees
+        SET claimed_by = NULL, claim_expires_at = NULL
+        WHERE id = %s AND claimed_by = %s;
+        """,
+        (employee_id, WORKER_ID),
+    )
+    return cur.rowcount == 1
+
+
+def defer_claim(cur, employee_id) -> bool:
+    """
+    Poging mislukt: claim houden tot CLAIM_RETRY_SECONDS, daarna mag een worker
+    het opnieuw proberen. False als de claim niet (meer) van deze worker is.
+    """
+    cur.execute(
+        """
+        UPDATE employees
+        SET claim_expires_at = NOW() + make_interval(secs => %s)
+        WHERE id = %s AND claimed_by = %s;
+        """,
+        (CLAIM_RETRY_SECONDS, employee_id, WORKER_ID),
+    )
+    return cur.rowcount == 1
+
+
+def queue_depth(conn) -> dict:
+    """Aantal rijen dat nog op onboarding / offboarding / transfer wacht."""
+    with conn.cursor() as cur:
+        cur.execute(QUEUE_DEPTH_SQL)
+        onboarding, offboarding, transfer = cur.fetchone()
+    return {"onboarding": onboarding, "offboarding": offboarding, "transfer": transfer}
+
+
+LANE_STATS_SQL = """
+    SELECT %(queue)s AS queue, e.queue_priority,
+           COUNT(*) AS depth,
+           EXTRACT(EPOCH FROM NOW() - MIN(e.queued_at)) AS oldest_wait_seconds
+    FROM employees e
+    WHERE {where}
+    GROUP BY e.queue_priority;
+"""
+
+
+def lane_stats(conn) -> dict:
+    """{lane: (aantal wachtend, wachttijd van de oudste in seconden)} voor de worker-metrics."""
+    stats = {
+        lane(queue, priority): (0, 0.0)
+        for queue in QUEUES
+        for priority in (PRIORITY_URGENT, PRIORITY_NORMAL)
+    }
+    with conn.cursor() as cur:
+        for queue, (where, _) in QUEUES.items():
+            cur.execute(LANE_STATS_SQL.format(where=where), {"queue": queue})
+            for _, priority, depth, oldest in cur.fetchall():
+                stats[lane(queue, priority)] = (depth, float(oldest or 0))
+    return stats
+
+
+# ---- Wake-up van de automation workers ----
+
+NOTIFY_CHANNEL = "hr_automation"
+
+
+def notify(cur, queue: str) -> None:
+    """NOTIFY de workers (wordt pas afgeleverd bij de commit van de transactie)."""
+    cur.execute("SELECT pg_notify(%s, %s);", (NOTIFY_CHANNEL, queue))
@@ -0,0 +1,176 @@
+"""
+Thread-safe pool van Google API clients (compute v1, monitoring v3).
+
+Een discovery client zit op één httplib2.Http, en die is niet thread-safe.
+Daarom krijgt elke thread een eigen client uit een pool:
+
+- Elke pooled client heeft een eigen AuthorizedHttp/httplib2.Http. httplib2
+  houdt de TLS-verbinding open (keep-alive), dus een client die terug in de
+  pool gaat, blijft warm voor de volgende thread. De pool geeft de laatst
+  teruggegeven client eerst uit (LIFO).
+- De credentials worden gedeeld. Als het token verloopt, ververst maar één
+  thread het; de andere threads wachten en gebruiken het nieuwe token.
+- get_client() geeft de client die aan de huidige thread hangt. Die wordt
+  bij het eerste gebruik uitgecheckt en gaat terug als de thread stopt.
+  checkout() leent een client voor een blok code (bv. in een thread pool).
+- Geeft een client een transportfout (socket/SSL), dan wordt hij niet
+  hergebruikt.
+"""
+
+import contextlib
+import os
+import threading
+import weakref
+
+GCE_CLIENT_POOL_SIZE = int(os.getenv("GCE_CLIENT_POOL_SIZE", "16"))
+GCE_CLIENT_POOL_TIMEOUT = float(os.getenv("GCE_CLIENT_POOL_TIMEOUT", "30"))
+GCE_HTTP_TIMEOUT = float(os.getenv("GCE_HTTP_TIMEOUT", "60"))
+
+
+class CoalescingCredentials:
+    """
+    Wrapper om google.auth credentials die door meerdere AuthorizedHttp's
+    (threads) gedeeld worden: tegelijk verlopen tokens geven één refresh.
+    """
+
+    def __init__(self, credentials):
+        self._credentials = credentials
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._credentials, name)
+
+    def refresh(self, request):
+        # na een 401: alleen verversen als een andere thread dat nog niet deed
+        token = self._credentials.token
+        with self._lock:
+            if self._credentials.token == token or not self._credentials.valid:
+                self._credentials.refresh(request)
+
+    def before_request(self, request, method, url, headers):
+        if not self._credentials.valid:
+            with self._lock:
+                if not self._credentials.valid:
+                    self._credentials.refresh(request)
+        self._credentials.apply(headers)
+
+
+class ClientPool:
+    """Max. `max_size` clients tegelijk in gebruik; gemaakt via factory()."""
+
+    def __init__(self, name, factory, max_size=GCE_CLIENT_POOL_SIZE, timeout=GCE_CLIENT_POOL_TIMEOUT):
+        self.name = name
+        self._factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.created = 0
+        self.in_use = 0
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError(
+                f"no free {self.name} client within {self.timeout}s "
+                f"(GCE_CLIENT_POOL_SIZE={self.max_size})"
+            )
+        try:
+            with self._lock:
+                client = self._idle.pop() if self._idle else None
+                self.in_use += 1
+            if client is None:
+                client = self._factory()
+                with self._lock:
+                    self.created += 1
+            return client
+        except Exception:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+            raise
+
+    def _release(self, client, broken=False):
+        with self._lock:
+            self.in_use -= 1
+            if not broken:
+                self._idle.append(client)
+        self._slots.release()
+
+    @contextlib.contextmanager
+    def checkout(self):
+        """Leen een client; heeft de thread er al één, dan die."""
+        current = getattr(self._local, "client", None)
+        if current is not None:
+            yield current
+            return
+
+        client = self._acquire()
+        self._local.client = client
+        broken = False
+        try:
+            yield client
+        except OSError:
+            # socket/SSL fout: transport niet terug in de pool
+            broken = True
+            raise
+        finally:
+            self._local.client = None
+            self._release(client, broken)
+
+    def get_client(self):
+        """Client van deze thread; gaat terug in de pool als de thread stopt."""
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._acquire()
+            self._local.client = client
+            # threading.local ruimt op bij het einde van de thread
+            lease = self._local.lease = _Lease()
+            weakref.finalize(lease, self._release, client)
+        return client
+
+    def status(self):
+        with self._lock:
+            return {"created": self.created, "in_use": self.in_use,
+                    "idle": len(self._idle), "max": self.max_size}
+
+
+class _Lease:
+    """Markeert een per-thread checkout; wordt opgeruimd met de thread."""
+
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+
+def shared_credentials():
+    """Application Default Credentials, één keer per proces geladen."""
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            import google.auth
+            credentials, _ = google.auth.default(
+                scopes=["https://www.googleapis.com/auth/cloud-platform"]
+            )
+            _credentials = CoalescingCredentials(credentials)
+        return _credentials
+
+
+def discovery_factory(service, version, request_builder):
+    """factory voor ClientPool: discovery client met een eigen keep-alive transport."""
+
+    def build():
+        import google_auth_httplib2
+        from googleapiclient import discovery
+        from googleapiclient.http import build_http
+
+        http = build_http()
+        http.timeout = GCE_HTTP_TIMEOUT
+        authorized = google_auth_httplib2.AuthorizedHttp(shared_credentials(), http=http)
+        return discovery.build(
+            service, version, http=authorized,
+            requestBuilder=request_builder, cache_discovery=False, static_discovery=True,
+        )
+
+    return build
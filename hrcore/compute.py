@@ -0,0 +1,332 @@
+"""
+Compute Engine helpers voor onboarding/offboarding.
+
+- get_compute_client(): discovery client van de huidige thread, uit een
+  thread-safe pool met keep-alive transports (hrcore/client_pool.py); elke
+  API-call wordt een trace span. Met COMPUTE_BACKEND=fake een in-memory client
+  met dezelfde interface (hrcore/fake_compute.py), om de automation zonder
+  GCP te draaien/testen.
+- run_operations(): veel zonal calls (bv. instances.delete) met begrensde
+  concurrency. Zowel de calls als het pollen van de operations gaan als
+  batch HTTP request (één round-trip per ronde i.p.v. één per VM).
+- Alle calls (single en in batches) gaan door de gedeelde rate limiter
+  (hrcore/ratelimit.py): token bucket per methode, retry bij 429/403.
+"""
+
+import contextlib
+import datetime
+import os
+import threading
+import time
+
+from hrcore import client_pool, events, ratelimit, tracing
+
+COMPUTE_BACKEND = os.getenv("COMPUTE_BACKEND", "gce").strip().lower()
+GCE_OPERATION_POLL_SECONDS = float(os.getenv("GCE_OPERATION_POLL_SECONDS", "5"))
+
+# Compute Engine accepteert max. 1000 calls per batch request
+GCE_MAX_BATCH = 1000
+# zo vaak mag het pollen van één operation achter elkaar mislukken
+GCE_POLL_MAX_FAILURES = 5
+
+_fake_client = None
+_fake_monitoring = None
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _fake_compute():
+    global _fake_client
+    with _pools_lock:
+        if _fake_client is None:
+            from hrcore.fake_compute import FakeComputeClient, FakeRequest
+            _fake_client = FakeComputeClient.from_env(
+                request_class=ratelimit.rate_limited(FakeRequest)
+            )
+        return _fake_client
+
+
+def _pool(service, version):
+    """ClientPool per API; alleen voor COMPUTE_BACKEND=gce."""
+    with _pools_lock:
+        pool = _pools.get((service, version))
+        if pool is None:
+            # elke API-call (images/instances/zoneOperations) wordt een trace span
+            # en wacht op een token van de rate limiter
+            request_builder = ratelimit.rate_limited(tracing.traced_request_builder())
+            pool = _pools[(service, version)] = client_pool.ClientPool(
+                f"{service}/{version}",
+                client_pool.discovery_factory(service, version, request_builder),
+            )
+        return pool
+
+
+def get_compute_client():
+    """
+    Compute client van de huidige thread (eigen keep-alive transport, uit de
+    pool). Met COMPUTE_BACKEND=fake één gedeelde, thread-safe fake.
+    """
+    if COMPUTE_BACKEND == "fake":
+        return _fake_compute()
+    return _pool("compute", "v1").get_client()
+
+
+@contextlib.contextmanager
+def compute_client():
+    """`with compute.compute_client() as gce:` leent een client voor kortlevende threads."""
+    if COMPUTE_BACKEND == "fake":
+        yield _fake_compute()
+        return
+    with _pool("compute", "v1").checkout() as gce:
+        yield gce
+
+
+def get_monitoring_client():
+    """Cloud Monitoring v3 (CPU-utilization voor idle detectie), of de fake."""
+    global _fake_monitoring
+    if COMPUTE_BACKEND == "fake":
+        gce = _fake_compute()
+        with _pools_lock:
+            if _fake_monitoring is None:
+                from hrcore.fake_compute import FakeMonitoringClient
+                _fake_monitoring = FakeMonitoringClient(gce)
+            return _fake_monitoring
+    return _pool("monitoring", "v3").get_client()
+
+
+CPU_UTILIZATION_FILTER = (
+    'metric.type = "compute.googleapis.com/instance/cpu/utilization" '
+    'AND metric.labels.instance_name = starts_with("{prefix}")'
+)
+
+
+def fetch_cpu_utilization(project, minutes: int, prefix: str = "hr-ws-") -> dict:
+    """
+    Gemiddelde CPU-utilization (0..1) per instance over de laatste `minutes`,
+    voor alle instances met `prefix` in één (gepagineerde) query.
+    """
+    monitoring = get_monitoring_client()
+    end = events.utcnow()
+    start = end - datetime.timedelta(minutes=minutes)
+    utilization = {}
+    page_token = None
+    while True:
+        response = monitoring.projects().timeSeries().list(
+            name=f"projects/{project}",
+            filter=CPU_UTILIZATION_FILTER.format(prefix=prefix),
+            interval_startTime=start.isoformat(),
+            interval_endTime=end.isoformat(),
+            aggregation_alignmentPeriod=f"{minutes * 60}s",
+            aggregation_perSeriesAligner="ALIGN_MEAN",
+            pageToken=page_token,
+        ).execute()
+        for series in response.get("timeSeries", []):
+            name = series["metric"]["labels"]["instance_name"]
+            points = [p["value"].get("doubleValue", 0.0) for p in series.get("points", [])]
+            if points:
+                utilization[name] = sum(points) / len(points)
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return utilization
+
+
+def is_not_found(exc) -> bool:
+    """HttpError 404 (resource bestaat niet / is al weg)."""
+    return getattr(getattr(exc, "resp", None), "status", None) == 404
+
+
+def is_already_exists(exc) -> bool:
+    """HttpError 409 (resource met die naam bestaat al)."""
+    return getattr(getattr(exc, "resp", None), "status", None) == 409
+
+
+def wait_for_operation(compute, project, zone, operation):
+    """Wacht tot één GCE-operatie klaar is (zone=None: global operation)."""
+    print(f"[VM] Waiting for operation {operation} to finish...")
+    with tracing.span("gce.operation.wait", operation=operation, zone=zone or "global") as sp:
+        polls = 0
+        while True:
+            polls += 1
+            if zone is None:
+                request = compute.globalOperations().get(project=project, operation=operation)
+            else:
+                request = compute.zoneOperations().get(project=project, zone=zone, operation=operation)
+            result = request.execute()
+            if result["status"] == "DONE":
+                sp.set_attribute("polls", polls)
+                if "error" in result:
+                    raise RuntimeError(f"GCE operation error: {result['error']}")
+                return
+            time.sleep(GCE_OPERATION_POLL_SECONDS)
+
+
+def execute_batch(compute, requests: dict) -> dict:
+    """
+    Voer {key: HttpRequest} uit als één batch request.
+    Geeft {key: (response, exception)} terug.
+
+    Elke call in de batch telt mee voor de rate limit van zijn methode;
+    calls die toch een 429/403 rateLimitExceeded krijgen, worden na een
+    backoff in een nieuwe batch opnieuw gestuurd.
+    """
+    limiter = ratelimit.get_limiter()
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    pending = dict(requests)
+    attempt = 0
+    while pending:
+        limiter.acquire_many(getattr(req, "methodId", None) for req in pending.values())
+        batch = compute.new_batch_http_request(callback=callback)
+        for key, req in pending.items():
+            batch.add(req, request_id=str(key))
+        with tracing.span("gce.batch", **{"batch.size": len(pending)}):
+            batch.execute()
+
+        throttled = {
+            key: req for key, req in pending.items()
+            if ratelimit.is_rate_limited(results.get(str(key), (None, None))[1])
+        }
+        if not throttled or attempt >= limiter.retries:
+            break
+        delay = limiter.backoff_delay(attempt)
+        print(f"[GCE] {len(throttled)} batched call(s) rate limited, retrying in {delay:.1f}s")
+        for req in throttled.values():
+            limiter.retried(getattr(req, "methodId", None))
+        time.sleep(delay)
+        pending = throttled
+        attempt += 1
+
+    return {key: results.get(str(key), (None, RuntimeError("no response in batch")))
+            for key in requests}
+
+
+class OperationResult:
+    """Uitkomst van één call uit run_operations()."""
+
+    def __init__(self, started_at, started):
+        self.started_at = started_at
+        self._started = started
+        self.duration_ms = None
+        self.error = None
+        self.not_found = False
+        self.already_exists = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def finish(self, error=None, not_found=False, already_exists=False) -> None:
+        self.duration_ms = (time.monotonic() - self._started) * 1000
+        self.error = error
+        self.not_found = not_found
+        self.already_exists = already_exists
+
+
+def run_operations(compute, project, calls: dict, concurrency: int = 10,
+                   ignore_not_found: bool = False, ignore_already_exists: bool = False) -> dict:
+    """
+    Voer zonal calls uit met max. `concurrency` operations tegelijk.
+
+    calls: {key: (zone, make_request)}; make_request() geeft een HttpRequest
+    die een zone operation teruggeeft (instances.delete, disks.createSnapshot, ...).
+    Een operation telt pas als geslaagd als hij DONE is zonder error.
+    Met ignore_not_found telt een 404 als geslaagd (result.not_found = True),
+    met ignore_already_exists een 409 (result.already_exists = True).
+
+    Geeft {key: OperationResult} terug.
+    """
+    results = run_chains(
+        compute, project,
+        {key: [(None, zone, make)] for key, (zone, make) in calls.items()},
+        concurrency=concurrency,
+        ignore_not_found=ignore_not_found,
+        ignore_already_exists=ignore_already_exists,
+    )
+    return {key: steps[None] for key, steps in results.items()}
+
+
+def run_chains(compute, project, chains: dict, concurrency: int = 10,
+               ignore_not_found: bool = False, ignore_already_exists: bool = False) -> dict:
+    """
+    run_operations() voor een reeks calls per key, bv. snapshot en dan delete.
+
+    chains: {key: [(stage, zone, make_request), ...]}. De stappen van een key
+    lopen na elkaar; de volgende start zodra de vorige DONE is, niet pas als
+    alle keys die stap af hebben. Eén trage key houdt de rest dus niet op.
+    Een mislukte stap stopt de reeks van die key.
+
+    Geeft {key: {stage: OperationResult}} terug (alleen de gestarte stappen).
+    """
+    concurrency = max(1, min(concurrency, GCE_MAX_BATCH))
+    pending = [(key, 0) for key in chains]
+    in_flight = {}  # key -> (stap, zone, operation name, mislukte polls)
+    results = {key: {} for key in chains}
+
+    def finished(key, step):
+        # volgende stap van deze key achteraan in de rij
+        if results[key][chains[key][step][0]].ok and step + 1 < len(chains[key]):
+            pending.append((key, step + 1))
+
+    while pending or in_flight:
+        # nieuwe calls starten tot de concurrency-limiet
+        free = concurrency - len(in_flight)
+        if free > 0 and pending:
+            chunk, pending[:] = pending[:free], pending[free:]
+            started_at, started = events.utcnow(), time.monotonic()
+            responses = execute_batch(compute, {key: chains[key][step][2]() for key, step in chunk})
+            for key, step in chunk:
+                stage, zone, _ = chains[key][step]
+                result = results[key][stage] = OperationResult(started_at, started)
+                response, exc = responses[key]
+                if exc is not None:
+                    if ignore_not_found and is_not_found(exc):
+                        result.finish(not_found=True)
+                    elif ignore_already_exists and is_already_exists(exc):
+                        result.finish(already_exists=True)
+                    else:
+                        result.finish(error=str(exc))
+                elif response.get("status") == "DONE":
+                    result.finish(error=_operation_error(response))
+                else:
+                    in_flight[key] = (step, zone, response["name"], 0)
+                    continue
+                finished(key, step)
+
+        if not in_flight:
+            continue
+
+        # alle lopende operations in één batch pollen
+        time.sleep(GCE_OPERATION_POLL_SECONDS)
+        polls = execute_batch(compute, {
+            key: compute.zoneOperations().get(project=project, zone=zone, operation=name)
+            for key, (_, zone, name, _) in in_flight.items()
+        })
+        for key, (response, exc) in polls.items():
+            step, zone, name, failures = in_flight[key]
+            result = results[key][chains[key][step][0]]
+            if exc is not None:
+                # poll mislukt (bv. tijdelijke 5xx): volgende ronde opnieuw
+                if failures + 1 >= GCE_POLL_MAX_FAILURES:
+                    del in_flight[key]
+                    result.finish(error=f"polling {name} failed: {exc}")
+                else:
+                    in_flight[key] = (step, zone, name, failures + 1)
+                continue
+            if response.get("status") == "DONE":
+                del in_flight[key]
+                result.finish(error=_operation_error(response))
+                finished(key, step)
+
+    return results
+
+
+def _operation_error(operation):
+    error = operation.get("error")
+    if not error:
+        return None
+    return "; ".join(
+        f"{e.get('code', 'ERROR')}: {e.get('message', '')}" for e in error.get("errors", [])
+    ) or str(error)
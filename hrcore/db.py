@@ -0,0 +1,100 @@
+"""
+Gedeelde database-toegang voor de portal en de automation services.
+
+- DbConfig: één set env vars met dezelfde defaults voor alle entry points
+  (DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD).
+- connect(): een eigen connectie, bv. voor LISTEN of een lange daemon-loop.
+- connection(): een geleende connectie uit een procesbrede pool, pas bij het
+  eerste gebruik aangemaakt. De automation worker draait onboarding/offboarding
+  zo zonder nieuwe connectie (en TLS/auth handshake) per run.
+
+Alle connecties maken een db.query span per query (hrcore/tracing.py).
+"""
+
+import contextlib
+import dataclasses
+import os
+import threading
+
+import psycopg2
+
+from hrcore import tracing
+
+# Max. aantal connecties in de pool van één automation-proces
+AUTOMATION_DB_POOL_MAX = int(os.getenv("AUTOMATION_DB_POOL_MAX", "4"))
+
+
+# repr=False: de eigen __repr__ laat het wachtwoord weg
+@dataclasses.dataclass(frozen=True, slots=True, repr=False)
+class DbConfig:
+    host: str
+    port: str
+    dbname: str
+    user: str
+    password: str | None = None
+
+    @classmethod
+    def from_env(cls, environ=None) -> "DbConfig":
+        environ = os.environ if environ is None else environ
+        return cls(
+            host=environ.get("DB_HOST", "127.0.0.1"),
+            port=environ.get("DB_PORT", "5432"),
+            dbname=environ.get("DB_NAME", "hr_employees"),
+            user=environ.get("DB_USER", "hr_app_user"),
+            # geen default: zonder DB_PASSWORD valt libpq terug op PGPASSWORD / .pgpass
+            password=environ.get("DB_PASSWORD"),
+        )
+
+    def connect_kwargs(self) -> dict:
+        return dataclasses.asdict(self)
+
+    def __repr__(self):
+        return f"DbConfig({self.user}@{self.host}:{self.port}/{self.dbname})"
+
+
+CONFIG = DbConfig.from_env()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def connect(config=None, **kwargs):
+    """Nieuwe connectie (niet uit de pool); de caller sluit hem zelf."""
+    config = config or CONFIG
+    return psycopg2.connect(
+        **config.connect_kwargs(),
+        connection_factory=tracing.traced_connection_factory(),
+        **kwargs,
+    )
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from psycopg2 import pool as pg_pool
+                _pool = pg_pool.ThreadedConnectionPool(
+                    0,
+                    AUTOMATION_DB_POOL_MAX,
+                    **CONFIG.connect_kwargs(),
+                    connection_factory=tracing.traced_connection_factory(),
+                )
+    return _pool
+
+
+@contextlib.contextmanager
+def connection():
+    """Leen een connectie uit de procespool; een open transactie wordt teruggedraaid."""
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken)
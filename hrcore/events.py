@@ -0,0 +1,383 @@
+"""
+Append-only employee event log (tabel employee_events).
+
+Elke write van de portal, onboarding.py en offboarding.py legt een getypeerd
+event vast in plaats van employees.last_action te overschrijven. Events worden
+per service verzameld in een EventBatch en met één INSERT weggeschreven, in
+dezelfde transactie als de bijbehorende employees-update.
+
+Elke flush doet ook een NOTIFY op PROGRESS_CHANNEL met de employee-ids; de
+portal luistert daarop voor de live voortgang (app/progress.py).
+"""
+
+import contextlib
+import datetime
+import time
+
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+# ---- Event types ----
+
+ONBOARDING_REQUESTED = "onboarding_requested"
+ONBOARDING_COMPLETED = "onboarding_completed"
+ONBOARDING_FAILED = "onboarding_failed"
+OFFBOARDING_REQUESTED = "offboarding_requested"
+OFFBOARDING_SCHEDULED = "offboarding_scheduled"
+OFFBOARDING_COMPLETED = "offboarding_completed"
+OFFBOARDING_FAILED = "offboarding_failed"
+TRANSFER_REQUESTED = "transfer_requested"
+TRANSFER_COMPLETED = "transfer_completed"
+TRANSFER_FAILED = "transfer_failed"
+GROUPS_CHANGED = "groups_changed"
+STAGE_COMPLETED = "stage_completed"
+STAGE_FAILED = "stage_failed"
+LEGACY = "legacy"  # backfill van de oude last_action tekst
+
+EVENT_LABELS = {
+    ONBOARDING_REQUESTED: "Onboarding requested",
+    ONBOARDING_COMPLETED: "Onboarding completed",
+    ONBOARDING_FAILED: "Onboarding failed",
+    OFFBOARDING_REQUESTED: "Marked INACTIVE from portal",
+    OFFBOARDING_SCHEDULED: "Offboarding scheduled",
+    OFFBOARDING_COMPLETED: "Offboarding completed",
+    OFFBOARDING_FAILED: "Offboarding failed",
+    TRANSFER_REQUESTED: "Transfer requested",
+    TRANSFER_COMPLETED: "Transfer completed",
+    TRANSFER_FAILED: "Transfer failed",
+    GROUPS_CHANGED: "Access groups updated",
+    STAGE_COMPLETED: "Stage completed",
+    STAGE_FAILED: "Stage failed",
+    LEGACY: "Last action",
+}
+
+EVENT_TYPES = frozenset(EVENT_LABELS)
+
+# Stage-timings zijn detail van een run, geen "laatste actie": ze staan op het
+# starttijdstip van de stap en zouden anders de afsluitende event overschaduwen.
+STAGE_EVENT_TYPES = frozenset({STAGE_COMPLETED, STAGE_FAILED})
+
+# SQL-fragment voor "laatste event per employee" (gebruikt de index
+# employee_events_employee_latest). Verwacht de employees-tabel als alias e.
+LATEST_EVENT_JOIN = f"""
+    LEFT JOIN LATERAL (
+        SELECT ev.event_type, ev.occurred_at, ev.actor, ev.detail
+        FROM employee_events ev
+        WHERE ev.employee_id = e.id
+          AND ev.event_type NOT IN ('{STAGE_COMPLETED}', '{STAGE_FAILED}')
+        ORDER BY ev.occurred_at DESC
+        LIMIT 1
+    ) le ON TRUE
+"""
+
+INSERT_EVENTS_SQL = """
+    INSERT INTO employee_events
+        (employee_id, event_type, occurred_at, duration_ms, actor, detail)
+    VALUES %s;
+"""
+
+# zelfde insert per rij, voor drivers zonder execute_values (psycopg 3 executemany)
+INSERT_EVENT_ROW_SQL = INSERT_EVENTS_SQL.replace("VALUES %s", "VALUES (%s, %s, %s, %s, %s, %s)")
+
+ENSURE_PARTITION_SQL = "SELECT employee_events_ensure_partition(%s);"
+
+# maanden waarvoor deze process al een partitie heeft gegarandeerd. De
+# CREATE zit in de transactie van de caller; wordt die teruggedraaid, dan
+# staat de maand hier onterecht. De insert vangt dat op (zie EventBatch.flush).
+_ensured_months = set()
+
+# insert met een vangnet: bij een ontbrekende partitie terug naar vóór de insert
+_SAVEPOINT_SQL = "SAVEPOINT employee_events_insert;"
+_ROLLBACK_TO_SAVEPOINT_SQL = "ROLLBACK TO SAVEPOINT employee_events_insert;"
+# "no partition of relation ... found for row"
+_CHECK_VIOLATION = "23514"
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def describe_event(event_type, occurred_at, detail=None) -> str:
+    """Leesbare tekst voor een event, in de stijl van de oude last_action kolom."""
+    if not event_type:
+        return "-"
+
+    if event_type == LEGACY and detail and detail.get("text"):
+        return detail["text"]
+
+    if event_type in (STAGE_COMPLETED, STAGE_FAILED) and detail and detail.get("stage"):
+        label = f"{EVENT_LABELS[event_type]} ({detail['stage']})"
+    else:
+        label = EVENT_LABELS.get(event_type, event_type.replace("_", " ").capitalize())
+
+    if occurred_at is None:
+        return label
+
+    when = occurred_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return f"{label} at {when.isoformat()}Z"
+
+
+def _months_to_ensure(timestamps):
+    """{maand: tijdstip} voor de maanden die nog niet in de cache staan."""
+    months = {}
+    for ts in timestamps:
+        month = (ts.year, ts.month)
+        if month not in _ensured_months:
+            months.setdefault(month, ts)
+    return months
+
+
+def ensure_partitions(cur, timestamps) -> None:
+    """Maak (indien nodig) de maandpartities aan voor de gegeven tijdstippen."""
+    for month, ts in _months_to_ensure(timestamps).items():
+        cur.execute(ENSURE_PARTITION_SQL, (ts,))
+        _ensured_months.add(month)
+
+
+def forget_partitions(timestamps) -> None:
+    """Maanden uit de cache halen, zodat de volgende ensure_partitions() ze opnieuw aanmaakt."""
+    for ts in timestamps:
+        _ensured_months.discard((ts.year, ts.month))
+
+
+def _is_missing_partition(exc) -> bool:
+    # psycopg2: pgcode, psycopg 3: sqlstate
+    code = getattr(exc, "pgcode", None) or getattr(exc, "sqlstate", None)
+    return code == _CHECK_VIOLATION and "partition" in str(exc)
+
+
+# ---- Live voortgang (portal SSE) ----
+
+PROGRESS_CHANNEL = "hr_employee_events"
+# NOTIFY payload max. 8000 bytes: ids in stukken
+_PROGRESS_PAYLOAD_MAX = 7000
+
+
+def progress_payloads(employee_ids):
+    """Komma-gescheiden id-lijsten die elk binnen één NOTIFY payload passen."""
+    payloads, current = [], ""
+    for employee_id in sorted(set(employee_ids)):
+        part = str(employee_id)
+        if current and len(current) + len(part) + 1 > _PROGRESS_PAYLOAD_MAX:
+            payloads.append(current)
+            current = ""
+        current = f"{current},{part}" if current else part
+    if current:
+        payloads.append(current)
+    return payloads
+
+
+def notify_progress(cur, employee_ids) -> None:
+    """NOTIFY de portal dat er voor deze employees iets veranderde (afgeleverd bij de commit)."""
+    for payload in progress_payloads(employee_ids):
+        cur.execute("SELECT pg_notify(%s, %s);", (PROGRESS_CHANNEL, payload))
+
+
+class EventBatch:
+    """Verzamelt employee_events en schrijft ze in één INSERT weg."""
+
+    def __init__(self, actor: str):
+        self.actor = actor
+        self._rows = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, employee_id, event_type, duration_ms=None, detail=None, occurred_at=None):
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown employee event type: {event_type}")
+
+        self._rows.append(
+            (
+                employee_id,
+                event_type,
+                occurred_at or utcnow(),
+                int(duration_ms) if duration_ms is not None else None,
+                self.actor,
+                detail,
+            )
+        )
+
+    def discard(self, employee_id, event_types) -> int:
+        """Haal nog niet weggeschreven events van deze types voor één employee weg (na een rollback)."""
+        before = len(self._rows)
+        self._rows = [
+            row for row in self._rows if not (row[0] == employee_id and row[1] in event_types)
+        ]
+        return before - len(self._rows)
+
+    def flush(self, cur) -> int:
+        """Schrijf alle verzamelde events weg via de gegeven cursor (binnen een transactie, geen commit)."""
+        if not self._rows:
+            return 0
+
+        timestamps = {row[2] for row in self._rows}
+        values = [row[:5] + (Json(row[5]) if row[5] is not None else None,) for row in self._rows]
+        ensure_partitions(cur, timestamps)
+        cur.execute(_SAVEPOINT_SQL)
+        try:
+            execute_values(cur, INSERT_EVENTS_SQL, values)
+        except Exception as e:
+            if not _is_missing_partition(e):
+                raise
+            # maand gecachet uit een teruggedraaide transactie: opnieuw aanmaken
+            cur.execute(_ROLLBACK_TO_SAVEPOINT_SQL)
+            forget_partitions(timestamps)
+            ensure_partitions(cur, timestamps)
+            execute_values(cur, INSERT_EVENTS_SQL, values)
+        notify_progress(cur, {row[0] for row in self._rows})
+        written = len(self._rows)
+        self._rows = []
+        return written
+
+    async def flush_async(self, cur) -> int:
+        """Zelfde als flush(), voor een psycopg 3 AsyncCursor (hr_portal_async.py)."""
+        if not self._rows:
+            return 0
+
+        from psycopg.types.json import Jsonb
+
+        timestamps = {row[2] for row in self._rows}
+        values = [row[:5] + (Jsonb(row[5]) if row[5] is not None else None,) for row in self._rows]
+
+        async def ensure():
+            for month, ts in _months_to_ensure(timestamps).items():
+                await cur.execute(ENSURE_PARTITION_SQL, (ts,))
+                _ensured_months.add(month)
+
+        await ensure()
+        await cur.execute(_SAVEPOINT_SQL)
+        try:
+            await cur.executemany(INSERT_EVENT_ROW_SQL, values)
+        except Exception as e:
+            if not _is_missing_partition(e):
+                raise
+            await cur.execute(_ROLLBACK_TO_SAVEPOINT_SQL)
+            forget_partitions(timestamps)
+            await ensure()
+            await cur.executemany(INSERT_EVENT_ROW_SQL, values)
+        for payload in progress_payloads({row[0] for row in self._rows}):
+            await cur.execute("SELECT pg_notify(%s, %s);", (PROGRESS_CHANNEL, payload))
+        written = len(self._rows)
+        self._rows = []
+        return written
+
+
+class StageTimer:
+    """
+    Meet de duur van de onboarding/offboarding-stappen van één employee en legt
+    ze vast als stage_completed / stage_failed events in een EventBatch.
+
+        timer = StageTimer(batch, emp["id"])
+        with timer.stage("vm_insert"):
+            ...
+
+    Met batch=None wordt er alleen gemeten, niets vastgelegd.
+    """
+
+    def __init__(self, batch, employee_id):
+        self.batch = batch
+        self.employee_id = employee_id
+        self.durations_ms = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started_at = utcnow()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, (time.monotonic() - started) * 1000, started_at, error=str(e))
+            raise
+        self.record(name, (time.monotonic() - started) * 1000, started_at)
+
+    def record(self, name: str, duration_ms, started_at, error=None) -> None:
+        """Leg een elders gemeten stap vast (bv. één operatie uit een GCE batch)."""
+        self.durations_ms[name] = self.durations_ms.get(name, 0) + duration_ms
+        if self.batch is None:
+            return
+
+        detail = {"stage": name}
+        if error is not None:
+            detail["error"] = error
+        self.batch.add(
+            self.employee_id,
+            STAGE_FAILED if error is not None else STAGE_COMPLETED,
+            duration_ms=duration_ms,
+            detail=detail,
+            occurred_at=started_at,
+        )
+
+
+# ---- Timeline / stage-latency queries (portal) ----
+
+TIMELINE_SQL = """
+    SELECT event_type, occurred_at, duration_ms, actor, detail
+    FROM employee_events
+    WHERE employee_id = %s
+    ORDER BY occurred_at, id;
+"""
+
+# Alleen de stappen van de geslaagde run: na de vorige onboarding_failed (of
+# een eerdere onboarding_completed) en tot en met deze onboarding_completed.
+STAGE_REPORT_SQL = """
+    WITH recent AS (
+        SELECT employee_id, occurred_at, duration_ms
+        FROM employee_events
+        WHERE event_type = %(completed)s
+        ORDER BY occurred_at DESC
+        LIMIT %(last_n)s
+    ),
+    runs AS (
+        SELECT r.employee_id, r.occurred_at AS finished_at,
+               (SELECT MAX(p.occurred_at)
+                FROM employee_events p
+                WHERE p.employee_id = r.employee_id
+                  AND p.event_type IN (%(failed)s, %(completed)s)
+                  AND p.occurred_at < r.occurred_at) AS run_start
+        FROM recent r
+    ),
+    samples AS (
+        SELECT ev.detail->>'stage' AS stage, ev.duration_ms
+        FROM employee_events ev
+        JOIN runs r ON r.employee_id = ev.employee_id
+        WHERE ev.event_type = %(stage)s
+          AND ev.occurred_at <= r.finished_at
+          AND (r.run_start IS NULL OR ev.occurred_at > r.run_start)
+        UNION ALL
+        SELECT 'total', duration_ms FROM recent
+    )
+    SELECT stage,
+           COUNT(*) AS samples,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms) AS p50_ms,
+           percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) AS p95_ms
+    FROM samples
+    WHERE duration_ms IS NOT NULL
+    GROUP BY stage
+    ORDER BY (stage = 'total'), p95_ms DESC;
+"""
+
+
+def stage_report_params(last_n: int) -> dict:
+    return {
+        "completed": ONBOARDING_COMPLETED,
+        "failed": ONBOARDING_FAILED,
+        "stage": STAGE_COMPLETED,
+        "last_n": last_n,
+    }
+
+
+def fetch_timeline(conn, employee_id):
+    """Alle events van één employee, oudste eerst."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(TIMELINE_SQL, (employee_id,))
+        return cur.fetchall()
+
+
+def fetch_stage_report(conn, last_n: int = 50):
+    """
+    p50/p95 per onboarding-stap over de laatste N afgeronde onboardings,
+    plus een 'total' rij voor de volledige onboarding-duur.
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(STAGE_REPORT_SQL, stage_report_params(last_n))
+        return cur.fetchall()
@@ -0,0 +1,436 @@
+"""
+In-memory stand-in voor de Compute Engine API (COMPUTE_BACKEND=fake).
+
+Ondersteunt precies wat onboarding/offboarding gebruiken, met dezelfde
+interface als discovery.build("compute", "v1"):
+images().getFromFamily, instances().insert/get/delete/start/stop/reset/setMetadata/setMachineType,
+disks().createSnapshot, regions().get, projects().get/setCommonInstanceMetadata,
+zoneOperations().get, globalOperations().get en new_batch_http_request().
+
+Operations zijn pas na FAKE_COMPUTE_OP_POLLS polls DONE. De staat (VM's,
+snapshots) wordt bewaard in FAKE_COMPUTE_STATE, zodat een VM uit een
+onboarding-run bij een latere offboarding-run nog bestaat.
+FAKE_COMPUTE_FAIL (komma-gescheiden VM-namen) laat operations op die VM's
+falen, om foutpaden te testen. FAKE_COMPUTE_IDLE (VM-namen) geeft die VM's
+~0% CPU in FakeMonitoringClient (idle detectie).
+
+Quota/capaciteit (placement testen):
+    FAKE_COMPUTE_QUOTA     regionale limieten, bv. "CPUS=24,N2_CPUS=8,SSD_TOTAL_GB=1024"
+                           (gelden per regio; ontbrekende metrics zijn onbeperkt)
+    FAKE_COMPUTE_STOCKOUT  zones waar elke insert faalt met ZONE_RESOURCE_POOL_EXHAUSTED
+
+API rate limits (hrcore/ratelimit.py testen):
+    FAKE_COMPUTE_RATE_LIMIT  max. calls per seconde per methode; daarboven een 429
+                             rateLimitExceeded, zoals de echte API
+"""
+
+import collections
+import itertools
+import json
+import os
+import threading
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def _http_error(status, message, reason=None):
+    """Zelfde exception als de echte client geeft (HttpError met resp.status)."""
+    error = {"code": status, "message": message}
+    if reason:
+        error["errors"] = [{"reason": reason, "message": message}]
+    return HttpError(
+        httplib2.Response({"status": status}),
+        json.dumps({"error": error}).encode("utf-8"),
+    )
+
+
+class FakeRequest:
+    """Zoals googleapiclient.http.HttpRequest: methodId + execute()."""
+
+    def __init__(self, fn, methodId=None):
+        self._fn = fn
+        self.methodId = methodId
+
+    def execute(self, *args, **kwargs):
+        return self._fn()
+
+
+class _Resource:
+    def __init__(self, client, prefix, **methods):
+        self._client = client
+        self._prefix = prefix
+        self._methods = methods
+
+    def __getattr__(self, name):
+        try:
+            method = self._methods[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        method_id = f"{self._prefix}.{name}"
+        return lambda **kwargs: self._client.request_class(
+            lambda: self._client.call(method_id, method, kwargs), methodId=method_id,
+        )
+
+
+class _Batch:
+    def __init__(self, callback):
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request, callback or self._callback, request_id))
+
+    def execute(self):
+        for request, callback, request_id in self._requests:
+            try:
+                response, exc = request.execute(), None
+            except Exception as e:
+                response, exc = None, e
+            callback(request_id, response, exc)
+
+
+class _Profile:
+    """Minimale sizing-profile vorm voor placement.quota_needs()."""
+
+    def __init__(self, machine_type, disk_type, disk_size_gb):
+        self.machine_type = machine_type
+        self.disk_type = disk_type
+        self.disk_size_gb = disk_size_gb
+
+
+class FakeComputeClient:
+    def __init__(self, state_path=None, op_polls=2, fail_instances=(), quota=None, stockout_zones=(),
+                 rate_limit=None, request_class=FakeRequest):
+        self.state_path = state_path
+        self.request_class = request_class
+        self.rate_limit = rate_limit
+        self._calls = collections.defaultdict(collections.deque)  # methode -> tijdstippen
+        self.op_polls = op_polls
+        self.fail_instances = set(fail_instances)
+        self.quota = dict(quota or {})
+        self.stockout_zones = set(stockout_zones)
+        self.instances_by_key = {}  # "zone/name" -> instance
+        self.snapshots = {}
+        self.project_metadata = {"fingerprint": "fp-0", "items": []}
+        self.operations = {}
+        self._ids = itertools.count(1)
+        self._ip_ids = itertools.count(10)
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        def names(var):
+            return [n.strip() for n in os.getenv(var, "").split(",") if n.strip()]
+
+        quota = {}
+        for item in names("FAKE_COMPUTE_QUOTA"):
+            metric, _, limit = item.partition("=")
+            quota[metric.strip()] = float(limit)
+        return cls(
+            state_path=os.getenv("FAKE_COMPUTE_STATE", "/tmp/hr-fake-compute.json"),
+            op_polls=int(os.getenv("FAKE_COMPUTE_OP_POLLS", "2")),
+            fail_instances=names("FAKE_COMPUTE_FAIL"),
+            quota=quota,
+            stockout_zones=names("FAKE_COMPUTE_STOCKOUT"),
+            rate_limit=float(os.getenv("FAKE_COMPUTE_RATE_LIMIT", "0")) or None,
+            **kwargs,
+        )
+
+    def call(self, method_id, method, kwargs):
+        """Eén API-call; boven rate_limit calls/s per methode een 429."""
+        if self.rate_limit:
+            with self._lock:
+                now = time.monotonic()
+                calls = self._calls[method_id]
+                while calls and now - calls[0] >= 1.0:
+                    calls.popleft()
+                if len(calls) >= self.rate_limit:
+                    raise _http_error(429, f"Rate limit exceeded for {method_id}", "rateLimitExceeded")
+                calls.append(now)
+        return method(**kwargs)
+
+    # ---- staat ----
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        self.instances_by_key = state.get("instances", {})
+        self.snapshots = state.get("snapshots", {})
+        self.project_metadata = state.get("project_metadata", self.project_metadata)
+
+    def _save(self):
+        if not self.state_path:
+            return
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump({"instances": self.instances_by_key, "snapshots": self.snapshots,
+                       "project_metadata": self.project_metadata}, f)
+
+    def _operation(self, zone, kind, target, error_code=None):
+        name = f"operation-fake-{next(self._ids)}"
+        op = {"name": name, "zone": zone, "operationType": kind, "targetName": target,
+              "status": "RUNNING", "_polls_left": self.op_polls}
+        if target in self.fail_instances:
+            error_code = error_code or "FAKE_FAILURE"
+        if error_code:
+            op["_error"] = {"errors": [{"code": error_code,
+                                        "message": f"injected {error_code} for {target} in {zone}"}]}
+        self.operations[name] = op
+        return self._public(op)
+
+    @staticmethod
+    def _public(op):
+        return {k: v for k, v in op.items() if not k.startswith("_")}
+
+    # ---- API ----
+
+    # ---- quota ----
+
+    @staticmethod
+    def _region(zone):
+        return zone.rsplit("-", 1)[0]
+
+    @staticmethod
+    def _usage_of(inst):
+        from hrcore import placement  # zelfde quota-regels als de scheduler
+        profile = _Profile(inst.get("machine_type", "e2-standard-2"),
+                           inst.get("disk_type", "pd-standard"), inst.get("disk_gb", 50))
+        return placement.quota_needs(profile)
+
+    def _region_usage(self, region):
+        usage = {metric: 0 for metric in self.quota}
+        for inst in self.instances_by_key.values():
+            if self._region(inst["zone"]) != region:
+                continue
+            for metric, amount in self._usage_of(inst).items():
+                if metric in usage:
+                    usage[metric] += amount
+        return usage
+
+    def _get_region(self, project, region):
+        with self._lock:
+            usage = self._region_usage(region)
+        return {"name": region, "quotas": [
+            {"metric": metric, "limit": limit, "usage": usage[metric]}
+            for metric, limit in self.quota.items()
+        ]}
+
+    def regions(self):
+        return _Resource(self, "compute.regions", get=self._get_region)
+
+    def images(self):
+        return _Resource(self, "compute.images", getFromFamily=lambda project, family: {
+            "selfLink": f"projects/{project}/global/images/family/{family}",
+        })
+
+    def instances(self):
+        return _Resource(
+            self, "compute.instances",
+            insert=self._insert, get=self._get, delete=self._delete,
+            start=self._start, stop=self._stop, reset=self._reset,
+            setMetadata=self._set_metadata, setMachineType=self._set_machine_type,
+        )
+
+    def disks(self):
+        return _Resource(self, "compute.disks", createSnapshot=self._create_snapshot)
+
+    def projects(self):
+        return _Resource(
+            self, "compute.projects",
+            get=self._get_project, setCommonInstanceMetadata=self._set_project_metadata,
+        )
+
+    def globalOperations(self):
+        return _Resource(
+            self, "compute.globalOperations",
+            get=lambda project, operation: self._get_operation(project, None, operation),
+        )
+
+    def zoneOperations(self):
+        return _Resource(self, "compute.zoneOperations", get=self._get_operation)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(callback)
+
+    def _insert(self, project, zone, body):
+        with self._lock:
+            name = body["name"]
+            key = f"{zone}/{name}"
+            if key in self.instances_by_key:
+                raise _http_error(409, f"instance {name} already exists")
+            machine_type = body.get("machineType", "").rsplit("/", 1)[-1] or "e2-standard-2"
+            params = body.get("disks", [{}])[0].get("initializeParams", {})
+            inst = {
+                "name": name,
+                "zone": zone,
+                "status": "RUNNING",
+                "machineType": body.get("machineType"),
+                "machine_type": machine_type,
+                "disk_type": params.get("diskType", "pd-standard").rsplit("/", 1)[-1],
+                "disk_gb": params.get("diskSizeGb", 50),
+                "metadata": {"fingerprint": "md-0", "items": list(body.get("metadata", {}).get("items", []))},
+            }
+
+            error_code = None
+            if zone in self.stockout_zones:
+                error_code = "ZONE_RESOURCE_POOL_EXHAUSTED"
+            else:
+                usage = self._region_usage(self._region(zone))
+                for metric, amount in self._usage_of(inst).items():
+                    if metric in self.quota and usage[metric] + amount > self.quota[metric]:
+                        error_code = "QUOTA_EXCEEDED"
+
+            op = self._operation(zone, "insert", name, error_code)
+            if "_error" not in self.operations[op["name"]]:
+                self.instances_by_key[key] = {
+                    **inst,
+                    "networkInterfaces": [{"accessConfigs": [
+                        {"natIP": f"203.0.113.{next(self._ip_ids) % 250}"}
+                    ]}],
+                }
+                self._save()
+            return op
+
+    def _get(self, project, zone, instance):
+        with self._lock:
+            inst = self.instances_by_key.get(f"{zone}/{instance}")
+        if inst is None:
+            raise _http_error(404, f"instance {instance} not found")
+        return inst
+
+    def _delete(self, project, zone, instance):
+        with self._lock:
+            key = f"{zone}/{instance}"
+            if key not in self.instances_by_key:
+                raise _http_error(404, f"instance {instance} not found")
+            op = self._operation(zone, "delete", instance)
+            if instance not in self.fail_instances:
+                del self.instances_by_key[key]
+                self._save()
+            return op
+
+    def _set_status(self, zone, instance, kind, status):
+        with self._lock:
+            inst = self.instances_by_key.get(f"{zone}/{instance}")
+            if inst is None:
+                raise _http_error(404, f"instance {instance} not found")
+            op = self._operation(zone, kind, instance)
+            if instance not in self.fail_instances:
+                inst["status"] = status
+                self._save()
+            return op
+
+    def _start(self, project, zone, instance):
+        return self._set_status(zone, instance, "start", "RUNNING")
+
+    def _stop(self, project, zone, instance):
+        return self._set_status(zone, instance, "stop", "TERMINATED")
+
+    def _reset(self, project, zone, instance):
+        return self._set_status(zone, instance, "reset", "RUNNING")
+
+    def _set_metadata(self, project, zone, instance, body):
+        with self._lock:
+            inst = self.instances_by_key.get(f"{zone}/{instance}")
+            if inst is None:
+                raise _http_error(404, f"instance {instance} not found")
+            metadata = inst.setdefault("metadata", {"fingerprint": "md-0", "items": []})
+            if body.get("fingerprint") != metadata["fingerprint"]:
+                raise _http_error(412, "Supplied fingerprint does not match current metadata fingerprint.",
+                                  "conditionNotMet")
+            op = self._operation(zone, "setMetadata", instance)
+            if instance not in self.fail_instances:
+                version = int(metadata["fingerprint"].rsplit("-", 1)[-1]) + 1
+                inst["metadata"] = {"fingerprint": f"md-{version}", "items": list(body.get("items", []))}
+                self._save()
+            return op
+
+    def _set_machine_type(self, project, zone, instance, body):
+        with self._lock:
+            inst = self.instances_by_key.get(f"{zone}/{instance}")
+            if inst is None:
+                raise _http_error(404, f"instance {instance} not found")
+            if inst["status"] != "TERMINATED":
+                raise _http_error(400, f"Instance {instance} must be stopped to change its machine type.",
+                                  "resourceNotReady")
+            op = self._operation(zone, "setMachineType", instance)
+            if instance not in self.fail_instances:
+                inst["machineType"] = body["machineType"]
+                inst["machine_type"] = body["machineType"].rsplit("/", 1)[-1]
+                self._save()
+            return op
+
+    def _create_snapshot(self, project, zone, disk, body):
+        with self._lock:
+            if f"{zone}/{disk}" not in self.instances_by_key:
+                raise _http_error(404, f"disk {disk} not found")
+            op = self._operation(zone, "createSnapshot", disk)
+            if disk not in self.fail_instances:
+                self.snapshots[body["name"]] = {"sourceDisk": f"zones/{zone}/disks/{disk}"}
+                self._save()
+            return op
+
+    def _get_project(self, project):
+        with self._lock:
+            return {"name": project, "commonInstanceMetadata": json.loads(json.dumps(self.project_metadata))}
+
+    def _set_project_metadata(self, project, body):
+        with self._lock:
+            if body.get("fingerprint") != self.project_metadata["fingerprint"]:
+                raise _http_error(412, "Supplied fingerprint does not match current metadata fingerprint.",
+                                  "conditionNotMet")
+            version = int(self.project_metadata["fingerprint"].rsplit("-", 1)[-1]) + 1
+            self.project_metadata = {"fingerprint": f"fp-{version}", "items": list(body.get("items", []))}
+            self._save()
+            return self._operation(None, "setCommonInstanceMetadata", project)
+
+    def _get_operation(self, project, zone, operation):
+        with self._lock:
+            op = self.operations.get(operation)
+            if op is None:
+                raise _http_error(404, f"operation {operation} not found")
+            if op["_polls_left"] > 0:
+                op["_polls_left"] -= 1
+            else:
+                op["status"] = "DONE"
+                if "_error" in op:
+                    op["error"] = op["_error"]
+            return self._public(op)
+
+
+class FakeMonitoringClient:
+    """Cloud Monitoring timeSeries.list voor de VM's van een FakeComputeClient."""
+
+    request_class = FakeRequest
+
+    def __init__(self, compute):
+        self.compute = compute
+        self.idle_instances = {
+            n.strip() for n in os.getenv("FAKE_COMPUTE_IDLE", "").split(",") if n.strip()
+        }
+
+    def projects(self):
+        return self
+
+    def timeSeries(self):
+        return _Resource(self, "monitoring.projects.timeSeries", list=self._list)
+
+    @staticmethod
+    def call(method_id, method, kwargs):
+        return method(**kwargs)
+
+    def _list(self, **kwargs):
+        series = []
+        for inst in list(self.compute.instances_by_key.values()):
+            if inst["status"] != "RUNNING":
+                continue
+            cpu = 0.01 if inst["name"] in self.idle_instances else 0.4
+            series.append({
+                "metric": {"labels": {"instance_name": inst["name"]}},
+                "points": [{"value": {"doubleValue": cpu}}],
+            })
+        return {"timeSeries": series}
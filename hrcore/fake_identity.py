@@ -0,0 +1,69 @@
+"""
+In-memory identity backend (IDENTITY_BACKEND=fake), om de group-reconciliation
+(hrcore/identity_sync.py) zonder Cloud Identity te draaien/testen.
+
+Zelfde interface als de andere backends: add_members / remove_members per
+groep met een lijst e-mailadressen. De staat (groep -> leden) wordt bewaard
+in FAKE_IDENTITY_STATE, zodat een latere run verder gaat waar de vorige
+stopte. FAKE_IDENTITY_FAIL (komma-gescheiden groepen) laat elke call op die
+groepen falen, om foutpaden te testen. `calls` telt de API-calls per soort.
+"""
+
+import collections
+import json
+import os
+import threading
+
+
+class FakeIdentityError(Exception):
+    pass
+
+
+class FakeIdentityBackend:
+    name = "fake"
+
+    def __init__(self, state_path=None, fail_groups=()):
+        self.state_path = state_path
+        self.fail_groups = set(fail_groups)
+        self.members = collections.defaultdict(set)  # groep -> e-mailadressen
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_env(cls):
+        fail = [g.strip() for g in os.getenv("FAKE_IDENTITY_FAIL", "").split(",") if g.strip()]
+        return cls(
+            state_path=os.getenv("FAKE_IDENTITY_STATE", "/tmp/hr-fake-identity.json"),
+            fail_groups=fail,
+        )
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, encoding="utf-8") as f:
+            for group, emails in json.load(f).items():
+                self.members[group] = set(emails)
+
+    def _save(self):
+        if not self.state_path:
+            return
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump({group: sorted(emails) for group, emails in self.members.items()}, f)
+
+    def _apply(self, kind, group, emails):
+        with self._lock:
+            self.calls[kind] += 1
+            if group in self.fail_groups:
+                raise FakeIdentityError(f"{kind} on {group} failed (FAKE_IDENTITY_FAIL)")
+            if kind == "add":
+                self.members[group].update(emails)
+            else:
+                self.members[group].difference_update(emails)
+            self._save()
+
+    def add_members(self, group, emails):
+        self._apply("add", group, emails)
+
+    def remove_members(self, group, emails):
+        self._apply("remove", group, emails)
@@ -0,0 +1,42 @@
+"""
+Identity-helpers voor de portal en de automation services: access groups per
+role en de generators voor workspace-username en tijdelijk wachtwoord.
+"""
+
+import secrets
+import string
+
+BASE_GROUP = "corp-all-employees"
+
+# extra groepen per (genormaliseerde) role
+_EXTRA_GROUPS = {
+    "MANAGER": ("corp-managers",),
+    "HR_ADMIN": ("corp-hr-admins",),
+    "HR-ADMIN": ("corp-hr-admins",),
+    "HR ADMIN": ("corp-hr-admins",),
+}
+
+# role -> alle groepen, één keer opgebouwd; per employee alleen een dict lookup
+ROLE_GROUPS = {role: (BASE_GROUP,) + extra for role, extra in _EXTRA_GROUPS.items()}
+DEFAULT_GROUPS = (BASE_GROUP,)
+
+_PASSWORD_ALPHABET = string.ascii_letters + string.digits
+
+
+def groups_for_role(role) -> tuple:
+    """De logische access groups voor een business role."""
+    return ROLE_GROUPS.get((role or "Employee").strip().upper(), DEFAULT_GROUPS)
+
+
+def generate_username(emp) -> str:
+    """Maak een simpele username, bv. voornaam.achternaam of fallback."""
+    name = emp["name"].strip().lower()
+    safe = "".join(c for c in name.replace(" ", ".") if c.isalnum() or c == ".")
+    if not safe:
+        safe = f"user{emp['id']}"
+    return safe[:20]
+
+
+def generate_temp_password(length: int = 12) -> str:
+    """Tijdelijk wachtwoord uit een cryptografisch veilige bron."""
+    return "".join(secrets.choice(_PASSWORD_ALPHABET) for _ in range(length))
@@ -0,0 +1,219 @@
+"""
+Reconciliation van access-group membership (tabel group_memberships, zie
+db/migrations/010_group_memberships.sql).
+
+Eén query berekent de gewenste groepen van alle (of de opgegeven) employees
+uit employees.role en identity.ROLE_GROUPS, en diff't die tegen de laatst
+toegepaste membership. Alleen het verschil gaat naar de identity backend:
+gegroepeerd per (groep, add/remove) en in batches van IDENTITY_MAX_BATCH
+leden. Een org-brede rolwijziging kost zo O(diff) calls in plaats van
+O(employees x groepen).
+
+Gewenst lid is een ACTIVE employee met een cloud account; INACTIVE en
+verwijderde employees gaan uit al hun groepen. Een mislukte batch blijft in
+de diff staan en wordt bij de volgende run opnieuw geprobeerd.
+
+Backends (IDENTITY_BACKEND):
+    log   alleen loggen, zoals de simulatie in onboarding/offboarding (default)
+    fake  in-memory met staat op schijf (hrcore/fake_identity.py)
+"""
+
+import os
+import threading
+
+from psycopg2.extras import Json, execute_values
+
+from hrcore import events, identity
+
+IDENTITY_BACKEND = os.getenv("IDENTITY_BACKEND", "log").strip().lower()
+# Max. aantal leden per add/remove call (Admin SDK batch requests: max. 1000)
+IDENTITY_MAX_BATCH = int(os.getenv("IDENTITY_MAX_BATCH", "1000"))
+
+# pg_advisory_xact_lock key: één reconciliation tegelijk
+IDENTITY_SYNC_LOCK_KEY = 72_000_046
+
+ADD = "add"
+REMOVE = "remove"
+
+# groepen van de rol van employee e (identity.ROLE_GROUPS, als %(role_groups)s meegegeven)
+_ROLE_GROUPS_SQL = """
+        CROSS JOIN LATERAL jsonb_array_elements_text(
+            COALESCE(%(role_groups)s::jsonb -> upper(btrim(COALESCE(e.role, 'Employee'))),
+                     %(default_groups)s::jsonb)
+        ) AS g(group_name)
+"""
+
+# {employee_filter} / {membership_filter}: leeg (alle employees) of een filter op %(ids)s;
+# {assumed}: leeg of ASSUMED_MEMBERSHIP_SQL
+DIFF_SQL = """
+    WITH desired AS (
+        SELECT e.id AS employee_id, e.email, g.group_name
+        FROM employees e
+""" + _ROLE_GROUPS_SQL + """
+        WHERE e.status = 'ACTIVE'
+          AND e.cloud_account_created = TRUE
+          {employee_filter}
+    ),
+    actual AS (
+        SELECT m.employee_id, m.member_email AS email, m.group_name
+        FROM group_memberships m
+        WHERE TRUE {membership_filter}
+        {assumed}
+    )
+    SELECT 'add' AS op, d.employee_id, d.email, d.group_name
+    FROM desired d
+    LEFT JOIN actual a USING (employee_id, group_name)
+    WHERE a.employee_id IS NULL
+    UNION ALL
+    SELECT 'remove' AS op, a.employee_id, a.email, a.group_name
+    FROM actual a
+    LEFT JOIN desired d USING (employee_id, group_name)
+    WHERE d.employee_id IS NULL
+    ORDER BY group_name, op, employee_id;
+"""
+
+# Employees zonder enkele membership-rij (van vóór group_memberships, nog niet
+# door een volledige run gegaan) zitten vermoedelijk in de groepen van hun rol.
+ASSUMED_MEMBERSHIP_SQL = """
+        UNION ALL
+        SELECT e.id, e.email, g.group_name
+        FROM employees e
+""" + _ROLE_GROUPS_SQL + """
+        WHERE e.id = ANY(%(ids)s)
+          AND e.cloud_account_created = TRUE
+          AND NOT EXISTS (SELECT 1 FROM group_memberships m WHERE m.employee_id = e.id)
+"""
+
+INSERT_MEMBERSHIPS_SQL = """
+    INSERT INTO group_memberships (employee_id, group_name, member_email)
+    VALUES %s
+    ON CONFLICT (employee_id, group_name)
+    DO UPDATE SET member_email = EXCLUDED.member_email, synced_at = NOW();
+"""
+
+DELETE_MEMBERSHIPS_SQL = """
+    DELETE FROM group_memberships m
+    USING (VALUES %s) AS v (employee_id, group_name)
+    WHERE m.employee_id = v.employee_id AND m.group_name = v.group_name;
+"""
+
+
+class LogIdentityBackend:
+    """Simulatie: logt de calls die naar Cloud Identity / Admin SDK zouden gaan."""
+
+    name = "log"
+
+    def add_members(self, group, emails):
+        print(f"[IDENTITY] Adding {len(emails)} member(s) to group {group}: {', '.join(emails)}")
+
+    def remove_members(self, group, emails):
+        print(f"[IDENTITY] Removing {len(emails)} member(s) from group {group}: {', '.join(emails)}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Backend volgens IDENTITY_BACKEND (één per proces)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if IDENTITY_BACKEND == "fake":
+                from hrcore.fake_identity import FakeIdentityBackend
+                _backend = FakeIdentityBackend.from_env()
+            elif IDENTITY_BACKEND == "log":
+                _backend = LogIdentityBackend()
+            else:
+                raise ValueError(f"Unknown IDENTITY_BACKEND: {IDENTITY_BACKEND}")
+        return _backend
+
+
+def diff(cur, employee_ids=None, assume_role_groups=False):
+    """
+    [(op, employee_id, email, group)] tussen gewenste en toegepaste membership.
+    assume_role_groups: opgegeven employees zonder membership-rijen gelden als
+    lid van de groepen van hun rol (offboarding van nog nooit gesyncte employees).
+    """
+    employee_filter = membership_filter = assumed = ""
+    params = {
+        "role_groups": Json({role: list(groups) for role, groups in identity.ROLE_GROUPS.items()}),
+        "default_groups": Json(list(identity.DEFAULT_GROUPS)),
+    }
+    if employee_ids is not None:
+        employee_filter = "AND e.id = ANY(%(ids)s)"
+        membership_filter = "AND m.employee_id = ANY(%(ids)s)"
+        if assume_role_groups:
+            assumed = ASSUMED_MEMBERSHIP_SQL
+        params["ids"] = list(employee_ids)
+    cur.execute(
+        DIFF_SQL.format(employee_filter=employee_filter, membership_filter=membership_filter,
+                        assumed=assumed),
+        params,
+    )
+    return cur.fetchall()
+
+
+def plan_batches(changes, max_batch=None):
+    """Groepeer de diff per (groep, op) in batches: [(op, group, [(employee_id, email)])]."""
+    max_batch = max_batch or IDENTITY_MAX_BATCH
+    grouped = {}
+    for op, employee_id, email, group in changes:
+        grouped.setdefault((group, op), []).append((employee_id, email))
+    batches = []
+    for (group, op), members in grouped.items():
+        for i in range(0, len(members), max_batch):
+            batches.append((op, group, members[i:i + max_batch]))
+    return batches
+
+
+def reconcile(conn, employee_ids=None, actor="automation:identity", backend=None, record_events=True,
+              assume_role_groups=False):
+    """
+    Breng group membership van alle (of de opgegeven) employees in lijn met
+    hun rol. Commit; geeft {"added", "removed", "calls", "failed"} terug.
+    Met record_events een groups_changed event per gewijzigde employee
+    (onboarding/offboarding laten dat weg: daar volgt het uit hun eigen event).
+    assume_role_groups: zie diff().
+    """
+    backend = backend or get_backend()
+    result = {"added": 0, "removed": 0, "calls": 0, "failed": 0}
+    if employee_ids is not None and not employee_ids:
+        return result
+
+    batch = events.EventBatch(actor=actor)
+    applied = {ADD: [], REMOVE: []}
+    per_employee = {}
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (IDENTITY_SYNC_LOCK_KEY,))
+            for op, group, members in plan_batches(diff(cur, employee_ids, assume_role_groups)):
+                emails = [email for _, email in members]
+                result["calls"] += 1
+                try:
+                    if op == ADD:
+                        backend.add_members(group, emails)
+                    else:
+                        backend.remove_members(group, emails)
+                except Exception as e:
+                    # blijft in de diff; de volgende run probeert het opnieuw
+                    print(f"[IDENTITY] Failed to {op} {len(emails)} member(s) on {group}: {e}")
+                    result["failed"] += len(members)
+                    continue
+
+                result["added" if op == ADD else "removed"] += len(members)
+                for employee_id, email in members:
+                    applied[op].append((employee_id, group, email) if op == ADD else (employee_id, group))
+                    per_employee.setdefault(employee_id, {ADD: [], REMOVE: []})[op].append(group)
+
+            if applied[ADD]:
+                execute_values(cur, INSERT_MEMBERSHIPS_SQL, applied[ADD], page_size=1000)
+            if applied[REMOVE]:
+                execute_values(cur, DELETE_MEMBERSHIPS_SQL, applied[REMOVE], page_size=1000)
+
+            if record_events:
+                for employee_id, ops in per_employee.items():
+                    batch.add(employee_id, events.GROUPS_CHANGED,
+                              detail={"added": ops[ADD], "removed": ops[REMOVE]})
+                batch.flush(cur)
+    return result
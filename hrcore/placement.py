@@ -0,0 +1,278 @@
+"""
+Placement van workstation VM's over meerdere zones/regio's (config/placement.json).
+
+- Per regio: subnetwork + zones. Een VM krijgt altijd het subnet van de regio
+  van zijn zone, zodat zone en subnet nooit uit elkaar lopen.
+- Quota headroom per regio (CPUS / N2_CPUS / SSD_TOTAL_GB / ...) komt uit
+  regions.get (batched, elke PLACEMENT_QUOTA_REFRESH seconden) en wordt per
+  gekozen VM lokaal gereserveerd, zodat een grote batch niet over de quota gaat.
+- Per zone wordt het recente foutpercentage bijgehouden; na een stockout
+  (ZONE_RESOURCE_POOL_EXHAUSTED) slaat de scheduler de zone een tijd over.
+- provision(): inserts parallel (compute.run_operations, in golven van
+  `concurrency`); een insert die op capaciteit/quota faalt wordt in de
+  volgende zone opnieuw geprobeerd.
+"""
+
+import collections
+import functools
+import itertools
+import json
+import os
+import time
+
+from hrcore import compute
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLACEMENT_CONFIG_FILE = os.getenv(
+    "PLACEMENT_CONFIG_FILE", os.path.join(PROJECT_ROOT, "config", "placement.json")
+)
+PLACEMENT_QUOTA_REFRESH = float(os.getenv("PLACEMENT_QUOTA_REFRESH", "300"))
+PLACEMENT_STOCKOUT_COOLDOWN = float(os.getenv("PLACEMENT_STOCKOUT_COOLDOWN", "900"))
+# aantal recente inserts per zone voor het foutpercentage
+PLACEMENT_HISTORY = 20
+
+# foutcodes waarbij een andere zone/regio wel kan slagen
+STOCKOUT_ERRORS = ("ZONE_RESOURCE_POOL_EXHAUSTED", "RESOURCE_AVAILABILITY", "STOCKOUT")
+QUOTA_ERRORS = ("QUOTA_EXCEEDED", "quotaExceeded")
+
+# machine family -> regionale CPU-quota metric (de rest telt mee in CPUS)
+_CPU_QUOTA_METRIC = {
+    "n2": "N2_CPUS",
+    "n2d": "N2D_CPUS",
+    "c2": "C2_CPUS",
+    "c2d": "C2D_CPUS",
+    "c3": "C3_CPUS",
+    "m1": "M1_CPUS",
+}
+# disk type -> regionale disk-quota metric
+_DISK_QUOTA_METRIC = {
+    "pd-standard": "DISKS_TOTAL_GB",
+    "pd-balanced": "SSD_TOTAL_GB",
+    "pd-ssd": "SSD_TOTAL_GB",
+}
+
+
+def machine_vcpus(machine_type: str) -> int:
+    """'n2-standard-4' -> 4; shared-core types (e2-medium, ...) tellen als 2 vCPU."""
+    last = machine_type.rsplit("-", 1)[-1]
+    return int(last) if last.isdigit() else 2
+
+
+def quota_needs(profile) -> dict:
+    """Regionale quota die één VM met dit sizing profile nodig heeft."""
+    family = profile.machine_type.split("-", 1)[0]
+    return {
+        _CPU_QUOTA_METRIC.get(family, "CPUS"): machine_vcpus(profile.machine_type),
+        _DISK_QUOTA_METRIC.get(profile.disk_type, "DISKS_TOTAL_GB"): profile.disk_size_gb,
+    }
+
+
+def is_retryable_error(error) -> bool:
+    return bool(error) and any(code in error for code in STOCKOUT_ERRORS + QUOTA_ERRORS)
+
+
+class Zone:
+    def __init__(self, name, region, subnetwork):
+        self.name = name
+        self.region = region
+        self.subnetwork = subnetwork
+        self.in_flight = 0
+        self.unavailable_until = 0.0
+        self.history = collections.deque(maxlen=PLACEMENT_HISTORY)
+
+    @property
+    def failure_rate(self) -> float:
+        return self.history.count(False) / len(self.history) if self.history else 0.0
+
+    def subnetwork_url(self, project) -> str:
+        return f"projects/{project}/regions/{self.region}/subnetworks/{self.subnetwork}"
+
+
+@functools.lru_cache(maxsize=1)
+def load_config():
+    with open(PLACEMENT_CONFIG_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class PlacementScheduler:
+    """Kiest per VM een zone; één instantie per run/proces."""
+
+    def __init__(self, gce, project, config=None, check_quotas=True):
+        config = config or load_config()
+        self.gce = gce
+        self.project = project
+        self.network = config.get("network", "innovatech-vpc")
+        self.zones = [
+            Zone(zone, region, settings["subnetwork"])
+            for region, settings in config["regions"].items()
+            if settings.get("enabled", True)
+            for zone in settings["zones"]
+        ]
+        self.regions = sorted({zone.region for zone in self.zones})
+        # region -> {metric: resterende headroom}; ontbrekende metric = onbeperkt
+        self.headroom = {region: {} for region in self.regions}
+        self._quota_checked_at = None
+        # False: geen regions.get (plan mode); headroom blijft leeg = onbeperkt
+        self.check_quotas = check_quotas
+
+    def network_url(self) -> str:
+        return f"projects/{self.project}/global/networks/{self.network}"
+
+    # ---------- quota ----------
+
+    def refresh_quotas(self, force=False) -> None:
+        if not self.check_quotas:
+            return
+        if (not force and self._quota_checked_at is not None
+                and time.monotonic() - self._quota_checked_at < PLACEMENT_QUOTA_REFRESH):
+            return
+        responses = compute.execute_batch(self.gce, {
+            region: self.gce.regions().get(project=self.project, region=region)
+            for region in self.regions
+        })
+        for region, (response, exc) in responses.items():
+            if exc is not None:
+                # oude waarde houden; inserts falen dan hooguit op QUOTA_EXCEEDED
+                print(f"[PLACEMENT] Could not read quotas for {region}: {exc}")
+                continue
+            self.headroom[region] = {
+                q["metric"]: q["limit"] - q["usage"] for q in response.get("quotas", [])
+            }
+        self._quota_checked_at = time.monotonic()
+
+    def _fits(self, region, needs) -> bool:
+        headroom = self.headroom[region]
+        return all(headroom.get(metric, amount) >= amount for metric, amount in needs.items())
+
+    def _adjust(self, region, needs, sign) -> None:
+        headroom = self.headroom[region]
+        for metric, amount in needs.items():
+            if metric in headroom:
+                headroom[metric] -= sign * amount
+
+    # ---------- keuze + uitkomst ----------
+
+    def choose(self, profile, exclude=()):
+        """
+        Beste zone voor een VM met dit profiel (en reserveer quota), of None.
+        Voorkeur: weinig recente fouten, weinig lopende inserts (spreiding),
+        daarna de volgorde uit de config.
+        """
+        self.refresh_quotas()
+        needs = quota_needs(profile)
+        now = time.monotonic()
+        candidates = [
+            (zone.failure_rate, zone.in_flight, index, zone)
+            for index, zone in enumerate(self.zones)
+            if zone.name not in exclude
+            and zone.unavailable_until <= now
+            and self._fits(zone.region, needs)
+        ]
+        if not candidates:
+            return None
+        zone = min(candidates, key=lambda c: c[:3])[3]
+        zone.in_flight += 1
+        self._adjust(zone.region, needs, +1)
+        return zone
+
+    def record(self, zone, profile, error=None) -> None:
+        """Uitkomst van een insert in `zone` (error=None bij succes)."""
+        zone.in_flight -= 1
+        zone.history.append(error is None)
+        if error is None:
+            return
+
+        needs = quota_needs(profile)
+        self._adjust(zone.region, needs, -1)  # reservering teruggeven
+        if any(code in error for code in STOCKOUT_ERRORS):
+            zone.unavailable_until = time.monotonic() + PLACEMENT_STOCKOUT_COOLDOWN
+            print(f"[PLACEMENT] {zone.name} out of capacity, skipping it for {PLACEMENT_STOCKOUT_COOLDOWN:.0f}s")
+        elif any(code in error for code in QUOTA_ERRORS):
+            # quota is regionaal: tot de volgende refresh niets meer in deze regio
+            for metric in needs:
+                self.headroom[zone.region][metric] = 0
+            print(f"[PLACEMENT] Quota exhausted in {zone.region}")
+
+    def status(self):
+        return [
+            {"zone": z.name, "in_flight": z.in_flight, "failure_rate": round(z.failure_rate, 2),
+             "cooldown": z.unavailable_until > time.monotonic()}
+            for z in self.zones
+        ]
+
+
+class PlacementResult:
+    """Uitkomst van provision() voor één VM."""
+
+    def __init__(self):
+        self.zone = None
+        self.error = None
+        self.attempts = []  # (zone, error) per poging
+        # de VM bestond al in deze zone (409, bv. van een eerdere afgebroken run) en is overgenomen
+        self.adopted = False
+        self.started_at = None
+        self.duration_ms = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.zone is not None and self.error is None
+
+
+def provision(scheduler, requests: dict, concurrency: int = 10) -> dict:
+    """
+    requests: {key: (profile, build_body)}; build_body(zone) geeft de
+    instances.insert body voor die zone. Geeft {key: PlacementResult}.
+
+    Een 409 op de insert betekent dat deze VM (zelfde naam) in die zone al
+    bestaat, bv. na een run die na de insert afbrak: die wordt overgenomen
+    (result.adopted) in plaats van als permanente fout te tellen.
+    """
+    gce = scheduler.gce
+    results = {key: PlacementResult() for key in requests}
+    pending = {key: set() for key in requests}  # key -> geprobeerde zones
+
+    while pending:
+        # golven van `concurrency` inserts: de uitkomst (stockout, quota) van
+        # de ene golf stuurt de zonekeuze van de volgende
+        wave = dict(itertools.islice(pending.items(), concurrency))
+        chosen, calls = {}, {}
+        for key, tried in wave.items():
+            profile, build_body = requests[key]
+            zone = scheduler.choose(profile, exclude=tried)
+            if zone is None:
+                last = results[key].attempts[-1][1] if results[key].attempts else None
+                results[key].error = last or "no zone with free capacity/quota"
+                continue
+            chosen[key] = zone
+            calls[key] = (zone.name, lambda zone=zone, body=build_body(zone): gce.instances().insert(
+                project=scheduler.project, zone=zone.name, body=body,
+            ))
+        next_pending = {key: tried for key, tried in pending.items() if key not in wave}
+        if not calls:
+            pending = next_pending
+            continue
+
+        op_results = compute.run_operations(
+            gce, scheduler.project, calls, concurrency=concurrency, ignore_already_exists=True,
+        )
+
+        for key, op in op_results.items():
+            zone, result = chosen[key], results[key]
+            scheduler.record(zone, requests[key][0], op.error)
+            result.attempts.append((zone.name, op.error))
+            result.started_at = result.started_at or op.started_at
+            result.duration_ms += op.duration_ms
+            if op.ok:
+                result.zone = zone
+                result.adopted = op.already_exists
+                if op.already_exists:
+                    print(f"[PLACEMENT] {key}: VM already exists in {zone.name}, adopting it")
+            elif is_retryable_error(op.error):
+                print(f"[PLACEMENT] {key}: {zone.name} failed ({op.error}), trying another zone")
+                next_pending[key] = pending[key] | {zone.name}
+            else:
+                result.zone, result.error = zone, op.error
+        pending = next_pending
+
+    return results
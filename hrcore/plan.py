@@ -0,0 +1,127 @@
+"""
+Plan mode (dry-run) voor onboarding.py / offboarding.py (--plan).
+
+Eén set-based query levert alle rijen die een run nu zou claimen, met op elke
+rij de p50 per stap uit de stage-timings van de laatste PLAN_HISTORY_DAYS.
+Er wordt niets geclaimd, aangemaakt of verstuurd. De rijen komen via een
+server-side cursor binnen en het plan wordt als JSON Lines geschreven: één
+regel per employee met de acties, daarna één regel met de samenvatting
+(aantal, geschatte duur en kosten).
+"""
+
+import json
+import math
+import os
+import sys
+
+from hrcore import claims, events
+
+# Periode waarover de historische stage-timings worden genomen
+PLAN_HISTORY_DAYS = int(os.getenv("PLAN_HISTORY_DAYS", "30"))
+
+PLAN_SQL = """
+    WITH stage_timings AS (
+        SELECT jsonb_object_agg(stage, p50_ms) AS p50_ms
+        FROM (
+            SELECT ev.detail->>'stage' AS stage,
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY ev.duration_ms) AS p50_ms
+            FROM employee_events ev
+            WHERE ev.event_type = %(stage_event)s
+              AND ev.actor = %(actor)s
+              AND ev.occurred_at > NOW() - make_interval(days => %(history_days)s)
+              AND ev.duration_ms IS NOT NULL
+            GROUP BY 1
+        ) s
+    )
+    SELECT {columns}, t.p50_ms AS stage_p50_ms
+    FROM employees e
+    CROSS JOIN stage_timings t
+    WHERE {where}
+      AND (e.claim_expires_at IS NULL OR e.claim_expires_at < NOW())
+    ORDER BY e.queue_priority, e.queued_at, e.id;
+"""
+
+
+def plan_rows(conn, queue: str, actor: str, record):
+    """
+    Rijen die een run van `queue` nu zou claimen, zonder ze te claimen, als
+    `record`-rijen (hrcore/records.py; computed = records.PLAN_FIELDS).
+    """
+    where, _ = claims.QUEUES[queue]
+    with conn.cursor(name=f"{queue}_plan") as cur:
+        cur.itersize = 2000
+        cur.execute(
+            PLAN_SQL.format(where=where, columns=record.projection()),
+            {
+                "stage_event": events.STAGE_COMPLETED,
+                "actor": actor,
+                "history_days": PLAN_HISTORY_DAYS,
+            },
+        )
+        make = record._make
+        for row in cur:
+            yield make(row)
+    conn.rollback()
+
+
+class Estimate:
+    """
+    Geschatte duur en kosten van een run. Een run claimt batches van
+    CLAIM_BATCH_SIZE; per batch lopen de parallelle stappen in golven van
+    `concurrency`, de seriële stappen per employee na elkaar.
+    """
+
+    def __init__(self, parallel_stages, serial_stages, concurrency, batch_size=None):
+        self.parallel_stages = list(parallel_stages)
+        self.serial_stages = list(serial_stages)
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size or claims.CLAIM_BATCH_SIZE
+        self.employees = 0
+        self.hourly_cost = 0.0
+        self.stage_p50_ms = {}
+        self.counts = {}
+
+    def add(self, row, hourly_cost=None, **counts) -> None:
+        self.employees += 1
+        self.stage_p50_ms = row.stage_p50_ms or self.stage_p50_ms
+        if hourly_cost is not None:
+            self.hourly_cost += hourly_cost
+        for key, value in counts.items():
+            bucket = self.counts.setdefault(key, {})
+            bucket[value] = bucket.get(value, 0) + 1
+
+    def _stages_ms(self, stages) -> float:
+        return sum(self.stage_p50_ms.get(stage) or 0.0 for stage in stages)
+
+    def _batch_ms(self, size) -> float:
+        waves = math.ceil(size / self.concurrency)
+        return waves * self._stages_ms(self.parallel_stages) + size * self._stages_ms(self.serial_stages)
+
+    def duration_ms(self) -> float:
+        full, rest = divmod(self.employees, self.batch_size)
+        return full * self._batch_ms(self.batch_size) + (self._batch_ms(rest) if rest else 0.0)
+
+    def summary(self) -> dict:
+        stages = self.parallel_stages + self.serial_stages
+        return {
+            "employees": self.employees,
+            "batches": math.ceil(self.employees / self.batch_size),
+            "estimated_duration_s": round(self.duration_ms() / 1000, 1),
+            "stage_p50_ms": {stage: round(self.stage_p50_ms[stage], 1)
+                             for stage in stages if self.stage_p50_ms.get(stage) is not None},
+            "stages_without_history": [stage for stage in stages if self.stage_p50_ms.get(stage) is None],
+            "hourly_cost_delta": round(self.hourly_cost, 2),
+            "monthly_cost_delta": round(self.hourly_cost * 730, 2),
+            **self.counts,
+        }
+
+
+def write(rows, plan_employee, estimate, out=None) -> dict:
+    """Schrijf het plan als JSON Lines; plan_employee(row) -> dict met de acties."""
+    out = out or sys.stdout
+    for row in rows:
+        out.write(json.dumps(plan_employee(row, estimate), default=str) + "\n")
+    summary = estimate.summary()
+    out.write(json.dumps({"summary": summary}) + "\n")
+    out.flush()
+    return summary
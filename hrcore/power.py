@@ -0,0 +1,134 @@
+"""
+Power management van de workstation VM's (zie automation/power_scheduler.py).
+
+Per afdeling een werktijden-policy (config/power_policies.json):
+- buiten werktijd worden draaiende VM's gestopt;
+- bij het begin van de werkdag worden gestopte VM's één keer gestart;
+- binnen werktijd wordt een VM gestopt als hij langer dan idle_minutes
+  (bijna) geen CPU gebruikt; hij blijft dan uit tot een on-demand start;
+- een on-demand start vanuit de portal zet workstation_power_override_until;
+  tot dan laat de scheduler de VM aan.
+"""
+
+import datetime
+import functools
+import json
+import os
+from zoneinfo import ZoneInfo
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+POWER_POLICY_FILE = os.getenv(
+    "POWER_POLICY_FILE", os.path.join(PROJECT_ROOT, "config", "power_policies.json")
+)
+# Gemiddelde CPU-utilization (0..1) waaronder een VM als idle telt
+POWER_IDLE_CPU_THRESHOLD = float(os.getenv("POWER_IDLE_CPU_THRESHOLD", "0.05"))
+# Zo lang (uren) blijft een VM na een on-demand start buiten de policy aan
+POWER_ON_DEMAND_HOURS = int(os.getenv("POWER_ON_DEMAND_HOURS", "4"))
+
+# NOTIFY-kanaal voor on-demand starts (payload = employee id)
+NOTIFY_CHANNEL = "hr_workstation_power"
+
+RUNNING = "RUNNING"
+STOPPED = "STOPPED"
+STARTING = "STARTING"
+STOPPING = "STOPPING"
+MISSING = "MISSING"
+
+# GCE instance.status -> onze power state
+GCE_STATUS = {
+    "RUNNING": RUNNING,
+    "PROVISIONING": STARTING,
+    "STAGING": STARTING,
+    "STOPPING": STOPPING,
+    "SUSPENDING": STOPPING,
+    "TERMINATED": STOPPED,
+    "STOPPED": STOPPED,
+    "SUSPENDED": STOPPED,
+}
+
+START = "start"
+STOP = "stop"
+
+_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+class PowerPolicy:
+    def __init__(self, tz, days, start, stop, idle_minutes=None):
+        self.tz = tz
+        self.days = {_DAYS.index(d.lower()[:3]) for d in days}
+        self.start = datetime.time.fromisoformat(start)
+        self.stop = datetime.time.fromisoformat(stop)
+        self.idle_minutes = idle_minutes or None
+
+    def window_start(self, now):
+        """Begin van de werktijd waar `now` in valt, of None buiten werktijd."""
+        local = now.astimezone(self.tz)
+        if local.weekday() not in self.days:
+            return None
+        if not (self.start <= local.time() < self.stop):
+            return None
+        return datetime.datetime.combine(local.date(), self.start, tzinfo=self.tz)
+
+
+@functools.lru_cache(maxsize=1)
+def load_policies():
+    """(default policy, {department: policy}); één keer per proces geladen."""
+    with open(POWER_POLICY_FILE, encoding="utf-8") as f:
+        config = json.load(f)
+
+    tz = ZoneInfo(config.get("timezone", "UTC"))
+    default = PowerPolicy(tz, **config["default"])
+    departments = {
+        name: PowerPolicy(tz, **policy)
+        for name, policy in config.get("departments", {}).items()
+    }
+    return default, departments
+
+
+def policy_for(department):
+    default, departments = load_policies()
+    return departments.get(department or "", default)
+
+
+def _override_active(emp, now) -> bool:
+    until = emp.get("workstation_power_override_until")
+    return until is not None and until > now
+
+
+def needs_idle_check(emp, state, now) -> bool:
+    """Moet voor deze VM de CPU-utilization opgehaald worden?"""
+    policy = policy_for(emp.get("department"))
+    if state != RUNNING or not policy.idle_minutes or _override_active(emp, now):
+        return False
+    if policy.window_start(now) is None:
+        return False  # wordt sowieso gestopt
+    changed_at = emp.get("workstation_power_changed_at")
+    return changed_at is None or now - changed_at >= datetime.timedelta(minutes=policy.idle_minutes)
+
+
+def decide(emp, state, now, cpu=None):
+    """
+    (actie, reden) voor één VM, of None als er niets hoeft te gebeuren.
+    state is de actuele power state (uit GCE); cpu de gemiddelde utilization
+    over idle_minutes (alleen als needs_idle_check True was).
+    """
+    if _override_active(emp, now):
+        return (START, "on-demand") if state == STOPPED else None
+
+    policy = policy_for(emp.get("department"))
+    window_start = policy.window_start(now)
+
+    if window_start is None:
+        return (STOP, "schedule") if state == RUNNING else None
+
+    if state == STOPPED:
+        # alleen de eerste keer in dit werkblok; een idle-stop blijft uit
+        changed_at = emp.get("workstation_power_changed_at")
+        if changed_at is None or changed_at < window_start:
+            return START, "schedule"
+        return None
+
+    if state == RUNNING and cpu is not None and cpu < POWER_IDLE_CPU_THRESHOLD:
+        return STOP, "idle"
+    return None
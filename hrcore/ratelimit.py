@@ -0,0 +1,213 @@
+"""
+Client-side rate limiting voor GCE API-calls.
+
+Compute Engine heeft per project rate quota's per API-methode (bv. inserts
+vs. reads vs. operation polls). Bij overschrijding komt een 429 of een 403
+rateLimitExceeded. Met concurrente onboarding/offboarding gaan we daar snel
+overheen, dus:
+
+- per methode een token bucket (GCE_RATE_LIMITS; methodes die er niet in
+  staan delen de "default" bucket). Een call wacht tot er een token is.
+- rate-limit fouten worden met exponentiële backoff + jitter opnieuw
+  geprobeerd (max. GCE_RATE_LIMIT_RETRIES keer).
+- metrics: tijd die calls op een token wachten en het aantal retries.
+
+Single calls lopen via rate_limited(request_class) (requestBuilder van de
+discovery client); batch requests via compute.execute_batch(), dat per
+call in de batch een token neemt en alleen de rate-limited calls opnieuw stuurt.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+# Optional Prometheus metrics (safe fallback if library is missing)
+try:
+    from prometheus_client import Counter
+except ImportError:  # pragma: no cover - optional dependency
+    Counter = None
+
+# calls per seconde per methode, optioneel "/burst"; bv.
+# "default=20,compute.instances.insert=5/10,compute.zoneOperations.get=50"
+DEFAULT_RATE_LIMITS = (
+    "default=20,"
+    "compute.instances.insert=5/10,"
+    "compute.instances.delete=5/10,"
+    "compute.instances.start=10,"
+    "compute.instances.stop=10,"
+    "compute.disks.createSnapshot=5/10,"
+    "compute.zoneOperations.get=50/100"
+)
+GCE_RATE_LIMITS = os.getenv("GCE_RATE_LIMITS", DEFAULT_RATE_LIMITS)
+GCE_RATE_LIMIT_RETRIES = int(os.getenv("GCE_RATE_LIMIT_RETRIES", "5"))
+GCE_RATE_LIMIT_BACKOFF = float(os.getenv("GCE_RATE_LIMIT_BACKOFF", "1.0"))
+GCE_RATE_LIMIT_MAX_BACKOFF = 32.0
+
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "RATE_LIMIT_EXCEEDED")
+
+if Counter is not None:
+    THROTTLED_SECONDS = Counter(
+        "gce_api_throttled_seconds_total",
+        "Time GCE API calls waited for a rate-limit token",
+        ["method"],
+    )
+    RATE_LIMIT_RETRIES = Counter(
+        "gce_api_rate_limit_retries_total",
+        "GCE API calls retried after a 429/403 rate-limit error",
+        ["method"],
+    )
+else:
+    THROTTLED_SECONDS = RATE_LIMIT_RETRIES = None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() reserveert direct (het saldo mag
+    negatief worden) en slaapt daarna buiten de lock, zodat wachtende
+    threads in volgorde van aankomst aan de beurt komen.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float = 1) -> float:
+        """Neem n tokens; geeft het aantal seconden dat de caller moet wachten."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= n
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, n: float = 1) -> float:
+        wait = self.reserve(n)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def parse_limits(value: str) -> dict:
+    """'default=20,compute.instances.insert=5/10' -> {methode: (rate, burst)}"""
+    limits = {}
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        method, _, spec = item.partition("=")
+        rate, _, burst = spec.partition("/")
+        limits[method.strip()] = (float(rate), float(burst) if burst else None)
+    return limits
+
+
+class RateLimiter:
+    """Token buckets per API-methode + retry van rate-limit fouten."""
+
+    def __init__(self, limits: dict, retries: int = GCE_RATE_LIMIT_RETRIES,
+                 backoff: float = GCE_RATE_LIMIT_BACKOFF):
+        limits = dict(limits)
+        default = limits.pop("default", (20.0, None))
+        self._default = TokenBucket(*default)
+        self._buckets = {method: TokenBucket(*limit) for method, limit in limits.items()}
+        self.retries = retries
+        self.backoff = backoff
+
+    def _bucket(self, method):
+        return self._buckets.get(method, self._default)
+
+    def acquire(self, method, n: int = 1) -> float:
+        waited = self._bucket(method).acquire(n)
+        if waited and THROTTLED_SECONDS is not None:
+            THROTTLED_SECONDS.labels(method=method or "unknown").inc(waited)
+        return waited
+
+    def acquire_many(self, methods) -> float:
+        """Tokens voor een batch: [methode, ...]; wacht op de traagste bucket."""
+        counts = {}
+        for method in methods:
+            counts[method] = counts.get(method, 0) + 1
+        wait = max(
+            (self._bucket(method).reserve(n) for method, n in counts.items()), default=0.0
+        )
+        if wait > 0:
+            time.sleep(wait)
+            if THROTTLED_SECONDS is not None:
+                for method in counts:
+                    THROTTLED_SECONDS.labels(method=method or "unknown").inc(wait)
+        return wait
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponentiële backoff met full jitter (attempt begint bij 0)."""
+        return random.uniform(0, min(GCE_RATE_LIMIT_MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+    def retried(self, method) -> None:
+        if RATE_LIMIT_RETRIES is not None:
+            RATE_LIMIT_RETRIES.labels(method=method or "unknown").inc()
+
+    def call(self, method, fn):
+        """fn() met een token voor `method`; rate-limit fouten worden opnieuw geprobeerd."""
+        attempt = 0
+        while True:
+            self.acquire(method)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= self.retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"[GCE] {method} rate limited, retrying in {delay:.1f}s")
+                self.retried(method)
+                time.sleep(delay)
+                attempt += 1
+
+
+def is_rate_limited(exc) -> bool:
+    """HttpError 429, of 403 met reden rateLimitExceeded / userRateLimitExceeded."""
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    content = getattr(exc, "content", b"") or b""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", "replace")
+    try:
+        error = json.loads(content).get("error", {})
+    except (ValueError, AttributeError):
+        return any(reason in content for reason in RATE_LIMIT_REASONS)
+    reasons = [e.get("reason") for e in error.get("errors", [])] + [error.get("status")]
+    return any(reason in RATE_LIMIT_REASONS for reason in reasons)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    """Eén limiter per proces, gedeeld door alle threads en clients."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(parse_limits(GCE_RATE_LIMITS))
+        return _limiter
+
+
+def rate_limited(request_class):
+    """
+    Subclass van een HttpRequest-klasse (requestBuilder) waarvan execute()
+    eerst een token neemt en rate-limit fouten opnieuw probeert.
+    """
+
+    class RateLimitedRequest(request_class):
+        def execute(self, *args, **kwargs):
+            return get_limiter().call(
+                getattr(self, "methodId", None),
+                lambda: super(RateLimitedRequest, self).execute(*args, **kwargs),
+            )
+
+    return RateLimitedRequest
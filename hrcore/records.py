@@ -0,0 +1,106 @@
+"""
+Compacte, getypeerde employee-rijen voor de grote fetches.
+
+Een RealDictCursor bouwt per rij een dict met dezelfde key strings; bij
+/employees, de CSV-export en de automation-batches zijn dat er duizenden
+tegelijk. Een Record is een namedtuple (geen __dict__ per rij) die direct
+uit de tuple van de cursor wordt gemaakt, met per use case een vaste
+kolomprojectie: de query haalt alleen op wat de caller gebruikt.
+
+Records lezen als attribuut (emp.email) en, voor bestaande helpers die een
+dict verwachten, ook als mapping (emp["email"], emp.get("role")).
+"""
+
+import collections
+
+# Kolommen die CLAIM_SQL (hrcore/claims.py) na de projectie toevoegt
+CLAIM_FIELDS = ("traceparent", "lane_priority", "queue_wait_seconds")
+# Kolom die PLAN_SQL (hrcore/plan.py) na de projectie toevoegt
+PLAN_FIELDS = ("stage_p50_ms",)
+
+
+class _RecordMixin:
+    __slots__ = ()
+
+    # kolommen die de query zelf toevoegt (niet uit employees e)
+    computed = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return tuple.__getitem__(self, self._positions[key])
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        position = self._positions.get(key)
+        return default if position is None else tuple.__getitem__(self, position)
+
+    def keys(self):
+        return self._fields
+
+    @classmethod
+    def projection(cls, alias: str = "e") -> str:
+        """SELECT-lijst voor de employees-kolommen van dit record, in veldvolgorde."""
+        return ", ".join(f"{alias}.{name}" for name in cls._fields if name not in cls.computed)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Records uit plain tuple-rijen (fetchall/fetchmany of een named cursor)."""
+        make = cls._make
+        return [make(row) for row in rows]
+
+
+def record(name: str, columns, computed=()):
+    """Record-type met `columns` uit employees, gevolgd door de `computed` kolommen van de query."""
+    fields = tuple(columns) + tuple(computed)
+    base = collections.namedtuple(name, fields)
+    return type(name, (_RecordMixin, base), {
+        "__slots__": (),
+        "computed": tuple(computed),
+        "_positions": {field: i for i, field in enumerate(fields)},
+    })
+
+
+# /employees en /employees/export.csv (LIST_EMPLOYEES_SQL in app/hr_portal.py)
+EmployeeListRow = record(
+    "EmployeeListRow",
+    ("id", "name", "email", "department", "role", "status", "deprovisioned"),
+    computed=("last_event", "last_event_at", "last_event_detail"),
+)
+
+_ONBOARDING_COLUMNS = ("id", "name", "email", "department", "role", "queue_priority")
+_OFFBOARDING_COLUMNS = (
+    "id", "name", "email", "department", "role", "queue_priority",
+    "workstation_instance", "workstation_zone", "workstation_profile",
+)
+
+# geclaimde batches van automation/onboarding.py en automation/offboarding.py
+OnboardingEmployee = record("OnboardingEmployee", _ONBOARDING_COLUMNS, computed=CLAIM_FIELDS)
+OffboardingEmployee = record("OffboardingEmployee", _OFFBOARDING_COLUMNS, computed=CLAIM_FIELDS)
+
+# automation/transfer.py
+TransferEmployee = record(
+    "TransferEmployee",
+    (
+        "id", "name", "email", "department", "role", "queue_priority",
+        "workstation_instance", "workstation_zone", "workstation_profile",
+        "workstation_bundle", "workstation_power_state", "workstation_power_reason",
+    ),
+    computed=CLAIM_FIELDS,
+)
+
+# --plan (hrcore/plan.py)
+OnboardingPlanRow = record("OnboardingPlanRow", _ONBOARDING_COLUMNS, computed=PLAN_FIELDS)
+OffboardingPlanRow = record("OffboardingPlanRow", _OFFBOARDING_COLUMNS, computed=PLAN_FIELDS)
+
+# automation/power_scheduler.py (WORKSTATIONS_SQL)
+Workstation = record(
+    "Workstation",
+    (
+        "id", "email", "department", "workstation_instance", "workstation_zone",
+        "workstation_power_state", "workstation_power_changed_at",
+        "workstation_power_override_until",
+    ),
+)
@@ -0,0 +1,165 @@
+"""
+Effective-dated onboarding/offboarding (zie db/migrations/008_effective_dates.sql).
+
+- Een nieuwe medewerker met een start_date krijgt onboard_after: een willekeurig
+  moment in het off-peak venster (ONBOARDING_WINDOW, lokale tijd) ONBOARDING_LEAD_DAYS
+  vóór de startdatum. Tot dan claimt onboarding de rij niet. Is dat venster al
+  voorbij, dan het eerstvolgende venster vóór de startdatum, anders direct.
+- Een offboarding met een vertrekdatum zet leave_at (OFFBOARDING_LEAVE_TIME op
+  die dag). De medewerker blijft ACTIVE; vanaf leave_at zet offboarding.py alle
+  vertrekkers in één UPDATE op INACTIVE en verwerkt ze daarna in batches.
+- De worker houdt de eerstvolgende tijdstippen per queue in een DueQueue
+  (min-heap) en slaapt precies tot het eerste tijdstip of de poll-timeout.
+  Beide tijdstippen komen uit partial indexes, zonder de tabel te scannen.
+"""
+
+import datetime
+import heapq
+import os
+import random
+from zoneinfo import ZoneInfo
+
+from hrcore import events
+
+SCHEDULE_TIMEZONE = ZoneInfo(os.getenv("SCHEDULE_TIMEZONE", "Europe/Amsterdam"))
+# Off-peak venster voor het aanmaken van workstations, "HH:MM-HH:MM" (mag over middernacht)
+ONBOARDING_WINDOW = os.getenv("ONBOARDING_WINDOW", "01:00-05:00")
+# Zo veel dagen vóór de startdatum wordt de workstation gemaakt
+ONBOARDING_LEAD_DAYS = int(os.getenv("ONBOARDING_LEAD_DAYS", "1"))
+# Tijdstip op de vertrekdatum waarop offboarding start
+OFFBOARDING_LEAVE_TIME = datetime.time.fromisoformat(os.getenv("OFFBOARDING_LEAVE_TIME", "18:00"))
+
+# NOTIFY-payload op claims.NOTIFY_CHANNEL: er is iets (her)gepland, worker leest de tijden opnieuw
+NOTIFY_PAYLOAD = "schedule"
+
+NEXT_DUE_SQL = """
+    SELECT
+        (SELECT MIN(onboard_after)
+         FROM employees
+         WHERE status = 'NEW' AND cloud_account_created = FALSE
+           AND onboard_after IS NOT NULL AND onboard_after > NOW()) AS onboarding,
+        (SELECT MIN(leave_at)
+         FROM employees
+         WHERE status <> 'INACTIVE'
+           AND leave_at IS NOT NULL AND leave_at > NOW()) AS offboarding;
+"""
+
+ACTIVATE_LEAVERS_SQL = """
+    UPDATE employees
+    SET status = 'INACTIVE',
+        queued_at = leave_at,
+        transfer_pending = FALSE,
+        updated_at = NOW()
+    WHERE status <> 'INACTIVE'
+      AND leave_at IS NOT NULL
+      AND leave_at <= NOW()
+    RETURNING id, leave_at;
+"""
+
+
+def _window():
+    """(begin, lengte) van het off-peak venster."""
+    start, end = (datetime.time.fromisoformat(part.strip()) for part in ONBOARDING_WINDOW.split("-"))
+    day = datetime.date(2000, 1, 1)
+    length = datetime.datetime.combine(day, end) - datetime.datetime.combine(day, start)
+    if length <= datetime.timedelta(0):
+        length += datetime.timedelta(days=1)
+    return start, length
+
+
+def parse_date(value):
+    """YYYY-MM-DD uit een formulier, of None (leeg of ongeldig)."""
+    try:
+        return datetime.date.fromisoformat((value or "").strip())
+    except ValueError:
+        return None
+
+
+def provision_at(start_date, now):
+    """
+    onboard_after voor een medewerker met deze startdatum, of None als de
+    workstation direct gemaakt moet worden.
+    """
+    if start_date is None:
+        return None
+
+    start, length = _window()
+    window = datetime.datetime.combine(
+        start_date - datetime.timedelta(days=ONBOARDING_LEAD_DAYS), start, tzinfo=SCHEDULE_TIMEZONE
+    )
+    if window + length <= now:
+        # gepland venster gemist: eerstvolgende venster, mits nog vóór de startdatum
+        window = datetime.datetime.combine(
+            now.astimezone(SCHEDULE_TIMEZONE).date(), start, tzinfo=SCHEDULE_TIMEZONE
+        )
+        if window + length <= now:
+            window += datetime.timedelta(days=1)
+        if window >= datetime.datetime.combine(start_date, datetime.time(), tzinfo=SCHEDULE_TIMEZONE):
+            return None
+
+    # over het venster verspreiden, zodat een grote instroom geen piek geeft
+    earliest = max(window, now)
+    return earliest + (window + length - earliest) * random.random()
+
+
+def leave_time(leave_date, now):
+    """leave_at voor deze vertrekdatum, of None als de offboarding direct moet."""
+    if leave_date is None:
+        return None
+    at = datetime.datetime.combine(leave_date, OFFBOARDING_LEAVE_TIME, tzinfo=SCHEDULE_TIMEZONE)
+    return at if at > now else None
+
+
+def format_local(ts) -> str:
+    """Tijdstip in SCHEDULE_TIMEZONE voor de portal, bv. '2026-11-02 18:00 CET'."""
+    if ts is None:
+        return "-"
+    return ts.astimezone(SCHEDULE_TIMEZONE).strftime("%Y-%m-%d %H:%M %Z")
+
+
+def next_due(conn) -> dict:
+    """{queue: eerstvolgende geplande tijdstip of None}."""
+    with conn.cursor() as cur:
+        cur.execute(NEXT_DUE_SQL)
+        onboarding, offboarding = cur.fetchone()
+    return {"onboarding": onboarding, "offboarding": offboarding}
+
+
+def activate_leavers(conn) -> int:
+    """Zet alle medewerkers waarvan leave_at verstreken is op INACTIVE (één transactie)."""
+    batch = events.EventBatch(actor="automation:scheduler")
+    with conn, conn.cursor() as cur:
+        cur.execute(ACTIVATE_LEAVERS_SQL)
+        rows = cur.fetchall()
+        for employee_id, leave_at in rows:
+            batch.add(employee_id, events.OFFBOARDING_REQUESTED, detail={"leave_at": leave_at.isoformat()})
+        batch.flush(cur)
+    return len(rows)
+
+
+class DueQueue:
+    """Min-heap van (tijdstip, queue): wanneer moet de worker weer iets doen."""
+
+    def __init__(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def reset(self, due: dict) -> None:
+        """Vervang de inhoud door {queue: tijdstip} (uit next_due)."""
+        self._heap = [(at, queue) for queue, at in due.items() if at is not None]
+        heapq.heapify(self._heap)
+
+    def timeout(self, now, max_timeout: float) -> float:
+        """Seconden tot het eerste tijdstip, hooguit max_timeout."""
+        if not self._heap:
+            return max_timeout
+        return max(0.0, min(max_timeout, (self._heap[0][0] - now).total_seconds()))
+
+    def pop_due(self, now) -> set:
+        """Queues waarvan het tijdstip bereikt is."""
+        due = set()
+        while self._heap and self._heap[0][0] <= now:
+            due.add(heapq.heappop(self._heap)[1])
+        return due
@@ -0,0 +1,91 @@
+"""
+Sizing profiles voor workstation VM's (config/sizing_profiles.json).
+
+Een profiel bepaalt machine type, disk (grootte + type) en Windows image.
+De regels worden op volgorde bekeken; de eerste regel waarvan department
+en/of role overeenkomen (hoofdletterongevoelig, ontbrekend = alles) wint,
+anders het default profiel. De config wordt één keer per proces geladen.
+"""
+
+import functools
+import json
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZING_PROFILE_FILE = os.getenv(
+    "SIZING_PROFILE_FILE", os.path.join(PROJECT_ROOT, "config", "sizing_profiles.json")
+)
+
+
+class SizingProfile:
+    __slots__ = ("name", "machine_type", "disk_size_gb", "disk_type", "image_project", "image_family",
+                 "hourly_cost")
+
+    def __init__(self, name, machine_type, disk_size_gb, disk_type, image_project, image_family,
+                 hourly_cost=None):
+        self.name = name
+        self.machine_type = machine_type
+        self.disk_size_gb = int(disk_size_gb)
+        self.disk_type = disk_type
+        self.image_project = image_project
+        self.image_family = image_family
+        # list price per uur (VM + Windows licentie), alleen voor schattingen (plan mode)
+        self.hourly_cost = float(hourly_cost) if hourly_cost is not None else None
+
+    def summary(self) -> str:
+        """Korte omschrijving voor de portal, bv. 'engineering (n2-standard-4, 128 GB pd-balanced)'."""
+        return f"{self.name} ({self.machine_type}, {self.disk_size_gb} GB {self.disk_type})"
+
+
+def _norm(value):
+    return (value or "").strip().lower()
+
+
+@functools.lru_cache(maxsize=1)
+def load_profiles():
+    """(profielen per naam, default profiel, regels); één keer per proces geladen."""
+    with open(SIZING_PROFILE_FILE, encoding="utf-8") as f:
+        config = json.load(f)
+
+    profiles = {
+        name: SizingProfile(name, **settings)
+        for name, settings in config["profiles"].items()
+    }
+    default = profiles[config["default"]]
+
+    rules = []
+    for rule in config.get("rules", []):
+        if rule["profile"] not in profiles:
+            raise ValueError(f"Sizing rule refers to unknown profile {rule['profile']!r}")
+        rules.append((_norm(rule.get("department")), _norm(rule.get("role")), profiles[rule["profile"]]))
+    return profiles, default, rules
+
+
+@functools.lru_cache(maxsize=256)
+def _resolve(department, role) -> SizingProfile:
+    _, default, rules = load_profiles()
+    for rule_department, rule_role, profile in rules:
+        if rule_department and rule_department != department:
+            continue
+        if rule_role and rule_role != role:
+            continue
+        return profile
+    return default
+
+
+def profile_for(department, role) -> SizingProfile:
+    return _resolve(_norm(department), _norm(role))
+
+
+def profile_for_employee(emp) -> SizingProfile:
+    return profile_for(emp.get("department"), emp.get("role"))
+
+
+def group_by_profile(employees):
+    """[(profiel, [employees])], zodat de provisioner per profiel kan werken."""
+    groups = {}
+    for emp in employees:
+        profile = profile_for_employee(emp)
+        groups.setdefault(profile.name, (profile, []))[1].append(emp)
+    return list(groups.values())
@@ -0,0 +1,232 @@
+"""
+Startup scripts voor de workstation VM's.
+
+- App bundles per afdeling staan in config/app_bundles.json. Een afdeling
+  toevoegen is alleen een config-wijziging. Het Install-Apps.ps1 script van
+  elke bundle wordt één keer per proces gemaakt.
+- Het script van een bundle wordt gehasht en onder
+  hr-app-bundle-<naam>-<hash> in de project metadata gezet. Zo deelt elke VM
+  met dezelfde bundle één kopie. De startup script van de VM haalt het script
+  via de metadata server op, in plaats van het per VM mee te sturen.
+- De startup script zelf is een template dat één keer gecompileerd wordt.
+  Username en wachtwoord gaan er als PowerShell single-quoted strings in,
+  zodat quotes of $ in een waarde geen code kunnen worden.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import string
+import threading
+
+from hrcore import compute
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_BUNDLE_FILE = os.getenv(
+    "APP_BUNDLE_FILE", os.path.join(PROJECT_ROOT, "config", "app_bundles.json")
+)
+BUNDLE_KEY_PREFIX = "hr-app-bundle-"
+# instance metadata key van de startup script (Windows, PowerShell)
+STARTUP_SCRIPT_KEY = "windows-startup-script-ps1"
+# pogingen bij een gelijktijdige metadata-update (412 fingerprint mismatch)
+METADATA_UPDATE_ATTEMPTS = 5
+
+_PACKAGE_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+INSTALL_SCRIPT_HEADER = """# Department-specific application install script
+# Run this inside an elevated PowerShell window (Run as Administrator)
+
+Set-ExecutionPolicy Bypass -Scope Process -Force
+[System.Net.ServicePointManager]::SecurityProtocol = [System.Net.ServicePointManager]::SecurityProtocol -bor 3072
+
+if (!(Get-Command choco.exe -ErrorAction SilentlyContinue)) {
+  Write-Host "Installing Chocolatey..."
+  iex ((New-Object System.Net.WebClient).DownloadString('https://community.chocolatey.org/install.ps1'))
+}
+"""
+
+# {{naam}} placeholders, want $ en @ zijn van PowerShell
+_USER_PART = """<powershell>
+$u = {{username}}
+$p = {{password}}
+
+# 1) Lokale user + RDP-rechten (bestaat hij al, bv. op een overgenomen VM: wachtwoord zetten)
+net user $u $p /add
+if ($LASTEXITCODE -ne 0) { net user $u $p }
+net localgroup "Remote Desktop Users" $u /add
+
+"""
+
+_SCRIPT_PATH_PART = """# 2) PowerShell-install script voor later gebruik
+$scriptPath = "C:\\Install-Apps.ps1"
+$folder = Split-Path $scriptPath -Parent
+New-Item -Path $folder -ItemType Directory -Force | Out-Null
+"""
+
+_SHARED_BUNDLE_PART = """
+# gedeeld per bundle via de project metadata
+$bundleUri = "http://metadata.google.internal/computeMetadata/v1/project/attributes/{{bundle_key}}"
+try {
+  $scriptContent = Invoke-RestMethod -Uri $bundleUri -Headers @{"Metadata-Flavor" = "Google"}
+  $scriptContent | Out-File -FilePath $scriptPath -Encoding UTF8
+  Write-Host "App install script written to $scriptPath"
+} catch {
+  Write-Host "Could not fetch app bundle {{bundle_key}}: $_"
+}
+</powershell>
+"""
+
+_INLINE_BUNDLE_PART = """
+$scriptContent = @'
+{{bundle_script}}
+'@
+$scriptContent | Out-File -FilePath $scriptPath -Encoding UTF8
+
+Write-Host "App install script written to $scriptPath"
+</powershell>
+"""
+
+SHARED_TEMPLATE = _USER_PART + _SCRIPT_PATH_PART + _SHARED_BUNDLE_PART
+
+# fallback als de bundle niet in de project metadata gezet kon worden
+INLINE_TEMPLATE = _USER_PART + _SCRIPT_PATH_PART + _INLINE_BUNDLE_PART
+
+# transfer van een bestaande VM: de user bestaat al, alleen het install-script vervangen
+BUNDLE_UPDATE_SHARED_TEMPLATE = "<powershell>\n" + _SCRIPT_PATH_PART + _SHARED_BUNDLE_PART
+BUNDLE_UPDATE_INLINE_TEMPLATE = "<powershell>\n" + _SCRIPT_PATH_PART + _INLINE_BUNDLE_PART
+
+
+class _ScriptTemplate(string.Template):
+    """string.Template met {{naam}} placeholders."""
+
+    delimiter = "{{"
+    pattern = r"""
+    \{\{(?:
+      (?P<escaped>\{\{) |
+      (?P<named>[a-z_]+)\}\} |
+      (?P<braced>[a-z_]+)\}\} |
+      (?P<invalid>)
+    )
+    """
+
+
+_SHARED = _ScriptTemplate(SHARED_TEMPLATE)
+_INLINE = _ScriptTemplate(INLINE_TEMPLATE)
+_UPDATE_SHARED = _ScriptTemplate(BUNDLE_UPDATE_SHARED_TEMPLATE)
+_UPDATE_INLINE = _ScriptTemplate(BUNDLE_UPDATE_INLINE_TEMPLATE)
+
+
+def ps_quote(value) -> str:
+    """PowerShell single-quoted string literal (geen interpolatie; ' wordt '')."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class AppBundle:
+    __slots__ = ("name", "packages", "script", "digest", "key")
+
+    def __init__(self, name, packages):
+        for package in packages:
+            if not _PACKAGE_RE.match(package):
+                raise ValueError(f"Invalid package name {package!r} in app bundle {name!r}")
+        self.name = name
+        self.packages = tuple(packages)
+        if packages:
+            commands = "".join(f"choco install {p} -y --no-progress\n" for p in packages)
+        else:
+            commands = 'Write-Host "No specific app bundle configured for this department."\n'
+        self.script = f"{INSTALL_SCRIPT_HEADER}\n{commands}"
+        self.digest = hashlib.sha256(self.script.encode("utf-8")).hexdigest()
+        # metadata keys: [a-zA-Z0-9-_], max. 128 tekens
+        self.key = f"{BUNDLE_KEY_PREFIX}{re.sub(r'[^a-z0-9-]', '-', name.lower())}-{self.digest[:16]}"
+
+
+@functools.lru_cache(maxsize=1)
+def load_catalog():
+    """(bundles per naam, {afdeling: bundle}, default bundle); één keer per proces geladen."""
+    with open(APP_BUNDLE_FILE, encoding="utf-8") as f:
+        config = json.load(f)
+
+    bundles = {
+        name: AppBundle(name, settings.get("packages", []))
+        for name, settings in config["bundles"].items()
+    }
+    departments = {}
+    for department, name in config.get("departments", {}).items():
+        if name not in bundles:
+            raise ValueError(f"Department {department!r} refers to unknown app bundle {name!r}")
+        departments[department.strip().lower()] = bundles[name]
+    return bundles, departments, bundles[config["default"]]
+
+
+def bundle_for(department) -> AppBundle:
+    _, departments, default = load_catalog()
+    return departments.get((department or "").strip().lower(), default)
+
+
+def render(username, password, bundle, shared=True) -> str:
+    """Startup script voor één VM; shared=False zet de bundle inline."""
+    if shared:
+        return _SHARED.substitute(
+            username=ps_quote(username), password=ps_quote(password), bundle_key=bundle.key,
+        )
+    return _INLINE.substitute(
+        username=ps_quote(username), password=ps_quote(password), bundle_script=bundle.script,
+    )
+
+
+def render_bundle_update(bundle, shared=True) -> str:
+    """Startup script dat alleen het install-script van `bundle` neerzet (transfer, bestaande user)."""
+    if shared:
+        return _UPDATE_SHARED.substitute(bundle_key=bundle.key)
+    return _UPDATE_INLINE.substitute(bundle_script=bundle.script)
+
+
+_published = set()
+_publish_lock = threading.Lock()
+
+
+def publish(gce, project, bundles) -> set:
+    """
+    Zet de scripts van `bundles` in de project metadata (als ze er nog niet
+    staan) en geef de keys terug die beschikbaar zijn. Gebruikt de fingerprint
+    van de metadata, zodat gelijktijdige workers elkaars keys niet overschrijven.
+    """
+    wanted = {bundle.key: bundle for bundle in bundles}
+    with _publish_lock:
+        missing = {key: b for key, b in wanted.items() if key not in _published}
+        if not missing:
+            return set(wanted)
+
+        for _ in range(METADATA_UPDATE_ATTEMPTS):
+            try:
+                metadata = gce.projects().get(project=project).execute().get("commonInstanceMetadata", {})
+            except Exception as e:
+                print(f"[VM] Could not read project metadata: {e}")
+                break
+            items = metadata.get("items", [])
+            present = {item["key"] for item in items}
+            _published.update(key for key in missing if key in present)
+            to_add = [key for key in missing if key not in present]
+            if not to_add:
+                return set(wanted)
+
+            body = {
+                "fingerprint": metadata.get("fingerprint"),
+                "items": items + [{"key": key, "value": missing[key].script} for key in to_add],
+            }
+            try:
+                op = gce.projects().setCommonInstanceMetadata(project=project, body=body).execute()
+                compute.wait_for_operation(gce, project, None, op["name"])
+            except Exception as e:
+                if getattr(getattr(e, "resp", None), "status", None) == 412:
+                    continue  # iemand anders was eerder; opnieuw lezen
+                print(f"[VM] Could not publish app bundles {to_add}: {e}")
+                break
+            _published.update(to_add)
+            print(f"[VM] Published app bundle(s) {', '.join(to_add)} to project metadata")
+            return set(wanted)
+
+        return set(wanted) & _published
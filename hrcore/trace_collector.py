@@ -0,0 +1,82 @@
+"""
+Lokale stand-in voor een trace collector.
+
+Ontvangt spans van de http exporter (POST /v1/traces, body {"spans": [...]})
+en schrijft ze als JSON-regels weg. GET /v1/traces/<trace_id> geeft alle
+spans van één trace terug, gesorteerd op starttijd.
+
+    python -m hrcore.trace_collector --port 4318 --out /tmp/hr-traces.jsonl
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(out_path):
+    lock = threading.Lock()
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", "0"))
+            try:
+                spans = json.loads(self.rfile.read(length) or b"{}").get("spans", [])
+            except ValueError:
+                self.send_error(400, "invalid JSON")
+                return
+
+            with lock, open(out_path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+
+            self.send_response(202)
+            self.end_headers()
+
+        def do_GET(self):
+            prefix = "/v1/traces/"
+            if not self.path.startswith(prefix):
+                self.send_error(404)
+                return
+            trace_id = self.path[len(prefix):]
+            spans = []
+            try:
+                with open(out_path, encoding="utf-8") as f:
+                    for line in f:
+                        span = json.loads(line)
+                        if span.get("trace_id") == trace_id:
+                            spans.append(span)
+            except FileNotFoundError:
+                pass
+            spans.sort(key=lambda s: s.get("start_time_unix_nano", 0))
+
+            body = json.dumps({"trace_id": trace_id, "spans": spans}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return CollectorHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local trace collector stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--out", default="/tmp/hr-traces.jsonl")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.out))
+    print(f"[TRACE] Collector listening on http://{args.host}:{args.port}/v1/traces -> {args.out}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Lichtgewicht, OpenTelemetry-achtige tracing voor portal en automation.
+
+- Trace context volgt het W3C traceparent formaat
+  (00-<trace_id>-<span_id>-01), zodat de portal een context kan doorgeven
+  aan onboarding.py / offboarding.py (env var TRACEPARENT of opgeslagen bij
+  het *_requested event).
+- Spans worden als JSON-regels geëxporteerd naar een lokaal bestand of naar
+  een collector (zie hrcore/trace_collector.py als lokale stand-in).
+
+Configuratie via env vars:
+    TRACE_EXPORTER       none (default) | file | http
+    TRACE_EXPORT_FILE    pad voor de file exporter (default /tmp/hr-traces.jsonl)
+    TRACE_COLLECTOR_URL  endpoint voor de http exporter
+                         (default http://127.0.0.1:4318/v1/traces)
+
+Met TRACE_EXPORTER=none zijn spans no-ops; instrumentatie kost dan vrijwel niets.
+"""
+
+import contextvars
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import urllib.request
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").strip().lower()
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "/tmp/hr-traces.jsonl")
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL", "http://127.0.0.1:4318/v1/traces")
+
+TRACEPARENT_ENV = "TRACEPARENT"
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_service_name = "hr-unknown"
+_current_span = contextvars.ContextVar("hr_current_span", default=None)
+
+
+def set_service_name(name: str) -> None:
+    """Service van de spans die hierna starten (de worker zet dit per job)."""
+    global _service_name
+    _service_name = name
+
+
+def enabled() -> bool:
+    return TRACE_EXPORTER in ("file", "http")
+
+
+# ========== CONTEXT ==========
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+def parse_traceparent(value):
+    """Parse een W3C traceparent header; None bij ontbrekend/ongeldig."""
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if not match:
+        return None
+    return SpanContext(match.group(1), match.group(2))
+
+
+def current_traceparent():
+    """traceparent van de actieve span (om door te geven aan een worker)."""
+    span = _current_span.get()
+    if span is None or not span.recording:
+        return None
+    return span.context.to_traceparent()
+
+
+def child_env(env=None) -> dict:
+    """Kopie van os.environ (of env) met TRACEPARENT van de actieve span."""
+    env = dict(os.environ if env is None else env)
+    traceparent = current_traceparent()
+    if traceparent:
+        env[TRACEPARENT_ENV] = traceparent
+    return env
+
+
+# ========== SPANS ==========
+
+class Span:
+    """Eén operatie binnen een trace; eindigt via end() of het context manager blok."""
+
+    def __init__(self, name, parent=None, attributes=None, links=None, recording=True):
+        self.name = name
+        self.service = _service_name
+        self.recording = recording
+        self.parent_span_id = parent.span_id if parent else None
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.context = SpanContext(trace_id, secrets.token_hex(8))
+        self.attributes = dict(attributes or {})
+        self.links = [link.to_traceparent() for link in (links or []) if link]
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._token = None
+
+    def set_attribute(self, key, value) -> None:
+        if self.recording:
+            self.attributes[key] = value
+
+    def record_exception(self, exc) -> None:
+        if self.recording:
+            self.status = "ERROR"
+            self.attributes["exception.type"] = type(exc).__name__
+            self.attributes["exception.message"] = str(exc)[:500]
+
+    def activate(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        if self.recording:
+            _exporter().export(self._to_dict())
+
+    def __enter__(self):
+        return self.activate()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        self.end()
+        return False
+
+    def _to_dict(self) -> dict:
+        return {
+            "service": self.service,
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_span_id,
+            "links": self.links,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def start_span(name, parent=None, attributes=None, links=None) -> Span:
+    """
+    Start een span. parent is een SpanContext (bv. uit parse_traceparent);
+    zonder parent wordt de actieve span gebruikt, of begint een nieuwe trace.
+    """
+    if parent is None:
+        active = _current_span.get()
+        parent = active.context if active is not None else None
+    return Span(name, parent=parent, attributes=attributes, links=links, recording=enabled())
+
+
+def span(name, parent=None, **attributes) -> Span:
+    """Context manager variant: `with tracing.span("smtp.send", to=...):`"""
+    return start_span(name, parent=parent, attributes=attributes)
+
+
+def start_process_span(name, attributes=None) -> Span:
+    """Root span van een worker-proces, child van TRACEPARENT als die gezet is."""
+    parent = parse_traceparent(os.getenv(TRACEPARENT_ENV))
+    return start_span(name, parent=parent, attributes=attributes)
+
+
+# ========== EXPORTERS ==========
+
+class _NoopExporter:
+    def export(self, span_dict) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+class FileExporter:
+    """Schrijft elke span als één JSON-regel (append; meerdere processen mogelijk)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span_dict) -> None:
+        line = json.dumps(span_dict, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def flush(self) -> None:
+        pass
+
+
+class HttpExporter:
+    """Bundelt spans en POST ze als JSON naar de collector vanuit een achtergrondthread."""
+
+    def __init__(self, url, max_batch=100, interval=2.0):
+        self.url = url
+        self.max_batch = max_batch
+        self.interval = interval
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span_dict) -> None:
+        with self._cond:
+            self._buffer.append(span_dict)
+            if len(self._buffer) >= self.max_batch:
+                self._cond.notify()
+
+    def flush(self) -> None:
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        self._post(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=self.interval)
+                batch, self._buffer = self._buffer, []
+            self._post(batch)
+
+    def _post(self, batch):
+        if not batch:
+            return
+        body = json.dumps({"spans": batch}, default=str).encode("utf-8")
+        req = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"}
+        )
+        try:
+            urllib.request.urlopen(req, timeout=5).close()
+        except OSError as e:
+            print(f"[TRACE] Failed to export {len(batch)} span(s) to {self.url}: {e}")
+
+
+_exporter_instance = None
+_exporter_lock = threading.Lock()
+
+
+def _exporter():
+    global _exporter_instance
+    if _exporter_instance is None:
+        with _exporter_lock:
+            if _exporter_instance is None:
+                if TRACE_EXPORTER == "file":
+                    _exporter_instance = FileExporter(TRACE_EXPORT_FILE)
+                elif TRACE_EXPORTER == "http":
+                    _exporter_instance = HttpExporter(TRACE_COLLECTOR_URL)
+                else:
+                    _exporter_instance = _NoopExporter()
+    return _exporter_instance
+
+
+def flush() -> None:
+    """Exporteer openstaande spans (aanroepen aan het eind van een worker-run)."""
+    if enabled():
+        _exporter().flush()
+
+
+# ========== INSTRUMENTATIE ==========
+
+_traced_cursor_classes = {}
+
+
+def _traced_cursor_class(base):
+    """Subclass van een psycopg2 cursor class die elke query als span vastlegt."""
+    cls = _traced_cursor_classes.get(base)
+    if cls is not None:
+        return cls
+
+    class TracedCursor(base):
+        def execute(self, query, vars=None):
+            if not enabled():
+                return super().execute(query, vars)
+            statement = query.decode() if isinstance(query, bytes) else str(query)
+            with span("db.query", **{"db.system": "postgresql",
+                                     "db.statement": " ".join(statement.split())[:300]}):
+                return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            if not enabled():
+                return super().executemany(query, vars_list)
+            statement = query.decode() if isinstance(query, bytes) else str(query)
+            with span("db.query", **{"db.system": "postgresql",
+                                     "db.statement": " ".join(statement.split())[:300],
+                                     "db.executemany": True}):
+                return super().executemany(query, vars_list)
+
+    TracedCursor.__name__ = f"Traced{base.__name__}"
+    _traced_cursor_classes[base] = TracedCursor
+    return TracedCursor
+
+
+_traced_connection_class = None
+
+
+def traced_connection_factory():
+    """
+    connection_factory voor psycopg2.connect(): alle cursors van deze connectie
+    (ook met cursor_factory=RealDictCursor) maken een span per query.
+    """
+    global _traced_connection_class
+    if _traced_connection_class is not None:
+        return _traced_connection_class
+
+    import psycopg2.extensions
+
+    class TracedConnection(psycopg2.extensions.connection):
+        def cursor(self, *args, **kwargs):
+            base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+            kwargs["cursor_factory"] = _traced_cursor_class(base)
+            return super().cursor(*args, **kwargs)
+
+    _traced_connection_class = TracedConnection
+    return TracedConnection
+
+
+def traced_request_builder():
+    """
+    requestBuilder voor googleapiclient.discovery.build(): elke API-call
+    (bv. compute.instances.insert) wordt een span.
+    """
+    from googleapiclient.http import HttpRequest
+
+    class TracedHttpRequest(HttpRequest):
+        def execute(self, *args, **kwargs):
+            if not enabled():
+                return super().execute(*args, **kwargs)
+            with span(f"gce.{self.methodId or 'request'}",
+                      **{"http.method": self.method, "http.url": self.uri.split("?")[0]}):
+                return super().execute(*args, **kwargs)
+
+    return TracedHttpRequest
@@ -65,6 +65,9 @@ REPO_ROOT="$(cd "$(dirname "$0")" && pwd)"
 
 kubectl apply -f "$REPO_ROOT/k8s/hr-portal-deployment.yaml"
 kubectl apply -f "$REPO_ROOT/k8s/hr-portal-service.yaml"
+kubectl apply -f "$REPO_ROOT/k8s/hr-portal-hpa.yaml"
+kubectl apply -f "$REPO_ROOT/k8s/automation-worker-deployment.yaml"
+kubectl apply -f "$REPO_ROOT/k8s/power-scheduler-deployment.yaml"
 
 
 